@@ -0,0 +1,131 @@
+import argparse
+import sys
+
+import pytz
+
+from .exceptions import InvalidTokenException
+from .logs import parse_iso_line, read_window, regex_parser
+from .stream import parse_at, transform
+
+
+def stream_command(args):
+    try:
+        return transform(
+            args.input,
+            args.output,
+            args.field,
+            at_field=args.at_field,
+            tz_field=args.tz_field,
+            at=parse_at(args.at),
+            tz=args.tz,
+            utc=args.utc,
+            strict=not args.keep_invalid,
+        )
+    finally:
+        for f in (args.input, args.output):
+            if f not in (sys.stdin, sys.stdout):
+                f.close()
+
+
+def logs_command(args):
+    parser = parse_iso_line
+    if args.pattern:
+        parser = regex_parser(args.pattern, args.format)
+    output = getattr(sys.stdout, "buffer", sys.stdout)
+    chunks = read_window(
+        args.path,
+        args.from_token,
+        args.to_token,
+        at=parse_at(args.at),
+        tz=args.tz,
+        parser=parser,
+        log_tz=args.log_tz,
+    )
+    for chunk in chunks:
+        output.write(chunk)
+    output.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m datetoken")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    stream = commands.add_parser(
+        "stream", help="resolve token fields of NDJSON records"
+    )
+    stream.add_argument(
+        "-f",
+        "--field",
+        action="append",
+        required=True,
+        help="dotted path to a token field, such as range.from. Repeatable",
+    )
+    stream.add_argument("--at-field", help="dotted path to the starting point")
+    stream.add_argument("--tz-field", help="dotted path to the time zone")
+    stream.add_argument("--at", help="default starting point, as ISO 8601")
+    stream.add_argument("--tz", help="default time zone")
+    stream.add_argument(
+        "--utc", action="store_true", help="coerce resolved dates to UTC"
+    )
+    stream.add_argument(
+        "--keep-invalid",
+        action="store_true",
+        help="leave invalid tokens untouched instead of failing",
+    )
+    stream.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help="NDJSON file, defaults to stdin",
+    )
+    stream.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="output file, defaults to stdout",
+    )
+    stream.set_defaults(handler=stream_command)
+
+    logs = commands.add_parser(
+        "logs", help="print the lines of a sorted log file within a token range"
+    )
+    logs.add_argument("path", help="log file, sorted by date")
+    logs.add_argument(
+        "--from", dest="from_token", required=True, help="start of the range"
+    )
+    logs.add_argument("--to", dest="to_token", default="now", help="end of the range")
+    logs.add_argument("--at", help="starting point, as ISO 8601")
+    logs.add_argument("--tz", help="time zone tokens are evaluated in")
+    logs.add_argument("--log-tz", help="time zone of naive dates in the file")
+    logs.add_argument(
+        "--pattern",
+        help="regular expression whose first group matches the date of a line. "
+        "Defaults to leading ISO 8601 dates",
+    )
+    logs.add_argument("--format", help="strptime format of dates matched by --pattern")
+    logs.set_defaults(handler=logs_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except InvalidTokenException as e:
+        sys.stderr.write("%s\n" % e.message)
+        return 1
+    except pytz.UnknownTimeZoneError as e:
+        sys.stderr.write('Unknown time zone "%s"\n' % e.args[0])
+        return 1
+    except ValueError as e:
+        # Malformed JSON records or starting points, among others
+        sys.stderr.write("%s\n" % e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
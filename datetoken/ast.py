@@ -6,16 +6,40 @@ from datetime import datetime
 
 from dateutil.relativedelta import relativedelta
 
+from datetoken.calendars import (
+    add_business_days,
+    create_end_fiscal,
+    create_start_fiscal,
+    end_business_day,
+    get_day_table,
+    start_business_day,
+)
 from datetoken.token import TokenType
 
+EPOCH = datetime(1970, 1, 1)
+# Modifiers whose length in seconds does not depend on the date they apply to
+FIXED_MODIFIERS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+# Units snaps may take an amount of, such as `/15m`, by length in seconds.
+# Their buckets are laid out from the unix epoch onwards, except for weeks,
+# which start on Mondays and are laid out from 1969-12-29 instead
+SNAP_UNITS = FIXED_MODIFIERS
+SNAP_ANCHORS = {"w": -3 * 86400}
+
 
 def get_utc_now():
     """
     :rtype: datetime.datetime
     :return: Timezone aware datetime object in UTC
     """
+    return get_precise_utc_now().replace(microsecond=0)
+
+
+def get_precise_utc_now():
+    """
+    :rtype: datetime.datetime
+    :return: Timezone aware datetime object in UTC, microseconds included
+    """
     now = datetime.utcnow()
-    now = now.replace(microsecond=0)
     now = pytz.UTC.localize(now)
     if hasattr(pytz.UTC, "normalize"):
         now = pytz.UTC.normalize(now)
@@ -56,6 +80,7 @@ class ModifierExpression(Expression):
             "w": lambda dt, amount: dt + td(weeks=amount),
             "M": lambda dt, amount: dt + relativedelta(months=amount),
             "Y": lambda dt, amount: dt + relativedelta(years=amount),
+            "bd": add_business_days,
         },
         TokenType.MINUS: {
             "s": lambda dt, amount: dt - td(seconds=amount),
@@ -65,6 +90,7 @@ class ModifierExpression(Expression):
             "w": lambda dt, amount: dt - td(weeks=amount),
             "M": lambda dt, amount: dt - relativedelta(months=amount),
             "Y": lambda dt, amount: dt - relativedelta(years=amount),
+            "bd": lambda dt, amount: add_business_days(dt, -amount),
         },
     }
 
@@ -85,6 +111,25 @@ class ModifierExpression(Expression):
         )
 
 
+def snap_units(dt, amount, modifier, end=False):
+    """
+    Snaps to buckets spanning several units, such as 15 minutes, by integer
+    arithmetic over the wall clock time elapsed since their anchor
+    :param dt: datetime.datetime
+    :param amount: number of units per bucket
+    :param modifier: any of `SNAP_UNITS`
+    :param end: whether to snap to the last second of the bucket
+    :return: datetime.datetime
+    """
+    length = amount * SNAP_UNITS[modifier]
+    elapsed = dt.replace(tzinfo=None) - EPOCH
+    seconds = elapsed.days * 86400 + elapsed.seconds - SNAP_ANCHORS.get(modifier, 0)
+    start = dt - td(seconds=seconds % length)
+    if end:
+        return start + td(seconds=length - 1)
+    return start
+
+
 def start_current_quarter(dt):
     q = (dt.month - 1) // 3
     return start_quarter(dt, q)
@@ -139,6 +184,10 @@ class SnapExpression(Expression):
             "Q2": create_start_quarter(1),
             "Q3": create_start_quarter(2),
             "Q4": create_start_quarter(3),
+            "bd": start_business_day,
+            "FY": create_start_fiscal("FY"),
+            "FQ": create_start_fiscal("FQ"),
+            "FM": create_start_fiscal("FM"),
         },
         TokenType.AT: {
             "s": lambda dt: dt.replace(second=0, millisecond=999),
@@ -177,16 +226,34 @@ class SnapExpression(Expression):
             "Q2": create_end_quarter(1),
             "Q3": create_end_quarter(2),
             "Q4": create_end_quarter(3),
+            "bd": end_business_day,
+            "FY": create_end_fiscal("FY"),
+            "FQ": create_end_fiscal("FQ"),
+            "FM": create_end_fiscal("FM"),
         },
     }
 
-    def __init__(self, modifier, operator):
+    def __init__(self, modifier, operator, amount=1):
         self.operator = operator
         self.modifier = modifier
+        self.amount = amount
 
     def get_value(self, value):
+        if self.amount != 1:
+            return snap_units(
+                value, self.amount, self.modifier, self.operator == TokenType.AT
+            )
+        table = get_day_table()
+        if table is not None:
+            snaps = table.ends if self.operator == TokenType.AT else table.starts
+            snap = snaps.get(self.modifier)
+            result = None if snap is None else snap(value)
+            if result is not None:
+                return result
         fn = self.__operations__[self.operator][self.modifier]
         return fn(value)
 
     def __str__(self):
+        if self.amount != 1:
+            return "%s%d%s" % (self.operator, self.amount, self.modifier)
         return self.operator + self.modifier
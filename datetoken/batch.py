@@ -0,0 +1,199 @@
+import bisect
+
+from datetime import datetime
+from datetime import timedelta as td
+
+import pytz
+
+from .ast import FIXED_MODIFIERS
+from .ast import ModifierExpression, NowExpression, SnapExpression
+from .evaluator import evaluate_nodes, parse_datetoken, resolve_at
+from .evaluator import resolve_timezone, to_timestamp
+from .rollover import SNAP_STEPS, get_nodes, next_rollover
+from .tztable import get_table
+
+FOREVER = datetime.max.replace(tzinfo=pytz.UTC)
+
+
+class _TrieNode(object):
+    __slots__ = ("expression", "children", "tokens")
+
+    def __init__(self, expression=None):
+        self.expression = expression
+        # Child nodes by the string representation of their expression
+        self.children = {}
+        # Tokens whose nodes end right here
+        self.tokens = []
+
+
+class TokenTrie(object):
+    """
+    Trie of the ast nodes of many tokens. Tokens sharing a prefix, such as
+    `now-1M/M` and `now-1M/M+w@bw`, share the path of the trie holding it, so
+    that evaluating the whole set computes every prefix once and only
+    branches where tokens diverge.
+    """
+
+    def __init__(self, tokens=()):
+        """
+        :param tokens: iterable of string payloads
+        :raises: InvalidTokenException
+        """
+        self._root = _TrieNode()
+        self._tokens = []
+        self._size = 1
+        for token in tokens:
+            self.add(token)
+
+    def add(self, token):
+        """
+        :param token: string payload
+        :raises: InvalidTokenException
+        """
+        node = self._root
+        for expression in parse_datetoken(token):
+            if isinstance(expression, NowExpression):
+                continue
+            key = str(expression)
+            if key not in node.children:
+                node.children[key] = _TrieNode(expression)
+                self._size += 1
+            node = node.children[key]
+        if token not in node.tokens:
+            node.tokens.append(token)
+            self._tokens.append(token)
+
+    @property
+    def tokens(self):
+        return list(self._tokens)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    @property
+    def size(self):
+        """
+        :return: number of nodes within the trie, this is, the number of
+            expressions evaluated per call to `eval`, plus one
+        """
+        return self._size
+
+    def eval(self, at=None, tz=None):
+        """
+        Evaluates every token against the same starting point
+        :param at: {datetime.datetime} starting point. Defaults to utc now
+        :param tz: {str|pytz.timezone} custom time zone
+        :return: dict mapping each token to its aware datetime object
+        """
+        result = {}
+        pending = [(self._root, resolve_at(at, tz))]
+        while pending:
+            node, value = pending.pop()
+            for token in node.tokens:
+                result[token] = value
+            for child in node.children.values():
+                pending.append((child, child.expression.get_value(value)))
+        return result
+
+
+def eval_many(tokens, at=None, tz=None):
+    """
+    Evaluates many tokens at once, sharing the evaluation of their common
+    prefixes. Build a `TokenTrie` instead to evaluate the same set of tokens
+    repeatedly.
+    :param tokens: iterable of string payloads
+    :param at: {datetime.datetime} starting point. Defaults to utc now
+    :param tz: {str|pytz.timezone} custom time zone
+    :return: dict mapping each token to its aware datetime object
+    :raises: InvalidTokenException
+    """
+    return TokenTrie(tokens).eval(at=at, tz=tz)
+
+
+def _segment_kind(nodes):
+    """
+    How the value of a token relates to its starting point, between two
+    consecutive bucket boundaries:
+    - `constant`, snapped tokens keep the same value, microseconds aside
+    - `shift`, tokens made of fixed length modifiers move along with the
+      starting point, at any time
+    - `daily`, any other token moves along with the starting point as long
+      as the date does not change, since neither month and business day
+      modifiers nor week day snaps depend on the time of day
+    """
+    if any(
+        isinstance(node, SnapExpression) and node.modifier in SNAP_STEPS
+        for node in nodes
+    ):
+        return "constant"
+    if all(
+        isinstance(node, ModifierExpression) and node.modifier in FIXED_MODIFIERS
+        for node in nodes
+        if not isinstance(node, NowExpression)
+    ):
+        return "shift"
+    return "daily"
+
+
+def _next_transition(table, at):
+    """
+    :return: first UTC offset transition after `at`, or `at` itself if the
+        table does not cover it
+    """
+    if table is None:
+        return FOREVER
+    timestamp = to_timestamp(at)
+    if not table.covers(timestamp):
+        return at
+    position = bisect.bisect_right(table.starts, timestamp)
+    if position == len(table.starts):
+        return datetime.fromtimestamp(table.upper, pytz.UTC)
+    return datetime.fromtimestamp(table.starts[position], pytz.UTC)
+
+
+def eval_sorted(token, anchors, tz=None):
+    """
+    Evaluates a token against a series of starting points, such as the
+    dates of events in time order. Consecutive starting points mostly fall
+    within the same snap bucket, in which case the value of the token is
+    reused, or shifted by the time elapsed since the start of the bucket,
+    rather than going through every node again. Values are only recomputed
+    when a starting point crosses a bucket boundary or a UTC offset
+    transition.
+    Unsorted starting points yield the same results, only slower.
+    :param token: string payload, `datetoken.objects.Token` or sequence of
+        ast nodes
+    :param anchors: iterable of datetime objects. Naive ones are treated as
+        UTC
+    :param tz: {str|pytz.timezone} custom time zone
+    :return: list of aware datetime objects, one per starting point
+    :raises: InvalidTokenException
+    """
+    nodes = get_nodes(token)
+    tz = resolve_timezone(tz)
+    kind = _segment_kind(nodes)
+    table = None if tz is None or tz is pytz.UTC else get_table(tz)
+    values = []
+    append = values.append
+    start = end = FOREVER
+    for anchor in anchors:
+        if anchor.tzinfo is None:
+            anchor = anchor.replace(tzinfo=pytz.UTC)
+        if not start <= anchor < end:
+            now = resolve_at(anchor, tz)
+            start, value = anchor, evaluate_nodes(nodes, now)
+            end = _next_transition(table, anchor)
+            if kind == "constant":
+                end = min(end, next_rollover(nodes, anchor, tz))
+            elif kind == "daily":
+                midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+                end = min(end, midnight + td(days=1))
+            append(value)
+        elif kind == "constant":
+            # Snaps keep the microseconds of the starting point
+            if anchor.microsecond != value.microsecond:
+                value = value.replace(microsecond=anchor.microsecond)
+            append(value)
+        else:
+            append(value + (anchor - start))
+    return values
@@ -0,0 +1,219 @@
+import math
+
+from datetime import date
+from datetime import timedelta as td
+from functools import lru_cache
+
+from . import DEFAULT_TOKEN
+from .ast import FIXED_MODIFIERS, SNAP_UNITS
+from .ast import ModifierExpression, SnapExpression
+from .bucket import FISCAL_UNITS, bucket, bucket_start
+from .calendars import get_fiscal_calendar
+from .evaluator import resolve_at, to_timestamp
+from .exceptions import UnsupportedTokenException
+from .rollover import get_nodes
+from .token import TokenType
+
+DAY = 86400
+# The gregorian calendar repeats itself every 400 years
+CYCLE_MONTHS = 400 * 12
+CYCLE_DAYS = 146097
+# Least and greatest amount of seconds snaps move a date by, whatever the
+# date. Weekday snaps keep the time of day, the rest reset it. `@M` falls
+# short for days the following month lacks, Jan 31 yields Jan 28 at worst.
+SNAP_BOUNDS = {
+    TokenType.SLASH: {
+        "s": (-59, 0),
+        "m": (-59, 0),
+        "h": (-3599, 0),
+        "d": (1 - DAY, 0),
+        "w": (1 - 7 * DAY, 0),
+        "bw": (1 - 7 * DAY, 0),
+        "M": (1 - 31 * DAY, 0),
+        "Q": (1 - 92 * DAY, 0),
+        "Y": (1 - 366 * DAY, 0),
+        "Q1": (1 - 366 * DAY, 0),
+        "Q2": (1 - 275 * DAY, 91 * DAY),
+        "Q3": (1 - 184 * DAY, 182 * DAY),
+        "Q4": (1 - 92 * DAY, 274 * DAY),
+        "mon": (-6 * DAY, 0),
+        "tue": (-6 * DAY, 0),
+        "wed": (-6 * DAY, 0),
+        "thu": (-6 * DAY, 0),
+        "fri": (-6 * DAY, 0),
+        "sat": (-6 * DAY, 0),
+        "sun": (-6 * DAY, 0),
+    },
+    TokenType.AT: {
+        "m": (0, 59),
+        "h": (0, 3599),
+        "d": (0, DAY - 1),
+        "w": (0, 7 * DAY - 1),
+        "bw": (-2 * DAY, 5 * DAY - 1),
+        "M": (-3 * DAY, 31 * DAY - 1),
+        "Q": (0, 92 * DAY - 1),
+        "Y": (0, 366 * DAY - 1),
+        "Q1": (-275 * DAY, 91 * DAY - 1),
+        "Q2": (-184 * DAY, 182 * DAY - 1),
+        "Q3": (-92 * DAY, 274 * DAY - 1),
+        "Q4": (0, 366 * DAY - 1),
+        "mon": (0, 6 * DAY),
+        "tue": (0, 6 * DAY),
+        "wed": (0, 6 * DAY),
+        "thu": (0, 6 * DAY),
+        "fri": (0, 6 * DAY),
+        "sat": (0, 6 * DAY),
+        "sun": (0, 6 * DAY),
+    },
+}
+
+# Ordinals of the first day of each month along two 400 year cycles
+_month_starts = [
+    date(2000 + month // 12, month % 12 + 1, 1).toordinal()
+    for month in range(2 * CYCLE_MONTHS + 1)
+]
+
+
+@lru_cache(maxsize=256)
+def month_shift_bounds(months):
+    """
+    Least and greatest amount of days adding a number of months moves a date
+    by. Days the target month lacks are clamped to its last day.
+    :param months: number of months, negative to go backwards
+    :return: tuple of ints, (min_days, max_days)
+    """
+    cycles, months = divmod(months, CYCLE_MONTHS)
+    low = high = None
+    for month in range(CYCLE_MONTHS):
+        target = month + months
+        days = _month_starts[target] - _month_starts[month]
+        length = _month_starts[month + 1] - _month_starts[month]
+        target_length = _month_starts[target + 1] - _month_starts[target]
+        clamped = days + min(0, target_length - length)
+        low = clamped if low is None else min(low, clamped)
+        high = days if high is None else max(high, days)
+    return low + cycles * CYCLE_DAYS, high + cycles * CYCLE_DAYS
+
+
+def _modifier_bounds(node):
+    sign = 1 if node.operator == TokenType.PLUS else -1
+    if node.modifier in FIXED_MODIFIERS:
+        seconds = sign * node.amount * FIXED_MODIFIERS[node.modifier]
+        return seconds, seconds
+    if node.modifier in ("M", "Y"):
+        months = sign * node.amount * (12 if node.modifier == "Y" else 1)
+        low, high = month_shift_bounds(months)
+        return low * DAY, high * DAY
+    return None
+
+
+def _fiscal_bounds(node):
+    starts = get_fiscal_calendar().boundaries[node.modifier]
+    longest = max(following - start for start, following in zip(starts, starts[1:]))
+    if node.operator == TokenType.SLASH:
+        return 1 - longest * DAY, 0
+    return 0, longest * DAY - 1
+
+
+def _node_bounds(token, node):
+    bounds = None
+    if isinstance(node, ModifierExpression):
+        bounds = _modifier_bounds(node)
+    elif isinstance(node, SnapExpression):
+        if node.amount != 1:
+            length = node.amount * SNAP_UNITS[node.modifier]
+            if node.operator == TokenType.SLASH:
+                bounds = (1 - length, 0)
+            else:
+                bounds = (0, length - 1)
+        elif node.modifier in FISCAL_UNITS:
+            bounds = _fiscal_bounds(node)
+        else:
+            bounds = SNAP_BOUNDS[node.operator].get(node.modifier)
+    else:
+        bounds = (0, 0)
+    if bounds is None:
+        raise UnsupportedTokenException(
+            token, 'The value of "%s" cannot be bounded' % node
+        )
+    return bounds
+
+
+def offset_bounds(token):
+    """
+    Static analysis of how far from its starting point a token may land,
+    whatever the starting point. For instance, `now-7d/d` always lies
+    between 7 days, 23:59:59 hours and exactly 7 days before `now`.
+    Bounds of every expression add up, so they are guaranteed to hold but
+    might not be the tightest possible ones.
+    Since tokens keep the UTC offset of their starting point, bounds hold for
+    wall clock time and elapsed time alike.
+    :param token: string payload, `datetoken.objects.Token` or sequence of
+        ast nodes
+    :return: tuple of timedelta objects, (min_offset, max_offset)
+    :raises: InvalidTokenException, UnsupportedTokenException for business
+        days, which depend on holidays
+    """
+    low = high = 0
+    for node in get_nodes(token):
+        node_low, node_high = _node_bounds(token, node)
+        low += node_low
+        high += node_high
+    return td(seconds=low), td(seconds=high)
+
+
+def value_bounds(token, at=None, until=None, tz=None):
+    """
+    :param token: string payload, `datetoken.objects.Token` or sequence of
+        ast nodes
+    :param at: {datetime.datetime} earliest starting point. Defaults to utc
+        now
+    :param until: {datetime.datetime} latest starting point, for tokens to be
+        evaluated at some point within `[at, until]`. Defaults to `at`
+    :param tz: {str|pytz.timezone} custom time zone
+    :return: tuple of aware datetime objects, earliest and latest value
+    """
+    low, high = offset_bounds(token)
+    start = resolve_at(at, tz)
+    end = start if until is None else resolve_at(until, tz)
+    return start + low, end + high
+
+
+def partition_keys(
+    from_token,
+    to_token=DEFAULT_TOKEN,
+    unit="d",
+    at=None,
+    until=None,
+    tz=None,
+    ids=False,
+):
+    """
+    Partitions, such as daily or hourly ones, a token range might touch,
+    found from the static bounds of both tokens rather than by evaluating
+    them against every candidate.
+    :param from_token: string payload of the start of the range
+    :param to_token: string payload of the end of the range
+    :param unit: snap modifier partitions are made of, such as `h` or `d`
+    :param at: {datetime.datetime} earliest starting point. Defaults to utc
+        now
+    :param until: {datetime.datetime} latest starting point. Defaults to
+        `at`
+    :param tz: {str|pytz.timezone} time zone partitions are laid out in
+    :param ids: whether to return a range of bucket ids, as `bucket` would
+        compute them, instead of listing partition starts
+    :return: list of naive datetime objects, wall clock time each
+        partition starts at, or range of bucket ids
+    :raises: InvalidTokenException, UnsupportedTokenException
+    """
+    start, _ = value_bounds(from_token, at=at, until=until, tz=tz)
+    _, end = value_bounds(to_token, at=at, until=until, tz=tz)
+    if end < start:
+        bucket_ids = range(0)
+    else:
+        epochs = [int(math.floor(to_timestamp(start))), int(to_timestamp(end))]
+        first, last = bucket(epochs, unit, tz=tz, ids=True)
+        bucket_ids = range(first, last + 1)
+    if ids:
+        return bucket_ids
+    return [bucket_start(unit, bucket_id) for bucket_id in bucket_ids]
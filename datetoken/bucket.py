@@ -0,0 +1,296 @@
+import math
+import numbers
+import re
+
+from datetime import datetime
+from datetime import timedelta as td
+
+import pytz
+
+from .ast import EPOCH, SNAP_ANCHORS, SNAP_UNITS
+from .calendars import get_fiscal_calendar, get_holiday_calendar
+from .evaluator import make_aware, resolve_timezone, to_timestamp
+from .parser import SNAP_MODIFIERS
+from .tztable import get_table
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+EPOCH_ORDINAL = EPOCH.toordinal()
+# Units whose buckets last a fixed amount of seconds. `/s` resets seconds,
+# therefore `s` buckets are one minute long as well
+FIXED_UNITS = {"s": 60, "m": 60, "h": 3600, "d": 86400}
+# Week long buckets and the week day, Monday being 0, they start on
+WEEK_UNITS = {
+    "w": 0,
+    "bw": 0,
+    "mon": 0,
+    "tue": 1,
+    "wed": 2,
+    "thu": 3,
+    "fri": 4,
+    "sat": 5,
+    "sun": 6,
+}
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+# Bucket ids of calendar units, as a function of months elapsed since
+# year 0, and the first month of the bucket for a given id
+CALENDAR_UNITS = {
+    "M": (lambda months: months, lambda bucket_id: divmod(bucket_id, 12)),
+    "Q": (lambda months: months // 3, lambda bucket_id: divmod(bucket_id * 3, 12)),
+    "Y": (lambda months: months // 12, lambda bucket_id: (bucket_id, 0)),
+    "Q1": (lambda months: months // 12, lambda bucket_id: (bucket_id, 0)),
+    "Q2": (lambda months: months // 12, lambda bucket_id: (bucket_id, 3)),
+    "Q3": (lambda months: months // 12, lambda bucket_id: (bucket_id, 6)),
+    "Q4": (lambda months: months // 12, lambda bucket_id: (bucket_id, 9)),
+}
+# Business days, as registered with `set_holiday_calendar`. Dates on
+# weekends or holidays belong to the previous business day
+BUSINESS_DAY_UNIT = "bd"
+# Fiscal periods, as registered with `set_fiscal_calendar`. Bucket ids are
+# positions within the table of period boundaries of the calendar
+FISCAL_UNITS = ("FY", "FQ", "FM")
+UNITS = tuple(SNAP_MODIFIERS)
+# Units spanning several snap units, such as `15m` or `2w`, as `/15m` snaps
+MULTI_UNIT = re.compile(r"(\d+)(%s)$" % "|".join(SNAP_UNITS))
+
+
+def _multi_unit(unit):
+    """
+    :return: tuple (length, anchor) in seconds of units spanning several snap
+        units, or None for any other unit
+    """
+    match = MULTI_UNIT.match(unit)
+    if match is None:
+        return None
+    amount, modifier = int(match.group(1)), match.group(2)
+    return amount * SNAP_UNITS[modifier], SNAP_ANCHORS.get(modifier, 0)
+
+
+def fixed_unit(unit):
+    """
+    :param unit: snap modifier whose buckets last a fixed amount of seconds,
+        such as `m`, `d`, `w` or `15m`
+    :return: tuple (length, anchor) in seconds, so that the bucket id of a
+        wall clock time is `(seconds - anchor) // length`. None for any
+        other unit
+    """
+    unit = _normalize_unit(unit)
+    multi = _multi_unit(unit)
+    if multi is not None:
+        return multi if multi[0] > 0 else None
+    if unit in FIXED_UNITS:
+        return FIXED_UNITS[unit], 0
+    if unit == "w":
+        return 7 * 86400, -EPOCH_WEEKDAY * 86400
+    return None
+
+
+def _normalize_unit(unit):
+    """
+    Single units, such as `1h` or `1M`, stand for the plain snap modifier
+    """
+    if unit.startswith("1") and unit[1:] in UNITS:
+        return unit[1:]
+    return unit
+
+
+def _epoch_seconds(value):
+    if isinstance(value, datetime):
+        return int(math.floor(to_timestamp(value)))
+    if isinstance(value, numbers.Number):
+        return int(math.floor(value))
+    raise TypeError("Expected a datetime or unix timestamp, got %r" % (value,))
+
+
+def _local_seconds(epochs, tz):
+    """
+    Wall clock time at `tz`, in seconds elapsed since 1970-01-01 00:00:00
+    """
+    if tz is None or tz is pytz.UTC:
+        return epochs
+    return get_table(tz).to_local_many(epochs)
+
+
+def _bucket_ids(unit, local):
+    multi = _multi_unit(unit)
+    if multi is not None:
+        length, anchor = multi
+        return [(seconds - anchor) // length for seconds in local]
+    if unit in FIXED_UNITS:
+        length = FIXED_UNITS[unit]
+        return [seconds // length for seconds in local]
+    if unit in WEEK_UNITS:
+        shift = EPOCH_WEEKDAY - WEEK_UNITS[unit]
+        return [(seconds // 86400 + shift) // 7 for seconds in local]
+    by_day = {}
+    ids = []
+    for seconds in local:
+        day = seconds // 86400
+        if day not in by_day:
+            by_day[day] = _day_bucket_id(unit, day)
+        ids.append(by_day[day])
+    return ids
+
+
+def _day_bucket_id(unit, day):
+    """
+    Bucket id of units which are computed once per day
+    """
+    if unit == BUSINESS_DAY_UNIT:
+        calendar = get_holiday_calendar()
+        return calendar.previous_business_day(day + EPOCH_ORDINAL) - EPOCH_ORDINAL
+    if unit in FISCAL_UNITS:
+        return get_fiscal_calendar().position(unit, day + EPOCH_ORDINAL)
+    date = datetime.fromordinal(day + EPOCH_ORDINAL)
+    return CALENDAR_UNITS[unit][0](date.year * 12 + date.month - 1)
+
+
+def bucket_start(unit, bucket_id):
+    """
+    :param unit: snap modifier, such as `h`, `d`, `w` or `Q`, optionally
+        preceded by a number of units, such as `15m`
+    :param bucket_id: integer id of the bucket, as returned by `bucket`
+    :return: naive datetime object, wall clock time the bucket starts at
+    """
+    unit = _normalize_unit(unit)
+    multi = _multi_unit(unit)
+    if multi is not None:
+        length, anchor = multi
+        return EPOCH + td(seconds=anchor + bucket_id * length)
+    if unit in FIXED_UNITS:
+        return EPOCH + td(seconds=bucket_id * FIXED_UNITS[unit])
+    if unit == BUSINESS_DAY_UNIT:
+        return EPOCH + td(days=bucket_id)
+    if unit in WEEK_UNITS:
+        return EPOCH + td(days=bucket_id * 7 - EPOCH_WEEKDAY + WEEK_UNITS[unit])
+    if unit in FISCAL_UNITS:
+        ordinal = get_fiscal_calendar().boundaries[unit][bucket_id]
+        return datetime.fromordinal(ordinal)
+    year, month = CALENDAR_UNITS[unit][1](bucket_id)
+    return datetime(year, month + 1, 1)
+
+
+def _start_timestamp(unit, bucket_id, tz):
+    """
+    Unix timestamp of the wall clock start of a bucket, at its own UTC
+    offset. Starts falling twice, as clocks go back, take the earliest one
+    """
+    start = bucket_start(unit, bucket_id)
+    if tz is None:
+        return int((start - EPOCH).total_seconds())
+    if hasattr(tz, "localize"):
+        return int(
+            min(
+                to_timestamp(tz.localize(start, is_dst=True)),
+                to_timestamp(tz.localize(start, is_dst=False)),
+            )
+        )
+    return int(to_timestamp(make_aware(start, tz)))
+
+
+def _check_unit(unit):
+    multi = _multi_unit(unit)
+    if multi is not None and multi[0] > 0:
+        return
+    if unit not in UNITS:
+        raise ValueError(
+            'Expected snap modifier as any of "%s", optionally preceded by a '
+            'number of "%s", got "%s"' % (UNITS, tuple(SNAP_UNITS), unit)
+        )
+
+
+def bucket(timestamps, unit, tz=None, ids=False):
+    """
+    Assigns many dates at once to the bucket that snapping them to the start
+    of `unit` would yield. For instance, with `unit` being `d`, every date
+    is assigned to the start of its day, as `now/d` would do.
+    Week day units, such as `mon`, bucket dates by weeks starting on that
+    day, dropping the time of day.
+
+    Buckets are laid out on wall clock time, and each one starts at the UTC
+    offset in force at its own start. Tokens keep the offset of their
+    starting point instead, so on days clocks change, `now/d` evaluated
+    after the change yields the same wall clock time, but an instant one
+    hour apart from the start of the bucket.
+    :param timestamps: sequence or numpy array of datetimes or unix
+        timestamps. Naive datetime objects are treated as UTC
+    :param unit: snap modifier, such as `h`, `d`, `w` or `Q`. Fixed length
+        units might be preceded by a number of them, such as `15m`, to
+        bucket dates as `/15m` would snap them
+    :param tz: {str|pytz.timezone} time zone buckets are computed in.
+        Defaults to UTC
+    :param ids: whether to return integer bucket ids instead of bucket
+        starts. Ids are consecutive for consecutive buckets, and can be
+        turned back into dates with `bucket_start`
+    :return: list of ints with either the unix timestamp at which each
+        bucket starts or bucket ids. A numpy array if `timestamps` is a numpy
+        array as well
+    """
+    unit = _normalize_unit(unit)
+    _check_unit(unit)
+    tz = resolve_timezone(tz)
+    if np is not None and isinstance(timestamps, np.ndarray):
+        return _bucket_array(timestamps, unit, tz, ids)
+    epochs = [_epoch_seconds(value) for value in timestamps]
+    bucket_ids = _bucket_ids(unit, _local_seconds(epochs, tz))
+    if ids:
+        return bucket_ids
+    starts = {}
+    result = []
+    for bucket_id in bucket_ids:
+        if bucket_id not in starts:
+            starts[bucket_id] = _start_timestamp(unit, bucket_id, tz)
+        result.append(starts[bucket_id])
+    return result
+
+
+def _bucket_array(timestamps, unit, tz, ids):
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        epochs = timestamps.astype("datetime64[s]").astype(np.int64)
+    else:
+        epochs = np.floor(timestamps).astype(np.int64)
+
+    local = _local_seconds(epochs, tz)
+    multi = _multi_unit(unit)
+    if multi is not None:
+        length, anchor = multi
+        bucket_ids = (local - anchor) // length
+    elif unit in FIXED_UNITS:
+        bucket_ids = local // FIXED_UNITS[unit]
+    elif unit in WEEK_UNITS:
+        shift = EPOCH_WEEKDAY - WEEK_UNITS[unit]
+        bucket_ids = (local // 86400 + shift) // 7
+    elif unit == BUSINESS_DAY_UNIT:
+        days, inverse = np.unique(local // 86400, return_inverse=True)
+        bucket_ids = np.array(
+            [_day_bucket_id(unit, int(day)) for day in days], dtype=np.int64
+        )[inverse]
+    elif unit in FISCAL_UNITS:
+        bucket_ids = _fiscal_array(unit, local // 86400 + EPOCH_ORDINAL)
+    else:
+        months = (local // 86400).astype("datetime64[D]").astype("datetime64[M]")
+        months = months.astype(np.int64) + 1970 * 12
+        bucket_ids = CALENDAR_UNITS[unit][0](months)
+    if ids:
+        return bucket_ids
+
+    unique_ids, inverse = np.unique(bucket_ids, return_inverse=True)
+    starts = np.array(
+        [_start_timestamp(unit, int(bucket_id), tz) for bucket_id in unique_ids],
+        dtype=np.int64,
+    )
+    return starts[inverse]
+
+
+def _fiscal_array(unit, ordinals):
+    boundaries = np.array(get_fiscal_calendar().boundaries[unit], dtype=np.int64)
+    positions = np.searchsorted(boundaries, ordinals, side="right") - 1
+    outside = (positions < 0) | (positions >= len(boundaries) - 1)
+    if outside.any():
+        day = datetime.fromordinal(int(ordinals[np.argmax(outside)])).date()
+        raise ValueError("%s is out of the range of the fiscal calendar" % day)
+    return positions
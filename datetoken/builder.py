@@ -0,0 +1,155 @@
+import numbers
+
+from .ast import ModifierExpression, NowExpression, SnapExpression
+from .evaluator import evaluate_nodes, resolve_at
+from .exceptions import InvalidTokenException
+from .objects import Token
+from .parser import AMOUNT_MODIFIERS, MULTI_SNAP_MODIFIERS, SNAP_MODIFIERS
+from .token import TokenType
+
+_AMOUNT_UNITS = frozenset(AMOUNT_MODIFIERS)
+_SNAP_UNITS = frozenset(SNAP_MODIFIERS)
+
+
+class TokenBuilder(object):
+    """
+    Builds tokens out of ast nodes, without formatting nor parsing strings,
+    such as `now().minus(n, "d").snap_start("d")` for `now-<n>d/d`.
+
+    Builders are immutable, every step returns a new one, so partially
+    built tokens may be shared and extended. Units are validated as steps
+    are added, as the parser would. Builders are accepted wherever ast
+    nodes are, such as `next_rollover`, and `str()` gives their payload.
+    """
+
+    __slots__ = ("nodes",)
+
+    def __init__(self, nodes=None):
+        """
+        :param nodes: sequence of ast nodes, `now` being prepended if missing
+        """
+        nodes = tuple(nodes or ())
+        if not nodes or not isinstance(nodes[0], NowExpression):
+            nodes = (NowExpression(),) + nodes
+        self.nodes = nodes
+
+    def _error(self, message):
+        return InvalidTokenException(str(self), [message])
+
+    def _extend(self, node):
+        builder = TokenBuilder.__new__(TokenBuilder)
+        builder.nodes = self.nodes + (node,)
+        return builder
+
+    def _amount(self, amount):
+        if type(amount) is int:
+            return amount
+        if not isinstance(amount, numbers.Integral) or isinstance(amount, bool):
+            raise self._error("Expected an integer amount, got %r" % (amount,))
+        return int(amount)
+
+    def _modify(self, amount, unit, operator):
+        amount = self._amount(amount)
+        if amount < 0:
+            raise self._error("Expected a positive amount, got %d" % amount)
+        if unit not in _AMOUNT_UNITS:
+            raise self._error(
+                'Expected modifier literal as any of "%s", got "%s"'
+                % (AMOUNT_MODIFIERS, unit)
+            )
+        return self._extend(ModifierExpression(amount, unit, operator))
+
+    def _snap(self, unit, amount, operator):
+        amount = self._amount(amount)
+        if unit not in _SNAP_UNITS:
+            raise self._error(
+                'Expected snap MODIFIER token type, got "%s", choices are "%s"'
+                % (unit, str(SNAP_MODIFIERS))
+            )
+        if amount != 1:
+            if unit not in MULTI_SNAP_MODIFIERS:
+                raise self._error(
+                    'Expected snap MODIFIER with an amount as any of "%s", got "%s"'
+                    % (str(MULTI_SNAP_MODIFIERS), unit)
+                )
+            if amount < 1:
+                raise self._error("Expected snap amount above zero, got %d" % amount)
+        return self._extend(SnapExpression(unit, operator, amount))
+
+    def plus(self, amount, unit):
+        """
+        :param amount: non negative integer
+        :param unit: modifier, such as `d` or `bd`
+        :return: TokenBuilder adding `amount` units
+        :raises: InvalidTokenException
+        """
+        return self._modify(amount, unit, TokenType.PLUS)
+
+    def minus(self, amount, unit):
+        """
+        :param amount: non negative integer
+        :param unit: modifier, such as `d` or `bd`
+        :return: TokenBuilder subtracting `amount` units
+        :raises: InvalidTokenException
+        """
+        return self._modify(amount, unit, TokenType.MINUS)
+
+    def snap_start(self, unit, amount=1):
+        """
+        :param unit: snap modifier, such as `d`, `mon` or `Q`
+        :param amount: number of units, such as 15 for `/15m`
+        :return: TokenBuilder snapping to the start of the unit, `/unit`
+        :raises: InvalidTokenException
+        """
+        return self._snap(unit, amount, TokenType.SLASH)
+
+    def snap_end(self, unit, amount=1):
+        """
+        :param unit: snap modifier, such as `d`, `mon` or `Q`
+        :param amount: number of units, such as 15 for `@15m`
+        :return: TokenBuilder snapping to the end of the unit, `@unit`
+        :raises: InvalidTokenException
+        """
+        return self._snap(unit, amount, TokenType.AT)
+
+    def eval(self, at=None, tz=None):
+        """
+        :param at: {datetime.datetime} starting point. Defaults to utc now
+        :param tz: {str|pytz.timezone} time zone the token is evaluated in
+        :return: Aware datetime object
+        """
+        return evaluate_nodes(self.nodes, resolve_at(at, tz))
+
+    def to_token(self, at=None, tz=None):
+        """
+        :param at: {datetime.datetime} starting point. Defaults to utc now
+        :param tz: {str|pytz.timezone} time zone the token is evaluated in
+        :return: datetoken.objects.Token, as `eval_datetoken` returns
+        """
+        return Token(list(self.nodes), at=resolve_at(at, tz))
+
+    def __str__(self):
+        return "".join(str(node) for node in self.nodes)
+
+    def __repr__(self):
+        return "<TokenBuilder %s>" % self
+
+    def __eq__(self, other):
+        return isinstance(other, TokenBuilder) and str(self) == str(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(str(self))
+
+
+# Builders being immutable, every token is built out of the same `now`
+_NOW = TokenBuilder()
+
+
+def now():
+    """
+    :return: TokenBuilder for `now`, to be extended
+    """
+    return _NOW
@@ -0,0 +1,135 @@
+import asyncio
+import collections
+import functools
+import threading
+
+from .ast import get_utc_now
+from .evaluator import resolve_timezone, to_timestamp
+from .rollover import get_nodes, next_rollover
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "expired", "maxsize", "currsize"]
+)
+
+
+class _RolloverCache(object):
+    """
+    Results keyed by call arguments, each one held until the token rolls over
+    as of the call that computed it
+    """
+
+    def __init__(self, nodes, maxsize, tz, tz_arg, clock):
+        self.nodes = nodes
+        self.maxsize = maxsize
+        self.tz = tz
+        self.tz_arg = tz_arg
+        self.clock = clock
+        # Maps keys to (expires timestamp, result), least recently used first
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.expired = 0
+
+    def key(self, args, kwargs):
+        if not kwargs:
+            return args
+        return args + tuple(sorted(kwargs.items()))
+
+    def lookup(self, key, timestamp):
+        """
+        :return: (whether it was found, result)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if timestamp < entry[0]:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self.entries[key]
+                self.expired += 1
+            self.misses += 1
+        return False, None
+
+    def store(self, key, now, kwargs, result):
+        tz = self.tz
+        if self.tz_arg is not None and kwargs.get(self.tz_arg) is not None:
+            tz = resolve_timezone(kwargs[self.tz_arg])
+        expires = to_timestamp(next_rollover(self.nodes, now, tz))
+        with self.lock:
+            self.entries[key] = (expires, result)
+            self.entries.move_to_end(key)
+            if self.maxsize is not None and len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.expired, self.maxsize, len(self.entries)
+            )
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.expired = 0
+
+
+def cached_for(token, maxsize=128, tz=None, tz_arg="tz", clock=get_utc_now):
+    """
+    Decorator caching the results of a function per set of arguments until
+    a token rolls over, such as every hour for `now/h` or at midnight for
+    `now/d`, counting from the call that computed each result.
+
+    Entries are evicted least recently used first once `maxsize` is
+    reached. The cache is safe to share across threads, although concurrent
+    calls missing the same key all compute their result. Coroutine
+    functions are cached too, their awaited results being stored.
+
+    The decorated function gains `cache_info()` and `cache_clear()`, as
+    with `functools.lru_cache`.
+
+    :param token: string payload or `datetoken.objects.Token` whose rollover
+        expires the entries
+    :param maxsize: maximum number of entries, None for no bound
+    :param tz: {str|pytz.timezone} time zone the token is evaluated in
+    :param tz_arg: keyword argument of the function which, when given,
+        overrides the time zone of the call. None to disable
+    :param clock: callable returning the current date, naive dates being
+        UTC. Defaults to utc now
+    :return: decorator
+    :raises: InvalidTokenException
+    """
+    nodes = get_nodes(token)
+    tz = resolve_timezone(tz)
+
+    def decorator(function):
+        cache = _RolloverCache(nodes, maxsize, tz, tz_arg, clock)
+
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                key = cache.key(args, kwargs)
+                now = cache.clock()
+                found, result = cache.lookup(key, to_timestamp(now))
+                if not found:
+                    result = await function(*args, **kwargs)
+                    cache.store(key, now, kwargs, result)
+                return result
+
+        else:
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                key = cache.key(args, kwargs)
+                now = cache.clock()
+                found, result = cache.lookup(key, to_timestamp(now))
+                if not found:
+                    result = function(*args, **kwargs)
+                    cache.store(key, now, kwargs, result)
+                return result
+
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
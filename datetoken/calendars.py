@@ -0,0 +1,569 @@
+import bisect
+import calendar
+
+from array import array
+from datetime import date
+from datetime import timedelta as td
+
+# Python's date ordinals start on Monday, 0001-01-01
+WEEKEND = (5, 6)
+
+
+def _to_ordinal(day):
+    if isinstance(day, int):
+        return day
+    return day.toordinal()
+
+
+class HolidayCalendar(object):
+    """
+    Business days calendar. Holidays are kept as a sorted array of date
+    ordinals, so that business days can be counted with plain week
+    arithmetic plus a bisection over holidays, instead of walking day by day.
+    """
+
+    def __init__(self, holidays=(), weekend=WEEKEND):
+        """
+        :param holidays: iterable of dates, datetimes or date ordinals
+        :param weekend: week days, Monday being 0, which are not business days
+        """
+        self.weekend = frozenset(weekend)
+        if len(self.weekend) >= 7:
+            raise ValueError("A week needs at least one business day")
+        self.holidays = sorted(
+            {
+                ordinal
+                for ordinal in (_to_ordinal(holiday) for holiday in holidays)
+                if (ordinal - 1) % 7 not in self.weekend
+            }
+        )
+        # Business days within a week up to each week day, both included
+        self._week_count = []
+        count = 0
+        for weekday in range(7):
+            if weekday not in self.weekend:
+                count += 1
+            self._week_count.append(count)
+        self._per_week = count
+
+    def is_business_day(self, day):
+        """
+        :param day: date, datetime or date ordinal
+        :return: bool
+        """
+        ordinal = _to_ordinal(day)
+        if (ordinal - 1) % 7 in self.weekend:
+            return False
+        position = bisect.bisect_left(self.holidays, ordinal)
+        return position == len(self.holidays) or self.holidays[position] != ordinal
+
+    def _weekdays_until(self, ordinal):
+        """
+        Business week days from 0001-01-01 up to `ordinal`, both included,
+        holidays aside
+        """
+        weeks, weekday = divmod(ordinal - 1, 7)
+        return weeks * self._per_week + self._week_count[weekday]
+
+    def _nth_weekday(self, count):
+        """
+        Inverse of `_weekdays_until`. Ordinal of the earliest business week
+        day by which `count` of them have gone by
+        """
+        weeks, remainder = divmod(count - 1, self._per_week)
+        weekday = self._week_count.index(remainder + 1)
+        return weeks * 7 + weekday + 1
+
+    def _holidays_before(self, ordinal):
+        return bisect.bisect_left(self.holidays, ordinal)
+
+    def business_days_until(self, day):
+        """
+        :param day: date, datetime or date ordinal
+        :return: business days from 0001-01-01 up to `day`, both included
+        """
+        ordinal = _to_ordinal(day)
+        return self._weekdays_until(ordinal) - bisect.bisect_right(
+            self.holidays, ordinal
+        )
+
+    def _nth_business_day(self, count):
+        """
+        Ordinal of the earliest business day by which `count` business days
+        have gone by. Holidays push the result forward, which may in turn
+        step over more holidays, until no more are found
+        """
+        skipped = 0
+        while True:
+            ordinal = self._nth_weekday(count + skipped)
+            holidays = self._holidays_before(ordinal)
+            if holidays != skipped:
+                skipped = holidays
+            elif not self.is_business_day(ordinal):
+                skipped += 1
+            else:
+                return ordinal
+
+    def add_business_days(self, day, amount):
+        """
+        Moves a date a number of business days forward or backwards. Dates
+        which are not business days move from the closest business day in
+        the direction of the move, so one business day after Saturday is
+        Monday, and one business day before it is Friday.
+        :param day: date, datetime or date ordinal
+        :param amount: number of business days, negative to go backwards
+        :return: date ordinal
+        """
+        ordinal = _to_ordinal(day)
+        count = self.business_days_until(ordinal)
+        if amount < 0 and not self.is_business_day(ordinal):
+            count += 1
+        return self._nth_business_day(count + amount)
+
+    def previous_business_day(self, day):
+        """
+        :param day: date, datetime or date ordinal
+        :return: ordinal of `day` if it is a business day, or the closest
+            business day before it otherwise
+        """
+        return self._nth_business_day(self.business_days_until(day))
+
+    def next_business_day(self, day):
+        """
+        :param day: date, datetime or date ordinal
+        :return: ordinal of `day` if it is a business day, or the closest
+            business day after it otherwise
+        """
+        ordinal = _to_ordinal(day)
+        if self.is_business_day(ordinal):
+            return ordinal
+        return self.add_business_days(ordinal, 1)
+
+
+_holiday_calendar = HolidayCalendar()
+
+
+def set_holiday_calendar(calendar):
+    """
+    Registers the calendar business day modifiers and snaps, `bd`, use.
+    Defaults to a calendar with Saturdays and Sundays as weekend and no
+    holidays.
+    :param calendar: HolidayCalendar, or None to go back to the default
+    """
+    global _holiday_calendar
+    _holiday_calendar = HolidayCalendar() if calendar is None else calendar
+
+
+def get_holiday_calendar():
+    """
+    :return: HolidayCalendar registered with `set_holiday_calendar`
+    """
+    return _holiday_calendar
+
+
+def _move_days(dt, ordinal):
+    return dt + td(days=ordinal - dt.toordinal())
+
+
+def add_business_days(dt, amount):
+    """
+    :param dt: datetime.datetime
+    :param amount: number of business days, negative to go backwards
+    :return: datetime object with the same time of day
+    """
+    return _move_days(dt, _holiday_calendar.add_business_days(dt, amount))
+
+
+def start_business_day(dt):
+    ordinal = _holiday_calendar.previous_business_day(dt)
+    return _move_days(dt, ordinal).replace(hour=0, minute=0, second=0)
+
+
+def end_business_day(dt):
+    """
+    End of the business day `start_business_day` starts, so that days which
+    are not business days belong to the previous business day, as with
+    `bucket`
+    """
+    ordinal = _holiday_calendar.previous_business_day(dt)
+    return _move_days(dt, ordinal).replace(hour=23, minute=59, second=59)
+
+
+class PeriodCalendar(object):
+    """
+    Calendar whose years, quarters and months (or periods) are looked up in
+    tables of precomputed boundaries, this is, sorted arrays holding the
+    ordinal of the first day of each of them. Snapping a date becomes a
+    bisection over the right table.
+    Units are `FY` for years, `FQ` for quarters and `FM` for months.
+    """
+
+    units = ("FY", "FQ", "FM")
+
+    def __init__(self, years, months):
+        """
+        :param years: sorted sequence with the ordinal of the first day of
+            each year, plus the first day after the last one
+        :param months: sorted sequence with the ordinal of the first day of
+            each month, plus the first day after the last one. Quarters are
+            made of three consecutive months
+        """
+        self.boundaries = {
+            "FY": list(years),
+            "FQ": list(months[::3]),
+            "FM": list(months),
+        }
+
+    def position(self, unit, day):
+        """
+        :param unit: any of `FY`, `FQ`, `FM`
+        :param day: date, datetime or date ordinal
+        :return: index of the year, quarter or month the day lies in
+        :raises: ValueError if the day is out of the range of the calendar
+        """
+        starts = self.boundaries[unit]
+        position = bisect.bisect_right(starts, _to_ordinal(day)) - 1
+        if position < 0 or position >= len(starts) - 1:
+            raise ValueError("%s is out of the range of the fiscal calendar" % day)
+        return position
+
+    def start(self, unit, day):
+        """
+        :return: ordinal of the first day of the period `day` lies in
+        """
+        return self.boundaries[unit][self.position(unit, day)]
+
+    def end(self, unit, day):
+        """
+        :return: ordinal of the last day of the period `day` lies in
+        """
+        return self.boundaries[unit][self.position(unit, day) + 1] - 1
+
+
+class FiscalCalendar(PeriodCalendar):
+    """
+    Fiscal years made of calendar months, starting on the first day of a
+    given month.
+    """
+
+    def __init__(self, start_month=1, start_year=1970, end_year=2100):
+        """
+        :param start_month: month fiscal years start on, January being 1
+        :param start_year: first calendar year covered
+        :param end_year: last calendar year covered
+        """
+        months = []
+        for year in range(start_year, end_year + 2):
+            for month in range(start_month - 1, start_month + 11):
+                months.append(date(year + month // 12, month % 12 + 1, 1).toordinal())
+        super(FiscalCalendar, self).__init__(months[::12], months[: 1 - 12])
+        self.start_month = start_month
+
+
+class RetailCalendar(PeriodCalendar):
+    """
+    52/53 week retail calendar. Years end on the last given week day of a
+    month, or the one nearest to the end of that month, and are split into
+    four quarters of 13 weeks, whose months follow a weekly pattern such as
+    4-4-5. Long years add their extra week to the last month.
+    """
+
+    def __init__(
+        self,
+        pattern=(4, 4, 5),
+        end_month=1,
+        end_weekday=5,
+        nearest=False,
+        start_year=1970,
+        end_year=2100,
+    ):
+        """
+        :param pattern: weeks of each month of a quarter, adding up to 13
+        :param end_month: month fiscal years end in, January being 1
+        :param end_weekday: week day fiscal years end on, Monday being 0
+        :param nearest: whether years end on the week day nearest to the end
+            of `end_month` rather than on the last one within it
+        :param start_year: first fiscal year covered, named after the
+            calendar year it ends in
+        :param end_year: last fiscal year covered
+        """
+        if sum(pattern) != 13 or len(pattern) != 3:
+            raise ValueError("Quarters are made of three months of 13 weeks")
+        self.pattern = tuple(pattern)
+        self.end_month = end_month
+        self.end_weekday = end_weekday
+        self.nearest = nearest
+
+        years = [
+            self.year_end(year) + 1 for year in range(start_year - 1, end_year + 1)
+        ]
+        months = []
+        for start, following in zip(years, years[1:]):
+            lengths = [weeks for _ in range(4) for weeks in self.pattern]
+            # 53 week years
+            lengths[-1] += (following - start) // 7 - 52
+            for weeks in lengths:
+                months.append(start)
+                start += weeks * 7
+        months.append(years[-1])
+        super(RetailCalendar, self).__init__(years, months)
+
+    def year_end(self, year):
+        """
+        :param year: fiscal year, named after the calendar year it ends in
+        :return: ordinal of the last day of the fiscal year
+        """
+        following = self.end_month % 12 + 1
+        last = date(year + self.end_month // 12, following, 1).toordinal() - 1
+        behind = ((last - 1) % 7 - self.end_weekday) % 7
+        if self.nearest and behind > 3:
+            return last + 7 - behind
+        return last - behind
+
+
+_fiscal_calendar = FiscalCalendar()
+
+
+def set_fiscal_calendar(calendar):
+    """
+    Registers the calendar fiscal snaps, `FY`, `FQ` and `FM`, use. Defaults
+    to a fiscal calendar matching calendar years.
+    :param calendar: PeriodCalendar, or None to go back to the default
+    """
+    global _fiscal_calendar
+    _fiscal_calendar = FiscalCalendar() if calendar is None else calendar
+
+
+def get_fiscal_calendar():
+    """
+    :return: PeriodCalendar registered with `set_fiscal_calendar`
+    """
+    return _fiscal_calendar
+
+
+def create_start_fiscal(unit):
+    def start_fiscal(dt):
+        ordinal = _fiscal_calendar.start(unit, dt)
+        return _move_days(dt, ordinal).replace(hour=0, minute=0, second=0)
+
+    return start_fiscal
+
+
+def create_end_fiscal(unit):
+    def end_fiscal(dt):
+        ordinal = _fiscal_calendar.end(unit, dt)
+        return _move_days(dt, ordinal).replace(hour=23, minute=59, second=59)
+
+    return end_fiscal
+
+
+# Week day snaps, Monday being 0
+WEEKDAY_SNAPS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Snaps `DayTable` is able to serve
+TABLE_SNAPS = tuple(
+    operator + modifier
+    for operator in ("/", "@")
+    for modifier in ("w", "bw", "M", "Q", "Y") + WEEKDAY_SNAPS
+)
+# Snaps `DayTable` serves by default, those for which a lookup beats their
+# arithmetic. Others take a single `replace` or `timedelta` already
+DEFAULT_TABLE_SNAPS = ("@w", "@bw", "@M", "@Y")
+_START_OF_DAY = {"hour": 0, "minute": 0, "second": 0}
+_END_OF_DAY = {"hour": 23, "minute": 59, "second": 59}
+
+
+def _pack(day):
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+class DayTable(object):
+    """
+    Calendar of precomputed days within a window of years, indexed by date
+    ordinal. Every day holds its week day and the month, quarter and year it
+    lies in, through the first and last day of each, packed as `YYYYMMDD`
+    integers into compact arrays. Month, quarter, year and week snaps, week
+    day snaps included, may then become a table lookup plus a single
+    `replace`, rather than chains of `timedelta` and `relativedelta`
+    arithmetic. Only those the lookup speeds up are served by default.
+    Results are those of the snaps of `SnapExpression`, quirks included,
+    such as `@M` falling short on days the following month lacks.
+    Dates outside the window are snapped as usual.
+    """
+
+    columns = (
+        "days",
+        "weekdays",
+        "month_starts",
+        "month_ends",
+        "quarter_starts",
+        "quarter_ends",
+        "year_starts",
+        "year_ends",
+    )
+
+    def __init__(self, start_year=1970, end_year=2100, snaps=DEFAULT_TABLE_SNAPS):
+        """
+        :param start_year: first year covered
+        :param end_year: last year covered
+        :param snaps: snaps served by the table, any of `TABLE_SNAPS`
+        :raises: ValueError for snaps the table cannot serve
+        """
+        unknown = set(snaps) - set(TABLE_SNAPS)
+        if unknown:
+            raise ValueError(
+                'Expected snaps as any of "%s", got "%s"'
+                % (TABLE_SNAPS, ", ".join(sorted(unknown)))
+            )
+        self.snaps = tuple(snaps)
+        self.start_year = start_year
+        self.end_year = end_year
+        self.first = date(start_year, 1, 1).toordinal()
+        self.size = date(end_year, 12, 31).toordinal() - self.first + 1
+        for column in self.columns:
+            setattr(self, column, array("i"))
+        self.weekdays = array("b")
+        for year in range(start_year, end_year + 1):
+            year_start, year_end = _pack(date(year, 1, 1)), year * 10000 + 1231
+            for month in range(1, 13):
+                self._add_month(year, month, year_start, year_end)
+
+        self.starts = {
+            "w": self._week_snap(0, _START_OF_DAY),
+            "bw": self._week_snap(0, _START_OF_DAY),
+            "M": self._column_snap(self.month_starts, _START_OF_DAY),
+            "Q": self._column_snap(self.quarter_starts, _START_OF_DAY),
+            "Y": self._column_snap(self.year_starts, _START_OF_DAY),
+        }
+        self.ends = {
+            "w": self._week_snap(6, _END_OF_DAY),
+            "bw": self._week_snap(4, _END_OF_DAY),
+            "M": self._column_snap(self.month_ends, _END_OF_DAY),
+            "Q": self._column_snap(self.quarter_ends, _END_OF_DAY),
+            "Y": self._column_snap(self.year_ends, _END_OF_DAY),
+        }
+        for weekday, modifier in enumerate(WEEKDAY_SNAPS):
+            self.starts[modifier] = self._weekday_snap(weekday, -1)
+            self.ends[modifier] = self._weekday_snap(weekday, 1)
+        self.starts = {m: s for m, s in self.starts.items() if "/" + m in snaps}
+        self.ends = {m: s for m, s in self.ends.items() if "@" + m in snaps}
+
+    def _add_month(self, year, month, year_start, year_end):
+        quarter = (month - 1) // 3
+        quarter_start = year * 10000 + (quarter * 3 + 1) * 100 + 1
+        quarter_end = (
+            year * 10000 + (quarter * 3 + 3) * 100 + (30 if quarter in (1, 2) else 31)
+        )
+        following_year, following_month = year + month // 12, month % 12 + 1
+        following_days = calendar.monthrange(following_year, following_month)[1]
+        first = date(year, month, 1)
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            # `@M` adds a month, clipped to its last day, then goes back as
+            # many days as the day of the month
+            month_end = date(
+                following_year, following_month, min(day, following_days)
+            ).toordinal()
+            self.days.append(year * 10000 + month * 100 + day)
+            self.weekdays.append((first.toordinal() + day - 2) % 7)
+            self.month_starts.append(_pack(first))
+            self.month_ends.append(_pack(date.fromordinal(month_end - day)))
+            self.quarter_starts.append(quarter_start)
+            self.quarter_ends.append(quarter_end)
+            self.year_starts.append(year_start)
+            self.year_ends.append(year_end)
+
+    @property
+    def nbytes(self):
+        """
+        :return: bytes taken by the arrays of the table
+        """
+        return sum(
+            len(getattr(self, column)) * getattr(self, column).itemsize
+            for column in self.columns
+        )
+
+    def _column_snap(self, column, time):
+        first, size = self.first, self.size
+        hour, minute, second = time["hour"], time["minute"], time["second"]
+
+        def snap(dt):
+            index = dt.toordinal() - first
+            if not 0 <= index < size:
+                return None
+            packed = column[index]
+            return dt.replace(
+                year=packed // 10000,
+                month=packed // 100 % 100,
+                day=packed % 100,
+                hour=hour,
+                minute=minute,
+                second=second,
+            )
+
+        return snap
+
+    def _day_snap(self, offset, time=None):
+        """
+        :param offset: callable taking the week day of a date and returning
+            the number of days to move it by
+        :param time: dict with the hour, minute and second to set, if any
+        """
+        first, days, weekdays = self.first, self.days, self.weekdays
+        size = len(days)
+        time = time or {}
+
+        def snap(dt):
+            index = dt.toordinal() - first
+            if not 0 <= index < size:
+                return None
+            index += offset(weekdays[index])
+            if not 0 <= index < size:
+                return None
+            packed = days[index]
+            return dt.replace(
+                year=packed // 10000,
+                month=packed // 100 % 100,
+                day=packed % 100,
+                **time
+            )
+
+        return snap
+
+    def _week_snap(self, weekday, time):
+        return self._day_snap(lambda current: weekday - current, time)
+
+    def _weekday_snap(self, weekday, direction):
+        """
+        Week day snaps keep the time of day, going back to the closest such
+        week day, or forward for `direction` 1
+        """
+        return self._day_snap(
+            lambda current: direction * ((direction * (weekday - current)) % 7)
+        )
+
+    def __str__(self):
+        return "Day table for %d-%d, %d days, %.1f KiB" % (
+            self.start_year,
+            self.end_year,
+            self.size,
+            self.nbytes / 1024.0,
+        )
+
+
+_day_table = None
+
+
+def set_day_table(table):
+    """
+    Registers the table month, quarter, year and week snaps are looked up
+    in. No table is used by default.
+    :param table: DayTable, or None to go back to snapping arithmetically
+    """
+    global _day_table
+    _day_table = table
+
+
+def get_day_table():
+    """
+    :return: DayTable registered with `set_day_table`, if any
+    """
+    return _day_table
@@ -0,0 +1,272 @@
+import math
+
+import pytz
+
+from . import DEFAULT_TOKEN
+from .ast import SnapExpression, get_utc_now
+from .bounds import offset_bounds
+from .bucket import fixed_unit
+from .evaluator import (
+    evaluate_nodes,
+    localize,
+    resolve_at,
+    resolve_timezone,
+    to_timestamp,
+)
+from .rollover import get_nodes, next_rollover
+from .token import TokenType
+
+# Candidate resolutions of sliding windows, finest first
+RESOLUTIONS = ("5s", "10s", "30s", "m", "5m", "15m", "h", "6h", "d", "w")
+# Sub-buckets sliding windows are split into, at least, when picking their
+# resolution
+MIN_BUCKETS = 60
+# Coarsest resolution UTC offsets are a multiple of, so that buckets of time
+# zones other than UTC start on their snaps
+OFFSET_RESOLUTION = "15m"
+
+
+def _natural_resolution(nodes, span, utc):
+    """
+    Windows starting at a fixed length snap, such as `now/d` or
+    `now-1h/15m`, slide one whole bucket at a time, so counting per bucket
+    is exact. Other windows are split into sub-buckets short enough for
+    their edges to be accurate.
+    """
+    last = nodes[-1]
+    if isinstance(last, SnapExpression) and last.operator == TokenType.SLASH:
+        unit = last.modifier
+        if last.amount != 1:
+            unit = "%d%s" % (last.amount, unit)
+        length = fixed_unit(unit)
+        if length is not None:
+            if not utc and length[0] > fixed_unit(OFFSET_RESOLUTION)[0]:
+                return OFFSET_RESOLUTION
+            return unit
+    for unit in RESOLUTIONS[::-1]:
+        if span >= MIN_BUCKETS * fixed_unit(unit)[0]:
+            return unit
+    return RESOLUTIONS[0]
+
+
+class WindowCounter(object):
+    """
+    Counts events, and sums their values, within a window delimited by a
+    pair of tokens, such as `now-1h` .. `now` or `now/d` .. `now`, without
+    keeping the events around.
+
+    Events are added to sub-buckets of a fixed resolution, kept in a ring
+    buffer reaching from the earliest the window can start up to now, so
+    memory is bounded no matter how many events come in. As time goes by,
+    buckets falling out of the window are evicted one by one and deducted
+    from running totals, and so are those past the end of windows ending
+    before now, so reads take constant time.
+
+    Sub-buckets are laid out over elapsed time, as the instants tokens
+    evaluate to are compared, so counts agree with `TokenRange.contains`.
+    Counts are exact to the resolution. Events within the buckets holding
+    the start and the end of the window are counted in full. Time is
+    expected to move forward, events older than the window are dropped.
+    """
+
+    def __init__(
+        self,
+        from_token,
+        to_token=DEFAULT_TOKEN,
+        resolution=None,
+        tz=None,
+        clock=get_utc_now,
+    ):
+        """
+        :param from_token: string payload of the start of the window
+        :param to_token: string payload of the end of the window
+        :param resolution: fixed length snap unit of sub-buckets, such as
+            `m`, `15m` or `h`. Defaults to the snap the window starts at, if
+            any, or to the coarsest resolution splitting the window into 60
+            sub-buckets. Snaps of time zones other than UTC start on a
+            multiple of 15 minutes, which bounds their default resolution
+        :param tz: {str|pytz.timezone} time zone tokens are evaluated in
+        :param clock: callable returning the current date, naive dates being
+            UTC
+        :raises: InvalidTokenException, UnsupportedTokenException if the
+            window cannot be bounded, ValueError for resolutions without a
+            fixed length
+        """
+        self._from = get_nodes(from_token)
+        self._to = get_nodes(to_token)
+        self._tz = resolve_timezone(tz)
+        self._clock = clock
+
+        # Events are kept from the earliest the window may start up to now,
+        # even if the window ends before
+        low, _ = offset_bounds(self._from)
+        _, high = offset_bounds(self._to)
+        low = min(low.total_seconds(), 0)
+        high = max(high.total_seconds(), 0)
+        span = high - low
+        if resolution is None:
+            resolution = _natural_resolution(
+                self._from, span, self._tz in (None, pytz.UTC)
+            )
+        unit = fixed_unit(resolution)
+        if unit is None:
+            raise ValueError(
+                'Expected a resolution of fixed length, such as "m" or "15m", '
+                'got "%s"' % resolution
+            )
+        self.resolution = resolution
+        self._length, self._anchor = unit
+        self.size = int(math.ceil(span / self._length)) + 2
+
+        self._ids = [None] * self.size
+        self._counts = [0] * self.size
+        self._sums = [0] * self.size
+        # Lowest bucket id of the window, highest one seen so far, and lowest
+        # one within the running totals, which are bounded by the ring
+        self._low = None
+        self._high = None
+        self._oldest = None
+        self._count = 0
+        self._sum = 0
+        # Highest bucket id of the window, and running totals of the buckets
+        # past it, which the totals above hold too
+        self._end = None
+        self._past_count = 0
+        self._past_sum = 0
+        # Bucket ids delimiting the window, until any of its tokens rolls
+        # over
+        self._window = None
+        self._evaluated = None
+        self._expires = None
+
+    def _now(self, at):
+        return localize(resolve_at(at or self._clock()), pytz.UTC)
+
+    def _bucket_id(self, at):
+        epoch = int(math.floor(to_timestamp(at)))
+        return (epoch - self._anchor) // self._length
+
+    def _window_ids(self, now):
+        if self._expires is None or not self._evaluated <= now < self._expires:
+            start = resolve_at(now, self._tz)
+            self._window = (
+                self._bucket_id(evaluate_nodes(self._from, start)),
+                self._bucket_id(evaluate_nodes(self._to, start)),
+            )
+            self._evaluated = now
+            self._expires = min(
+                next_rollover(self._from, now, self._tz),
+                next_rollover(self._to, now, self._tz),
+            )
+        return self._window
+
+    def _shift(self, low, high):
+        """
+        Moves the lowest bucket of the window to `low` and the highest bucket
+        seen to `high`, keeping the running totals over the buckets between
+        both, within the reach of the ring. Buckets left out stay in the
+        ring until overwritten, since the start of the window may move back,
+        as tokens keep the UTC offset of their starting point across
+        daylight saving transitions
+        """
+        oldest = max(low, high - self.size + 1)
+        if oldest > self._oldest:
+            if oldest > self._high:
+                self._count = self._sum = 0
+                self._past_count = self._past_sum = 0
+                ids, sign = (), -1
+            else:
+                ids, sign = range(self._oldest, oldest), -1
+        else:
+            ids, sign = range(oldest, self._oldest), 1
+        end = self._end
+        for bucket_id in ids:
+            slot = bucket_id % self.size
+            if self._ids[slot] == bucket_id:
+                self._count += sign * self._counts[slot]
+                self._sum += sign * self._sums[slot]
+                if end is not None and bucket_id > end:
+                    self._past_count += sign * self._counts[slot]
+                    self._past_sum += sign * self._sums[slot]
+        self._low, self._high, self._oldest = low, high, oldest
+
+    def _move_end(self, end):
+        """
+        Moves the highest bucket of the window to `end`, keeping the running
+        totals of the buckets past it, within the running totals of the
+        ring. Windows ending at a moving token, such as `now-1h`, move their
+        end one bucket at a time
+        """
+        if end == self._end:
+            return
+        if self._end is None:
+            ids, sign = range(max(end + 1, self._oldest), self._high + 1), 1
+        elif end > self._end:
+            ids = range(max(self._end + 1, self._oldest), min(end, self._high) + 1)
+            sign = -1
+        else:
+            ids = range(max(end + 1, self._oldest), min(self._end, self._high) + 1)
+            sign = 1
+        for bucket_id in ids:
+            slot = bucket_id % self.size
+            if self._ids[slot] == bucket_id:
+                self._past_count += sign * self._counts[slot]
+                self._past_sum += sign * self._sums[slot]
+        self._end = end
+
+    def add(self, value=1, at=None):
+        """
+        Records an event
+        :param value: amount added to the sum of the window
+        :param at: {datetime.datetime} when the event happened. Defaults to
+            the current time of the clock
+        :return: whether the event was recorded, rather than being too old
+        """
+        bucket_id = self._bucket_id(self._now(at))
+        if self._high is None:
+            low = bucket_id if self._low is None else self._low
+            self._low, self._high, self._oldest = low, bucket_id, low
+        if bucket_id <= self._high - self.size:
+            return False
+        if bucket_id > self._high:
+            self._shift(self._low, bucket_id)
+        slot = bucket_id % self.size
+        if self._ids[slot] != bucket_id:
+            # Whatever the slot held is out of the reach of the ring already
+            self._ids[slot] = bucket_id
+            self._counts[slot] = self._sums[slot] = 0
+        self._counts[slot] += 1
+        self._sums[slot] += value
+        if bucket_id >= self._oldest:
+            self._count += 1
+            self._sum += value
+            if self._end is not None and bucket_id > self._end:
+                self._past_count += 1
+                self._past_sum += value
+        return True
+
+    def _totals(self, at):
+        now = self._now(at)
+        low, high = self._window_ids(now)
+        if self._high is None:
+            return 0, 0
+        # The ring reaches up to now, so older events are dropped as of reads
+        self._shift(low, max(self._high, self._bucket_id(now)))
+        self._move_end(high)
+        return self._count - self._past_count, self._sum - self._past_sum
+
+    def count(self, at=None):
+        """
+        :param at: {datetime.datetime} when the window is evaluated.
+            Defaults to the current time of the clock
+        :return: number of events within the window
+        """
+        return self._totals(at)[0]
+
+    def sum(self, at=None):
+        """
+        :param at: {datetime.datetime} when the window is evaluated.
+            Defaults to the current time of the clock
+        :return: sum of the values of the events within the window
+        """
+        return self._totals(at)[1]
@@ -1,13 +1,20 @@
+import collections
+import threading
+
 import pytz
 import six
 
+from functools import lru_cache, reduce
+
 from . import DEFAULT_TOKEN
 from .ast import get_utc_now
 from .exceptions import InvalidTokenException
-from .lexer import Lexer
+from .lexer import BUFFER_TYPES, Lexer, strip_buffer
 from .objects import Token
 from .parser import Parser
 
+PARSE_CACHE_SIZE = 1024
+
 
 def is_naive(dt):
     """
@@ -73,34 +80,182 @@ def localize_naive(datetime_obj, tz_from, tz_to):
     return localize(aware_datetime, tz_d)
 
 
-def eval_datetoken(token, **kwargs):
+def to_timestamp(datetime_obj):
     """
-    Evaluates a token
-    :param token:
-    :param kwargs:
-        - at: {datetime.datetime} starting point or, `now`'s value in other
-            words
-        - tz: {str|pytz.timezone} a pytz object or their string repr.
-    :return: datetoken.object structure that carries token meta-information
+    Seconds elapsed since the unix epoch
+    :param datetime_obj: datetime.datetime. Naive objects are treated as UTC
+    :return: float
+    """
+    if is_naive(datetime_obj):
+        datetime_obj = make_aware(datetime_obj, pytz.UTC)
+    return datetime_obj.timestamp()
+
+
+def resolve_timezone(tz):
+    """
+    :param tz: {str|pytz.timezone|None} a pytz object or their string repr.
+    :return: tzinfo object, or None if no tz was given
+    """
+    if isinstance(tz, six.string_types):
+        return pytz.timezone(tz)
+    return tz
+
+
+def resolve_at(at=None, tz=None):
+    """
+    Computes the value of `now` tokens are evaluated against
+    :param at: {datetime.datetime} starting point. Defaults to utc now
+    :param tz: {str|pytz.timezone} time zone to localize the starting point to
+    :return: Aware datetime object
     """
-    now = kwargs.get("at") or get_utc_now()
-    tz_name = kwargs.get("tz")
-    tz = pytz.timezone(tz_name) if isinstance(tz_name, six.string_types) else tz_name
+    now = at or get_utc_now()
+    tz = resolve_timezone(tz)
     # Coerce tz unaware tokens to UTC as default behaviour
     if is_naive(now):
         now = make_aware(now, pytz.UTC)
     if tz:
         now = localize(now, tz)
+    return now
 
-    lexer = Lexer(token)
+
+def _parse_lexer(lexer):
     parser = Parser(lexer)
     ast_nodes = parser.parse()
 
     if not ast_nodes:
-        raise InvalidTokenException(lexer.input)
+        raise InvalidTokenException(lexer.text)
     if parser.errors:
-        raise InvalidTokenException(lexer.input, errors=parser.errors)
-    return Token(ast_nodes, at=now)
+        raise InvalidTokenException(lexer.text, errors=parser.errors)
+    return tuple(ast_nodes)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_datetoken(token):
+    return _parse_lexer(Lexer(token))
+
+
+# Tokens parsed ahead of time, which unlike the parse cache are never evicted
+_precompiled = {}
+# Parse cache of tokens given as buffers, keyed by their bytes, least
+# recently used first. Shared across threads, hence the lock
+_buffer_cache = collections.OrderedDict()
+_buffer_lock = threading.Lock()
+
+
+def _parse_buffer(buffer, offset=0, length=None):
+    view = strip_buffer(buffer, offset, length)
+    # Only the bytes of the token are copied, to look them up. That is
+    # cheaper than hashing memory views, and keeps cached tokens from holding
+    # on to whole buffers
+    key = bytes(view)
+    nodes = _precompiled.get(key)
+    if nodes is not None:
+        return nodes
+    with _buffer_lock:
+        nodes = _buffer_cache.get(key)
+        if nodes is not None:
+            _buffer_cache.move_to_end(key)
+            return nodes
+    # Lexed straight out of the buffer
+    nodes = _parse_lexer(Lexer(view))
+    with _buffer_lock:
+        _buffer_cache[key] = nodes
+        if len(_buffer_cache) > PARSE_CACHE_SIZE:
+            _buffer_cache.popitem(last=False)
+    return nodes
+
+
+def precompile(tokens):
+    """
+    Parses tokens ahead of time, keeping them around for good. Tokens are
+    registered as bytes too, to be found when parsed out of buffers.
+    :param tokens: iterable of string payloads
+    :return: dict mapping each token to its ast nodes
+    :raises: InvalidTokenException
+    """
+    compiled = {}
+    for token in tokens:
+        compiled[token] = _precompiled[token] = _parse_datetoken(token)
+        _precompiled[token.strip().encode("utf8")] = compiled[token]
+    return compiled
+
+
+def parse_datetoken(token, offset=0, length=None):
+    """
+    Lexes and parses a token into its ast nodes. Results are cached per
+    token string, so repeatedly evaluated tokens are only parsed once.
+    Tokens might be read straight out of a larger buffer, such as a query
+    string or a message payload, without decoding nor copying it.
+    :param token: string payload, or bytes, bytearray or memoryview holding
+        it
+    :param offset: index the token starts at within `token`
+    :param length: length of the token. Defaults to the rest of `token`
+    :return: tuple of ast nodes
+    :raises: InvalidTokenException
+    """
+    if isinstance(token, BUFFER_TYPES):
+        return _parse_buffer(token, offset, length)
+    if offset or length is not None:
+        token = token[offset : None if length is None else offset + length]
+    nodes = _precompiled.get(token)
+    if nodes is None:
+        nodes = _parse_datetoken(token)
+    return nodes
+
+
+def evaluate_nodes(nodes, at):
+    """
+    Applies ast nodes sequentially, starting with `at`
+    :param nodes: sequence of ast nodes
+    :param at: datetime, already localized
+    :return: datetime.datetime
+    """
+    return reduce(lambda accumulated, node: node.get_value(accumulated), nodes, at)
+
+
+def eval_datetoken(token, **kwargs):
+    """
+    Evaluates a token
+    :param token:
+    :param kwargs:
+        - at: {datetime.datetime} starting point or, `now`'s value in other
+            words
+        - tz: {str|pytz.timezone} a pytz object or their string repr.
+    :return: datetoken.object structure that carries token meta-information
+    """
+    now = resolve_at(kwargs.get("at"), kwargs.get("tz"))
+    return Token(list(parse_datetoken(token)), at=now)
+
+
+def eval_for_timezones(token, tzs, at=None):
+    """
+    Evaluates a token in many time zones at once. The token is parsed once
+    and every time zone shares the same starting point.
+    As pytz keeps the UTC offset of a date fixed while modifiers and snaps
+    are applied, zones which share the same offset at the starting point
+    also share the same result, which is only computed once.
+    :param token: string payload
+    :param tzs: iterable of time zone names or tzinfo objects
+    :param at: {datetime.datetime} starting point. Defaults to utc now
+    :return: dict mapping each given time zone to the evaluated datetime
+    :raises: InvalidTokenException
+    """
+    nodes = parse_datetoken(token)
+    now = resolve_at(at, pytz.UTC)
+    results = {}
+    by_offset = {}
+    for tz_key in tzs:
+        tz = resolve_timezone(tz_key)
+        local_now = localize(now, tz)
+        if not hasattr(tz, "normalize"):
+            # Other tz implementations recompute offsets after arithmetic
+            results[tz_key] = evaluate_nodes(nodes, local_now)
+            continue
+        offset = local_now.utcoffset()
+        if offset not in by_offset:
+            by_offset[offset] = evaluate_nodes(nodes, local_now.replace(tzinfo=None))
+        results[tz_key] = by_offset[offset].replace(tzinfo=local_now.tzinfo)
+    return results
 
 
 class Datetoken(object):
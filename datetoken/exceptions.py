@@ -10,3 +10,9 @@ class InvalidTokenException(Exception):
         self.message = 'Token "{}" is invalid'.format(token)
         if errors and isinstance(errors, Sequence):
             self.message += ". {}".format(".".join(errors))
+
+
+class UnsupportedTokenException(Exception):
+    def __init__(self, token, reason):
+        self.message = 'Token "{}" cannot be expressed. {}'.format(token, reason)
+        super(UnsupportedTokenException, self).__init__(self.message)
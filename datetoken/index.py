@@ -0,0 +1,199 @@
+import bisect
+import heapq
+
+import pytz
+
+from . import DEFAULT_TOKEN
+from .evaluator import (
+    evaluate_nodes,
+    localize,
+    resolve_at,
+    resolve_timezone,
+    to_timestamp,
+)
+from .rollover import get_nodes, next_rollover
+
+NEG_INF = float("-inf")
+
+
+class RangeIndex(object):
+    """
+    Index over many token ranges, such as saved alert windows, answering
+    which of them contain a given date (stabbing queries) in logarithmic
+    time.
+
+    Ranges are evaluated against a shared starting point. Every range keeps
+    track of when its value will next change, so refreshing the index
+    only re-evaluates those ranges whose snap bucket rolled over.
+    """
+
+    def __init__(self, tz=None):
+        self._tz = resolve_timezone(tz)
+        self._ranges = {}
+        self._pending = set()
+        self._expiry = []
+        self._version = 0
+        self._at = None
+        self._dirty = True
+        self._keys = []
+        self._starts = []
+        self._tree = []
+        self._size = 0
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __contains__(self, key):
+        return key in self._ranges
+
+    def add(self, key, from_token, to_token=DEFAULT_TOKEN, tz=None):
+        """
+        Adds or replaces a range
+        :param key: hashable identifier of the range, returned by queries
+        :param from_token: string payload of the start of the range
+        :param to_token: string payload of the end of the range
+        :param tz: {str|pytz.timezone} overrides the time zone of the index
+        :return:
+        :raises: InvalidTokenException
+        """
+        tz = resolve_timezone(tz) or self._tz
+        self._version += 1
+        self._ranges[key] = _IndexedRange(
+            get_nodes(from_token), get_nodes(to_token), tz, self._version
+        )
+        self._pending.add(key)
+
+    def remove(self, key):
+        """
+        :param key: identifier of the range to drop
+        :raises: KeyError if there is no such range
+        """
+        del self._ranges[key]
+        self._pending.discard(key)
+        self._dirty = True
+
+    def bounds(self, key, at=None):
+        """
+        :param key: identifier of the range
+        :param at: {datetime.datetime} starting point. Defaults to utc now
+        :return: tuple of floats, unix timestamps of both ends
+        """
+        self.refresh(at)
+        indexed = self._ranges[key]
+        return indexed.start, indexed.end
+
+    def refresh(self, at=None):
+        """
+        Re-evaluates ranges whose values might have changed since the last
+        refresh
+        :param at: {datetime.datetime} starting point. Defaults to utc now
+        :return: number of re-evaluated ranges
+        """
+        now = localize(resolve_at(at), pytz.UTC)
+        if self._at is not None and now < self._at:
+            # Going back in time invalidates every range
+            due = set(self._ranges)
+            self._expiry = []
+        else:
+            due = self._pending
+            timestamp = to_timestamp(now)
+            while self._expiry and self._expiry[0][0] <= timestamp:
+                _, version, key = heapq.heappop(self._expiry)
+                indexed = self._ranges.get(key)
+                if indexed is not None and indexed.version == version:
+                    due.add(key)
+        self._pending = set()
+        self._at = now
+
+        # Saved ranges are likely to share tokens
+        values = {}
+        for key in due:
+            indexed = self._ranges[key]
+            indexed.start, start_expiry = self._evaluate(
+                indexed.from_nodes, indexed.tz, now, values
+            )
+            indexed.end, end_expiry = self._evaluate(
+                indexed.to_nodes, indexed.tz, now, values
+            )
+            heapq.heappush(
+                self._expiry,
+                (min(start_expiry, end_expiry), indexed.version, key),
+            )
+        if due:
+            self._dirty = True
+        return len(due)
+
+    @staticmethod
+    def _evaluate(nodes, tz, now, values):
+        cache_key = (nodes, tz)
+        if cache_key not in values:
+            value = evaluate_nodes(nodes, resolve_at(now, tz))
+            values[cache_key] = (
+                to_timestamp(value),
+                to_timestamp(next_rollover(nodes, now, tz)),
+            )
+        return values[cache_key]
+
+    def _build(self):
+        """
+        Sorts ranges by their start and lays a max-heap shaped tree of range
+        ends over them, so that whole subtrees can be skipped when none of
+        their ranges reaches the queried date
+        """
+        ranges = sorted(self._ranges.items(), key=lambda item: item[1].start)
+        self._keys = [key for key, _ in ranges]
+        self._starts = [indexed.start for _, indexed in ranges]
+        size = 1
+        while size < len(ranges):
+            size *= 2
+        tree = [NEG_INF] * (2 * size)
+        for position, (_, indexed) in enumerate(ranges):
+            tree[size + position] = indexed.end
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._tree = tree
+        self._size = size
+        self._dirty = False
+
+    def stab(self, dt, at=None):
+        """
+        Finds every range containing a date, both ends included
+        :param dt: datetime or unix timestamp. Naive datetime objects are
+            treated as UTC
+        :param at: {datetime.datetime} starting point. Defaults to utc now
+        :return: list of range keys
+        """
+        self.refresh(at)
+        if self._dirty:
+            self._build()
+        if not self._keys:
+            return []
+        timestamp = dt if isinstance(dt, (int, float)) else to_timestamp(dt)
+        # Only ranges starting before `dt` are candidates
+        limit = bisect.bisect_right(self._starts, timestamp)
+        tree, size = self._tree, self._size
+        found = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or tree[node] < timestamp:
+                continue
+            if node >= size:
+                found.append(self._keys[lo])
+                continue
+            mid = (lo + hi) // 2
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return found
+
+
+class _IndexedRange(object):
+    __slots__ = ("from_nodes", "to_nodes", "tz", "version", "start", "end")
+
+    def __init__(self, from_nodes, to_nodes, tz, version):
+        self.from_nodes = from_nodes
+        self.to_nodes = to_nodes
+        self.tz = tz
+        self.version = version
+        self.start = None
+        self.end = None
@@ -1,9 +1,51 @@
 from .token import Token, TokenType
 
+BUFFER_TYPES = (bytes, bytearray, memoryview)
+# Character each byte stands for, so that buffers are lexed byte by byte
+# without decoding them first
+BYTE_CHARS = tuple(chr(byte) for byte in range(256))
+WHITESPACE_BYTES = frozenset(b" \t\n\r\x0b\x0c")
+
+
+def strip_buffer(buffer, offset=0, length=None):
+    """
+    :param buffer: bytes, bytearray or memoryview
+    :param offset: index the token starts at within the buffer
+    :param length: length of the token. Defaults to the rest of the buffer
+    :return: memoryview over the token, surrounding whitespace aside. No
+        bytes are copied
+    """
+    view = memoryview(buffer)
+    if view.format != "B" or view.ndim != 1:
+        view = view.cast("B")
+    end = len(view) if length is None else min(offset + length, len(view))
+    if offset < end and view[offset] in WHITESPACE_BYTES:
+        while offset < end and view[offset] in WHITESPACE_BYTES:
+            offset += 1
+    if end > offset and view[end - 1] in WHITESPACE_BYTES:
+        while end > offset and view[end - 1] in WHITESPACE_BYTES:
+            end -= 1
+    return view[offset:end]
+
 
 class Lexer(object):
-    def __init__(self, raw_token=""):
-        self.input = raw_token.strip()
+    def __init__(self, raw_token="", offset=0, length=None):
+        """
+        :param raw_token: string payload, or bytes, bytearray or memoryview
+            holding it
+        :param offset: index the token starts at within `raw_token`
+        :param length: length of the token. Defaults to the rest of
+            `raw_token`
+        """
+        if isinstance(raw_token, BUFFER_TYPES):
+            self.input = strip_buffer(raw_token, offset, length)
+            self._chars = BYTE_CHARS
+        else:
+            if offset or length is not None:
+                end = None if length is None else offset + length
+                raw_token = raw_token[offset:end]
+            self.input = raw_token.strip()
+            self._chars = None
         self.position = 0
         self.read_position = 0
         self.current_char = ""
@@ -15,14 +57,33 @@ class Lexer(object):
             self.current_char = ""
         else:
             self.current_char = self.input[self.read_position]
+            if self._chars is not None:
+                self.current_char = self._chars[self.current_char]
         self.position = self.read_position
         self.read_position += 1
 
     def peek_char(self):
         if self.read_position >= len(self.input):
             return None
+        if self._chars is not None:
+            return self._chars[self.input[self.read_position]]
         return self.input[self.read_position]
 
+    @property
+    def text(self):
+        """
+        :return: the token being lexed, as a string
+        """
+        if self._chars is None:
+            return self.input
+        return bytes(self.input).decode("utf8", "replace")
+
+    def _literal(self, start, end):
+        if self._chars is None:
+            return self.input[start:end]
+        # Literals are either ascii or invalid anyway
+        return str(self.input[start:end], "latin-1")
+
     def next_token(self):
         if "+" == self.current_char:
             tok = Token(TokenType.PLUS, self.current_char)
@@ -55,10 +116,10 @@ class Lexer(object):
         pos = self.position
         while self.current_char.isalpha() or self.current_char.isdigit():
             self.read_char()
-        return self.input[pos : self.position]
+        return self._literal(pos, self.position)
 
     def read_number(self):
         pos = self.position
         while self.current_char.isdigit():
             self.read_char()
-        return self.input[pos : self.position]
+        return self._literal(pos, self.position)
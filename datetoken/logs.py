@@ -0,0 +1,203 @@
+import mmap
+import numbers
+import re
+
+from datetime import datetime
+
+from dateutil.parser import isoparse
+
+from . import DEFAULT_TOKEN
+from .evaluator import is_naive, make_aware, resolve_timezone, to_timestamp
+from .range import TokenRange
+
+# Bytes streamed at once out of the matching slice
+CHUNK_SIZE = 1 << 20
+# ISO 8601 dates leading a line, as written by most loggers, such as
+# `2019-03-20T15:45:12Z` or python's own `2019-03-20 15:45:12,123`
+ISO_PATTERN = (
+    rb"^\s*\[?(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?"
+    rb"(?:Z|[+-]\d{2}:?\d{2})?)"
+)
+
+
+def regex_parser(pattern, fmt=None):
+    """
+    Builds a line parser extracting dates by means of a regular expression
+    :param pattern: regular expression, as str or bytes, whose first group
+        matches the date of the line
+    :param fmt: `strptime` format of the date. Defaults to ISO 8601
+    :return: callable taking a line, as bytes, and returning a datetime
+        object, or None if the line holds no date
+    """
+    if isinstance(pattern, str):
+        pattern = pattern.encode("utf8")
+    regex = re.compile(pattern)
+
+    def parse(line):
+        match = regex.search(line)
+        if match is None:
+            return None
+        value = match.group(1).decode("utf8", "replace")
+        try:
+            if fmt is not None:
+                return datetime.strptime(value, fmt)
+            return isoparse(value.replace(",", ".").replace(" ", "T", 1))
+        except ValueError:
+            return None
+
+    return parse
+
+
+parse_iso_line = regex_parser(ISO_PATTERN)
+
+
+class LogFile(object):
+    """
+    Sorted log file, looked up by date through a memory map. Locating a
+    date takes a binary search over byte offsets, which reads a couple of
+    lines per step and therefore touches a logarithmic amount of pages,
+    no matter how large the file is.
+    Lines without a date, such as stack traces, belong to the closest dated
+    line before them.
+    """
+
+    def __init__(self, path, parser=parse_iso_line, tz=None):
+        """
+        :param path: path to the log file, sorted by date
+        :param parser: callable taking a line, as bytes, and returning a
+            datetime object or unix timestamp, or None if the line holds no
+            date
+        :param tz: {str|pytz.timezone} time zone of naive dates found in
+            the file. Defaults to UTC
+        """
+        self.path = path
+        self.parser = parser
+        self.tz = resolve_timezone(tz)
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self._map = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._map)
+
+    def _timestamp(self, line):
+        value = self.parser(line)
+        if value is None or isinstance(value, numbers.Number):
+            return value
+        if self.tz is not None and is_naive(value):
+            value = make_aware(value, self.tz)
+        return to_timestamp(value)
+
+    def _line_start(self, offset):
+        """
+        Offset of the first line starting at or after `offset`
+        """
+        if offset == 0:
+            return 0
+        newline = self._map.find(b"\n", offset - 1)
+        return len(self._map) if newline < 0 else newline + 1
+
+    def _dated_line(self, offset):
+        """
+        First line holding a date, starting at or after `offset`
+        :return: tuple (line offset, unix timestamp), or (size, None) if
+            there are none
+        """
+        size = len(self._map)
+        while offset < size:
+            newline = self._map.find(b"\n", offset)
+            end = size if newline < 0 else newline
+            timestamp = self._timestamp(self._map[offset:end])
+            if timestamp is not None:
+                return offset, timestamp
+            offset = end + 1
+        return size, None
+
+    def seek(self, dt, strict=False):
+        """
+        :param dt: datetime object or unix timestamp. Naive datetime
+            objects are treated as UTC
+        :param strict: whether to skip lines dated exactly at `dt`
+        :return: byte offset of the first line dated at or after `dt`, or
+            after it if `strict`. The size of the file if there is none
+        """
+        target = dt if isinstance(dt, numbers.Number) else to_timestamp(dt)
+
+        def reached(offset):
+            _, timestamp = self._dated_line(self._line_start(offset))
+            if timestamp is None:
+                return True
+            return timestamp > target if strict else timestamp >= target
+
+        lo, hi = 0, len(self._map)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if reached(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return self._dated_line(self._line_start(lo))[0]
+
+    def window(self, start, end):
+        """
+        :param start: datetime object or unix timestamp
+        :param end: datetime object or unix timestamp
+        :return: tuple of byte offsets (lo, hi) delimiting the lines dated
+            within `[start, end]`
+        """
+        lo = self.seek(start)
+        hi = max(lo, self.seek(end, strict=True))
+        return lo, hi
+
+    def iter_slice(self, lo, hi, chunk_size=CHUNK_SIZE):
+        """
+        :return: generator of bytes chunks making up `[lo, hi)`
+        """
+        for offset in range(lo, hi, chunk_size):
+            yield self._map[offset : min(offset + chunk_size, hi)]
+
+
+def read_window(
+    path,
+    from_token,
+    to_token=DEFAULT_TOKEN,
+    at=None,
+    tz=None,
+    parser=parse_iso_line,
+    log_tz=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """
+    Streams the lines of a sorted log file dated within a token range, such
+    as `now-1h` .. `now`, without reading the rest of the file
+    :param path: path to the log file, sorted by date
+    :param from_token: string payload of the start of the range
+    :param to_token: string payload of the end of the range
+    :param at: {datetime.datetime} starting point. Defaults to utc now
+    :param tz: {str|pytz.timezone} time zone tokens are evaluated in
+    :param parser: callable extracting the date of a line, see `LogFile`
+    :param log_tz: {str|pytz.timezone} time zone of naive dates found in
+        the file. Defaults to UTC
+    :param chunk_size: bytes yielded at once
+    :return: generator of bytes chunks
+    :raises: InvalidTokenException
+    """
+    start, end = TokenRange(from_token, to_token, at=at, tz=tz).bounds
+    with LogFile(path, parser=parser, tz=log_tz) as log:
+        lo, hi = log.window(start, end)
+        for chunk in log.iter_slice(lo, hi, chunk_size):
+            yield chunk
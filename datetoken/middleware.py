@@ -0,0 +1,356 @@
+import hashlib
+
+from email.utils import formatdate
+from urllib.parse import unquote
+
+import pytz
+
+from .ast import get_utc_now
+from .evaluator import Datetoken, localize, resolve_at, to_timestamp
+from .exceptions import InvalidTokenException, UnsupportedTokenException
+from .rollover import next_rollover
+
+DEFAULT_PARAMS = ("from", "to")
+# Methods whose responses may be answered with 304 Not Modified
+CONDITIONAL_METHODS = ("GET", "HEAD")
+INVALID_REQUEST_ERRORS = (
+    InvalidTokenException,
+    UnsupportedTokenException,
+    pytz.UnknownTimeZoneError,
+    # Tokens landing out of the range of dates, such as `now+99999999d`
+    OverflowError,
+    ValueError,
+)
+
+
+def parse_query(query):
+    """
+    Unlike `urllib.parse.parse_qs`, plus signs are kept as such, since tokens
+    such as `now+1d` are rarely escaped within URLs
+    :param query: query string, without the leading `?`
+    :return: dict mapping each parameter to its first value
+    """
+    arguments = {}
+    for pair in query.split("&"):
+        if not pair:
+            continue
+        name, _, value = pair.partition("=")
+        arguments.setdefault(unquote(name), unquote(value))
+    return arguments
+
+
+class ResolvedQuery(object):
+    """
+    Tokens of a request resolved against the same starting point, along
+    with how long their values hold
+    """
+
+    def __init__(self, values, at, expires, resource=""):
+        """
+        :param values: dict mapping each query parameter to its aware
+            datetime object
+        :param at: aware datetime object tokens were resolved at
+        :param expires: aware datetime object, in UTC, from which any of the
+            values changes
+        :param resource: path and query string of the request, which the
+            entity tag depends on too
+        """
+        self.values = values
+        self.at = at
+        self.expires = expires
+        self.resource = resource
+
+    @property
+    def max_age(self):
+        """
+        :return: seconds, rounded down, the values hold for
+        """
+        return max(0, int((self.expires - self.at).total_seconds()))
+
+    @property
+    def etag(self):
+        """
+        :return: quoted entity tag, the same for requests to the same
+            resource resolving to the same values
+        """
+        payload = "&".join(
+            [self.resource]
+            + [
+                "%s=%s" % (param, value.isoformat())
+                for param, value in sorted(self.values.items())
+            ]
+        )
+        return '"%s"' % hashlib.sha1(payload.encode("utf8")).hexdigest()[:20]
+
+    def headers(self, directives=None):
+        """
+        :param directives: Cache-Control directives preceding `max-age`, such
+            as `public` or `private`
+        :return: list of (name, value) header tuples
+        """
+        cache_control = "max-age=%d" % self.max_age
+        if directives:
+            cache_control = "%s, %s" % (directives, cache_control)
+        return [
+            ("Cache-Control", cache_control),
+            ("Expires", formatdate(to_timestamp(self.expires), usegmt=True)),
+            ("ETag", self.etag),
+        ]
+
+    def matches(self, if_none_match):
+        """
+        :param if_none_match: value of the If-None-Match request header
+        :return: whether it lists the entity tag of these values
+        """
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == self.etag:
+                return True
+        return False
+
+
+class _TokenMiddleware(object):
+    def __init__(
+        self,
+        app,
+        params=DEFAULT_PARAMS,
+        defaults=None,
+        tz=None,
+        tz_param=None,
+        key="datetoken",
+        directives=None,
+        clock=get_utc_now,
+    ):
+        """
+        :param app: application to wrap
+        :param params: query parameters holding tokens
+        :param defaults: dict mapping query parameters to the token they
+            default to when missing, such as `{"to": "now"}`. Missing
+            parameters without a default are left out
+        :param tz: {str|pytz.timezone} time zone tokens are evaluated in
+        :param tz_param: query parameter overriding the time zone, if any
+        :param key: environ or scope key the resolved values are passed to
+            the application under, as a dict mapping each query parameter
+            to its aware datetime object
+        :param directives: Cache-Control directives preceding `max-age`, such
+            as `public` or `private`. None to only send `max-age`
+        :param clock: callable returning the current date, naive dates being
+            UTC
+        """
+        self.app = app
+        self.params = tuple(params)
+        self.defaults = dict(defaults or {})
+        self.tz = tz
+        self.tz_param = tz_param
+        self.key = key
+        self.directives = directives
+        self.clock = clock
+
+    def resolve(self, query, path=""):
+        """
+        :param query: query string, without the leading `?`
+        :param path: path of the request
+        :return: ResolvedQuery, or None if the query holds no tokens
+        :raises: any of `INVALID_REQUEST_ERRORS`
+        """
+        arguments = parse_query(query)
+        tokens = {}
+        for param in self.params:
+            if param in arguments:
+                tokens[param] = arguments[param]
+            elif param in self.defaults:
+                tokens[param] = self.defaults[param]
+        if not tokens:
+            return None
+        tz = self.tz
+        if self.tz_param and self.tz_param in arguments:
+            tz = arguments[self.tz_param]
+        at = localize(resolve_at(self.clock()), pytz.UTC)
+        datetoken = Datetoken(at=at, tz=tz)
+        values = {}
+        expires = None
+        for param, token in tokens.items():
+            values[param] = datetoken.eval(token).to_date()
+            rollover = next_rollover(token, at=at, tz=tz)
+            expires = rollover if expires is None else min(expires, rollover)
+        return ResolvedQuery(values, at, expires, "%s?%s" % (path, query))
+
+
+class TokenMiddleware(_TokenMiddleware):
+    """
+    WSGI middleware resolving tokens found in the query string, such as
+    `?from=now-1d/d&to=now/d`, and passing their values to the application
+    in the environ. Successful responses which do not set their own
+    Cache-Control header are cached up to the moment any of the values
+    changes, through `Cache-Control`, `Expires` and `ETag` headers, entity
+    tags depending on the path, the query string and the values. Headers
+    the application sets itself, such as its own `ETag`, are kept instead.
+    Once the application answers such a response, without an entity tag of
+    its own, to a conditional request whose If-None-Match lists the current
+    entity tag, it is turned into 304 Not Modified. Invalid tokens are
+    answered with 400 Bad Request.
+    """
+
+    def __call__(self, environ, start_response):
+        try:
+            resolved = self.resolve(
+                environ.get("QUERY_STRING", ""), environ.get("PATH_INFO", "")
+            )
+        except INVALID_REQUEST_ERRORS as e:
+            body = _error_message(e).encode("utf8")
+            start_response(
+                "400 Bad Request",
+                [
+                    ("Content-Type", "text/plain; charset=utf-8"),
+                    ("Content-Length", str(len(body))),
+                ],
+            )
+            return [body]
+        if resolved is None:
+            return self.app(environ, start_response)
+
+        environ[self.key] = resolved.values
+        headers = resolved.headers(self.directives)
+        conditional = environ.get("REQUEST_METHOD", "GET") in CONDITIONAL_METHODS and (
+            resolved.matches(environ.get("HTTP_IF_NONE_MATCH"))
+        )
+        not_modified = []
+
+        def cached_start_response(status, response_headers, exc_info=None):
+            names = _header_names(response_headers)
+            if status.startswith("200") and "cache-control" not in names:
+                if conditional and "etag" not in names:
+                    not_modified.append(True)
+                    start_response("304 Not Modified", headers, exc_info)
+                    return _discard
+                response_headers = list(response_headers) + _missing_headers(
+                    headers, names
+                )
+            return start_response(status, response_headers, exc_info)
+
+        result = self.app(environ, cached_start_response)
+        if not conditional:
+            return result
+        return _drop_not_modified(result, not_modified)
+
+
+class ASGITokenMiddleware(_TokenMiddleware):
+    """
+    ASGI flavour of `TokenMiddleware`. Resolved values are passed to the
+    application in the scope of HTTP requests
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            resolved = self.resolve(
+                scope.get("query_string", b"").decode("latin-1"), scope.get("path", "")
+            )
+        except INVALID_REQUEST_ERRORS as e:
+            body = _error_message(e).encode("utf8")
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 400,
+                    "headers": [
+                        (b"content-type", b"text/plain; charset=utf-8"),
+                        (b"content-length", str(len(body)).encode("latin-1")),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+        if resolved is None:
+            await self.app(scope, receive, send)
+            return
+
+        scope = dict(scope)
+        scope[self.key] = resolved.values
+        headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in resolved.headers(self.directives)
+        ]
+        request_headers = dict(scope.get("headers", ()))
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+        conditional = scope.get("method", "GET") in CONDITIONAL_METHODS and (
+            resolved.matches(if_none_match)
+        )
+        not_modified = []
+
+        async def cached_send(message):
+            if not_modified:
+                # Body of a response turned into 304 Not Modified
+                if message["type"] == "http.response.body" and not message.get(
+                    "more_body", False
+                ):
+                    await send({"type": "http.response.body", "body": b""})
+                return
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = message.get("headers", ())
+                names = _header_names(response_headers)
+                if b"cache-control" not in names:
+                    if conditional and b"etag" not in names:
+                        not_modified.append(True)
+                        message = {
+                            "type": "http.response.start",
+                            "status": 304,
+                            "headers": headers,
+                        }
+                    else:
+                        message = dict(message)
+                        message["headers"] = list(response_headers) + _missing_headers(
+                            headers, names
+                        )
+            await send(message)
+
+        await self.app(scope, receive, cached_send)
+
+
+def _header_names(headers):
+    """
+    :param headers: list of (name, value) header tuples
+    :return: set of lower case header names
+    """
+    return {name.lower() for name, _ in headers}
+
+
+def _missing_headers(headers, names):
+    """
+    :param headers: list of (name, value) header tuples to add
+    :param names: lower case names of the headers already set
+    :return: list of the headers in `headers` which are not set yet,
+        regardless of case
+    """
+    return [(name, value) for name, value in headers if name.lower() not in names]
+
+
+def _discard(data):
+    pass
+
+
+def _drop_not_modified(result, not_modified):
+    """
+    Iterates the body of the application, which might only start the
+    response once iterated, dropping it if turned into 304 Not Modified
+    """
+    try:
+        for chunk in result:
+            if not not_modified:
+                yield chunk
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+def _error_message(error):
+    if isinstance(error, pytz.UnknownTimeZoneError):
+        return 'Unknown time zone "%s"' % error.args[0]
+    if isinstance(error, (OverflowError, ValueError)):
+        return "Tokens are out of the range of dates: %s" % error
+    return error.message
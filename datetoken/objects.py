@@ -15,6 +15,14 @@ class Token(object):
         else:
             self._nodes = nodes
 
+    @property
+    def nodes(self):
+        """
+        :rtype: tuple
+        :return: ast nodes the token is made of
+        """
+        return tuple(self._nodes)
+
     @property
     def is_snapped(self):
         """
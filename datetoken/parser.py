@@ -2,10 +2,11 @@ from .ast import (
     NowExpression,
     ModifierExpression,
     SnapExpression,
+    SNAP_UNITS,
 )
 from .token import TokenType
 
-AMOUNT_MODIFIERS = ("s", "m", "h", "d", "w", "M", "Y")
+AMOUNT_MODIFIERS = ("s", "m", "h", "d", "w", "M", "Y", "bd")
 SNAP_MODIFIERS = (
     "s",
     "m",
@@ -27,7 +28,13 @@ SNAP_MODIFIERS = (
     "Q2",
     "Q3",
     "Q4",
+    "bd",
+    "FY",
+    "FQ",
+    "FM",
 )
+# Snap modifiers which may be preceded by a number of units, such as `/15m`
+MULTI_SNAP_MODIFIERS = tuple(SNAP_UNITS)
 
 
 class Parser(object):
@@ -83,6 +90,10 @@ class Parser(object):
     def parse_snap_expression(self):
         operator = self.current_token.token_literal
         self.next_token()
+        amount = None
+        if self.current_token.token_type == TokenType.NUMBER:
+            amount = int(self.current_token.token_literal)
+            self.next_token()
         if self.current_token.token_type != TokenType.MODIFIER:
             self.errors.append(
                 'Expected amount MODIFIER token type, got "%s"'
@@ -94,7 +105,17 @@ class Parser(object):
                 'Expected snap MODIFIER token type, got "%s", choices are "%s"'
                 % (modifier, str(SNAP_MODIFIERS))
             )
-        return SnapExpression(modifier, operator)
+        elif amount is None or amount == 1:
+            # `/1M` stands for `/M`, the plain snap, whatever the unit
+            amount = 1
+        elif modifier not in MULTI_SNAP_MODIFIERS:
+            self.errors.append(
+                'Expected snap MODIFIER with an amount as any of "%s", got "%s"'
+                % (str(MULTI_SNAP_MODIFIERS), modifier)
+            )
+        elif amount < 1:
+            self.errors.append("Expected snap amount above zero, got %d" % amount)
+        return SnapExpression(modifier, operator, amount)
 
     def parse(self):
         nodes = []
@@ -0,0 +1,292 @@
+import bisect
+import numbers
+
+import pytz
+
+from datetime import datetime
+
+from . import DEFAULT_TOKEN
+from .ast import FIXED_MODIFIERS, ModifierExpression, NowExpression
+from .evaluator import (
+    is_naive,
+    localize,
+    parse_datetoken,
+    resolve_at,
+    resolve_timezone,
+    to_timestamp,
+)
+from .exceptions import InvalidTokenException
+from .objects import Token
+from .token import TokenType
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class TokenRange(object):
+    """
+    Pair of tokens delimiting a closed range of dates, such as `now-d/d` and
+    `now-d@d`. Both ends are parsed once and evaluated together against the
+    very same `now` value and time zone.
+    """
+
+    def __init__(self, from_token, to_token=DEFAULT_TOKEN, at=None, tz=None):
+        self._from = Token(list(parse_datetoken(from_token)))
+        self._to = Token(list(parse_datetoken(to_token)))
+        self._at = at
+        self._tz = resolve_timezone(tz)
+        self._bounds = None
+
+    @property
+    def from_token(self):
+        return self._from
+
+    @property
+    def to_token(self):
+        return self._to
+
+    @property
+    def tz(self):
+        return self._tz
+
+    def eval(self, at=None):
+        """
+        Evaluates both ends of the range, sharing the starting point
+        :param at: datetime. Overrides the configured starting point
+        :return:
+        """
+        if at is not None:
+            self._at = at
+        now = resolve_at(self._at, self._tz)
+        self._from.refresh_at(now)
+        self._to.refresh_at(now)
+        self._bounds = (self._from.to_date(), self._to.to_date())
+        return self
+
+    def refresh_at(self, new_at=None):
+        """
+        Re-evaluates the range. Whenever `new_at` is not given, current time
+        will be used
+        :param new_at: datetime
+        :return:
+        """
+        self._at = new_at
+        return self.eval()
+
+    @property
+    def bounds(self):
+        """
+        :return: tuple of aware datetime objects, (start, end)
+        """
+        if self._bounds is None:
+            self.eval()
+        return self._bounds
+
+    @property
+    def start(self):
+        return self.bounds[0]
+
+    @property
+    def end(self):
+        return self.bounds[1]
+
+    def to_timestamps(self):
+        """
+        :return: tuple of floats, seconds since the unix epoch of both ends
+        """
+        start, end = self.bounds
+        return to_timestamp(start), to_timestamp(end)
+
+    def _bounds_like(self, sample):
+        """
+        Bounds of the range expressed so that they can be compared against
+        `sample`: aware or naive (UTC) datetimes, or unix timestamps
+        """
+        if isinstance(sample, datetime):
+            start, end = self.bounds
+            if is_naive(sample):
+                start = localize(start, pytz.UTC).replace(tzinfo=None)
+                end = localize(end, pytz.UTC).replace(tzinfo=None)
+            return start, end
+        if isinstance(sample, numbers.Number):
+            return self.to_timestamps()
+        raise TypeError("Cannot compare %r against a date range" % (sample,))
+
+    def contains(self, dt):
+        """
+        :param dt: datetime or unix timestamp. Naive datetime objects are
+            treated as UTC
+        :return: Whether `dt` lies within the range, both ends included
+        """
+        start, end = self._bounds_like(dt)
+        return start <= dt <= end
+
+    def __contains__(self, dt):
+        return self.contains(dt)
+
+    def indices(self, timestamps):
+        """
+        Locates the range within a sorted sequence by bisection
+        :param timestamps: sorted sequence or numpy array of datetimes or
+            unix timestamps
+        :return: tuple (lo, hi) so that `timestamps[lo:hi]` lies within the
+            range
+        """
+        if len(timestamps) == 0:
+            return 0, 0
+        if np is not None and isinstance(timestamps, np.ndarray):
+            start, end = self._numpy_bounds(timestamps)
+            lo = int(np.searchsorted(timestamps, start, side="left"))
+            hi = int(np.searchsorted(timestamps, end, side="right"))
+            return lo, hi
+        start, end = self._bounds_like(timestamps[0])
+        lo = bisect.bisect_left(timestamps, start)
+        hi = bisect.bisect_right(timestamps, end, lo)
+        return lo, hi
+
+    def mask(self, timestamps, assume_sorted=False):
+        """
+        Checks membership of many dates at once
+        :param timestamps: sequence or numpy array of datetimes or unix
+            timestamps
+        :param assume_sorted: whether `timestamps` are sorted in ascending
+            order. If so, range ends are found by bisection instead of
+            comparing every single item
+        :return: list of booleans, or a boolean numpy array if `timestamps`
+            is a numpy array as well
+        """
+        size = len(timestamps)
+        is_array = np is not None and isinstance(timestamps, np.ndarray)
+        if assume_sorted:
+            lo, hi = self.indices(timestamps)
+            if is_array:
+                result = np.zeros(size, dtype=bool)
+                result[lo:hi] = True
+                return result
+            return [False] * lo + [True] * (hi - lo) + [False] * (size - hi)
+        if is_array:
+            start, end = self._numpy_bounds(timestamps)
+            return (timestamps >= start) & (timestamps <= end)
+        if not size:
+            return []
+        start, end = self._bounds_like(timestamps[0])
+        return [start <= item <= end for item in timestamps]
+
+    def _numpy_bounds(self, array):
+        start, end = self.to_timestamps()
+        if np.issubdtype(array.dtype, np.datetime64):
+            return (
+                np.datetime64(int(start), "s"),
+                np.datetime64(int(end), "s"),
+            )
+        return start, end
+
+    def __str__(self):
+        return "%s..%s" % (self._from, self._to)
+
+
+def parse_step(step):
+    """
+    Parses the step of a date range, made of modifier expressions only,
+    such as `1h`, `-15m` or `+1M+1d`. Sign defaults to `+`
+    :param step: string payload
+    :return: tuple of `datetoken.ast.ModifierExpression`
+    :raises: InvalidTokenException
+    """
+    payload = step.strip()
+    if payload[:1] not in (TokenType.PLUS, TokenType.MINUS):
+        payload = TokenType.PLUS + payload
+    nodes = tuple(
+        node for node in parse_datetoken(payload) if not isinstance(node, NowExpression)
+    )
+    if not nodes or not all(isinstance(node, ModifierExpression) for node in nodes):
+        raise InvalidTokenException(step, errors=["Expected modifiers only"])
+    return nodes
+
+
+def _step_seconds(nodes):
+    """
+    :return: length of the step in seconds, or None if it depends on the
+        date it applies to
+    """
+    seconds = 0
+    for node in nodes:
+        if node.modifier not in FIXED_MODIFIERS:
+            return None
+        sign = 1 if node.operator == TokenType.PLUS else -1
+        seconds += sign * node.amount * FIXED_MODIFIERS[node.modifier]
+    return seconds
+
+
+def _apply_step(point, nodes, times):
+    for node in nodes:
+        point = ModifierExpression(
+            node.amount * times, node.modifier, node.operator
+        ).get_value(point)
+    return point
+
+
+def _iter_range(start, end, nodes, forward):
+    index = 0
+    while True:
+        # Steps are always applied to the start of the range, rather than to
+        # the previous point, so that month and year clamping does not
+        # accumulate: Jan 31, Feb 28, Mar 31...
+        point = _apply_step(start, nodes, index)
+        if (point > end) if forward else (point < end):
+            return
+        yield point
+        index += 1
+
+
+def date_range(
+    from_token,
+    to_token=DEFAULT_TOKEN,
+    step="1h",
+    at=None,
+    tz=None,
+    as_array=False,
+):
+    """
+    Dates between two tokens, both ends included, every `step`. Both tokens
+    are evaluated once, sharing the starting point. Points are computed
+    lazily using modifier semantics, so `1M` steps from Jan 31 yield Feb 28
+    (or 29) and then Mar 31.
+    :param from_token: string payload of the first date
+    :param to_token: string payload of the last date
+    :param step: string payload made of modifiers, such as `1h` or `1M`.
+        Negative steps iterate backwards from `from_token`
+    :param at: {datetime.datetime} starting point. Defaults to utc now
+    :param tz: {str|pytz.timezone} custom time zone
+    :param as_array: return a numpy array of `datetime64[s]` instants in UTC
+        instead of a generator of aware datetime objects
+    :return: generator of datetime objects, or numpy array
+    :raises: InvalidTokenException, ValueError if step is zero
+    """
+    nodes = parse_step(step)
+    start, end = TokenRange(from_token, to_token, at=at, tz=tz).bounds
+    seconds = _step_seconds(nodes)
+    if seconds is None:
+        first_step = _apply_step(start, nodes, 1)
+        if first_step == start:
+            raise ValueError("Date range step cannot be zero")
+        forward = first_step > start
+    elif seconds == 0:
+        raise ValueError("Date range step cannot be zero")
+    else:
+        forward = seconds > 0
+
+    if not as_array:
+        return _iter_range(start, end, nodes, forward)
+    if np is None:
+        raise ImportError("numpy is required to build date range arrays")
+    if seconds is None:
+        points = [
+            to_timestamp(point) for point in _iter_range(start, end, nodes, forward)
+        ]
+        return np.array(points, dtype=np.int64).astype("datetime64[s]")
+    first, last = int(to_timestamp(start)), int(to_timestamp(end))
+    stop = last + (1 if forward else -1)
+    return np.arange(first, stop, seconds, dtype=np.int64).astype("datetime64[s]")
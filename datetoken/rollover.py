@@ -0,0 +1,172 @@
+from datetime import timedelta as td
+
+import pytz
+import six
+
+from dateutil.relativedelta import relativedelta
+
+from .ast import SNAP_UNITS, SnapExpression
+from .evaluator import (
+    evaluate_nodes,
+    localize,
+    parse_datetoken,
+    resolve_at,
+    resolve_timezone,
+)
+from .token import TokenType
+
+ONE_SECOND = td(seconds=1)
+# Snaps reset the lower order fields of a date, so the value of a snapped
+# token only changes once the value it snaps crosses a bucket boundary.
+# Weekday snaps do not reset the time of day, so they are left out.
+# `/s` resets seconds, hence its bucket being one minute long.
+SNAP_STEPS = {
+    "s": td(minutes=1),
+    "m": td(minutes=1),
+    "h": td(hours=1),
+    "d": td(days=1),
+    "w": td(weeks=1),
+    "bw": td(weeks=1),
+    "bd": td(days=1),
+    "M": relativedelta(months=1),
+    "Q": relativedelta(months=3),
+    "Y": relativedelta(years=1),
+    "Q1": relativedelta(years=1),
+    "Q2": relativedelta(years=1),
+    "Q3": relativedelta(years=1),
+    "Q4": relativedelta(years=1),
+    # Fiscal buckets vary in length, the next one starts right after the end
+    # snap of the current one
+    "FY": None,
+    "FQ": None,
+    "FM": None,
+}
+# Bucket to snap to in order to find the start of the current one
+SNAP_BUCKETS = {"Q1": "Y", "Q2": "Y", "Q3": "Y", "Q4": "Y"}
+# Longest a bucket may last, DST shifts included
+SNAP_SPANS = {
+    "s": td(minutes=1),
+    "m": td(minutes=1),
+    "h": td(hours=2),
+    "d": td(days=1, hours=2),
+    "w": td(weeks=1, hours=2),
+    "bw": td(weeks=1, hours=2),
+    "bd": td(weeks=1, hours=2),
+    "M": td(days=31, hours=2),
+    "Q": td(days=92, hours=2),
+    "Y": td(days=366, hours=2),
+    "Q1": td(days=366, hours=2),
+    "Q2": td(days=366, hours=2),
+    "Q3": td(days=366, hours=2),
+    "Q4": td(days=366, hours=2),
+    "FY": td(weeks=53, hours=2),
+    "FQ": td(weeks=14, hours=2),
+    "FM": td(weeks=6, hours=2),
+}
+
+
+def get_nodes(token):
+    """
+    :param token: string payload, `datetoken.objects.Token` or sequence of
+        ast nodes
+    :return: tuple of ast nodes
+    """
+    if isinstance(token, six.string_types):
+        return parse_datetoken(token)
+    if hasattr(token, "nodes"):
+        return token.nodes
+    return tuple(token)
+
+
+def snap_step(node):
+    """
+    :param node: snap expression
+    :return: length of the buckets it snaps to, or None if they vary
+    """
+    if node.amount != 1:
+        return td(seconds=node.amount * SNAP_UNITS[node.modifier])
+    return SNAP_STEPS[node.modifier]
+
+
+def snap_span(node):
+    """
+    :param node: snap expression
+    :return: longest the buckets it snaps to may last
+    """
+    if node.amount != 1:
+        return td(seconds=node.amount * SNAP_UNITS[node.modifier], hours=2)
+    return SNAP_SPANS[node.modifier]
+
+
+def _first_bucket_snap(nodes):
+    for index, node in enumerate(nodes):
+        if isinstance(node, SnapExpression) and node.modifier in SNAP_STEPS:
+            return index
+    return None
+
+
+def _guess(nodes, index, at, tz):
+    """
+    Assumes that the date being snapped moves along with `at`, which holds
+    for every modifier but month and year clamping
+    """
+    now = resolve_at(at, tz)
+    node = nodes[index]
+    snapped = evaluate_nodes(nodes[:index], now)
+    step = snap_step(node)
+    if step is None:
+        end = SnapExpression(node.modifier, TokenType.AT)
+        boundary = end.get_value(snapped) + ONE_SECOND
+    else:
+        bucket = SnapExpression(
+            SNAP_BUCKETS.get(node.modifier, node.modifier),
+            TokenType.SLASH,
+            node.amount,
+        )
+        boundary = bucket.get_value(snapped) + step
+    return at + (boundary - snapped)
+
+
+def next_rollover(token, at=None, tz=None):
+    """
+    Computes the next point in time at which the value of a token may change,
+    this is, the moment from which evaluating the token yields a different
+    date than evaluating it at `at`. Tokens with no snaps change every second.
+    :param token: string payload, `datetoken.objects.Token` or sequence of
+        ast nodes
+    :param at: {datetime.datetime} starting point. Defaults to utc now
+    :param tz: {str|pytz.timezone} time zone tokens are evaluated in
+    :return: Aware datetime object, in UTC. Never later than the actual
+        change, although it might be earlier for tokens whose value does not
+        steadily move forward, such as those snapped to week days.
+    """
+    nodes = get_nodes(token)
+    tz = resolve_timezone(tz)
+    at = localize(resolve_at(at), pytz.UTC).replace(microsecond=0)
+    index = _first_bucket_snap(nodes)
+    if index is None:
+        return at + ONE_SECOND
+
+    def value(moment):
+        return evaluate_nodes(nodes, resolve_at(moment, tz))
+
+    current = value(at)
+    guess = _guess(nodes, index, at, tz)
+    if (
+        guess - ONE_SECOND >= at
+        and value(guess) != current
+        and value(guess - ONE_SECOND) == current
+    ):
+        return guess
+
+    # Fallback to bisection over the longest bucket the token can snap to
+    lo, hi = at, at + 2 * snap_span(nodes[index])
+    if value(hi) == current:
+        return hi
+    while hi - lo > ONE_SECOND:
+        mid = lo + td(seconds=max(1, int((hi - lo).total_seconds()) // 2))
+        if value(mid) == current:
+            lo = mid
+        else:
+            hi = mid
+    return hi
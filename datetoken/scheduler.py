@@ -0,0 +1,330 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+
+from datetime import timedelta
+
+import pytz
+
+from .ast import get_precise_utc_now
+from .evaluator import (
+    evaluate_nodes,
+    localize,
+    resolve_at,
+    resolve_timezone,
+    to_timestamp,
+)
+from .rollover import get_nodes
+
+logger = logging.getLogger(__name__)
+
+
+class FakeClock(object):
+    """
+    Clock whose time only moves when slept on, for schedulers under test
+    """
+
+    def __init__(self, start):
+        """
+        :param start: {datetime.datetime} initial time, naive dates being UTC
+        """
+        self.now = localize(resolve_at(start), pytz.UTC)
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += timedelta(seconds=max(0, seconds))
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+class Job(object):
+    """
+    Callback run whenever the token it is scheduled with comes due, returned
+    by `TokenScheduler.add`
+    """
+
+    __slots__ = ("scheduler", "token", "nodes", "tz", "callback", "args", "next_run")
+
+    def __init__(self, scheduler, token, nodes, tz, callback, args):
+        self.scheduler = scheduler
+        self.token = token
+        self.nodes = nodes
+        self.tz = tz
+        self.callback = callback
+        self.args = args
+        # Aware datetime object, in UTC, the job fires at next. None once
+        # removed
+        self.next_run = None
+
+    def cancel(self):
+        """
+        Removes the job from its scheduler. Cancelling twice is harmless
+        """
+        self.scheduler.remove(self)
+
+
+class TokenScheduler(object):
+    """
+    Runs jobs at the times given by their tokens, such as `now+1d/d+2h`
+    every day at 2am or `now+w/mon/d+9h` on mondays at 9am.
+
+    Jobs wait on a min-heap keyed by their next run, so finding the due ones
+    takes no evaluation at all. The token of a job is evaluated only when
+    the job fires, against the current time, to find its following run.
+    Jobs whose token does not move forward, such as `now/d+2h` past 2am,
+    run once more and are then dropped.
+
+    Adding, removing and rescheduling jobs take logarithmic time. Removed
+    and rescheduled jobs leave their former entry on the heap, skipped once
+    due, until stale entries outnumber live ones. Jobs may be added while
+    the scheduler runs, from other threads too, waking its run loop up.
+    Errors of callbacks are logged, without stopping the other jobs.
+    """
+
+    def __init__(self, tz=None, clock=get_precise_utc_now):
+        """
+        :param tz: {str|pytz.timezone} default time zone tokens are
+            evaluated in
+        :param clock: callable returning the current date, naive dates being
+            UTC. Defaults to utc now, microseconds included, for waits to
+            end on time. Tokens are evaluated against whole seconds
+        """
+        self._tz = resolve_timezone(tz)
+        self._clock = clock
+        self._heap = []
+        # Maps live jobs to the sequence number of their heap entry
+        self._entries = {}
+        self._sequence = itertools.count()
+        self._stopped = False
+        self._lock = threading.RLock()
+        # Set whenever the earliest run might have changed, to wake up `run`
+        # and, within its loop, `run_async`
+        self._wakeup = threading.Event()
+        self._async_wakeup = None
+
+    def __len__(self):
+        """
+        :return: number of jobs scheduled
+        """
+        return len(self._entries)
+
+    def _precise_now(self):
+        return localize(resolve_at(self._clock()), pytz.UTC)
+
+    def _now(self):
+        return self._precise_now().replace(microsecond=0)
+
+    def _next_run(self, job, now):
+        return localize(evaluate_nodes(job.nodes, resolve_at(now, job.tz)), pytz.UTC)
+
+    def _first_run(self, job):
+        now = self._now()
+        next_run = self._next_run(job, now)
+        if next_run <= now:
+            raise ValueError(
+                'Token "%s" does not point to the future, it evaluates to %s'
+                % (job.token, next_run.isoformat())
+            )
+        return next_run
+
+    def _push(self, job, next_run):
+        with self._lock:
+            sequence = next(self._sequence)
+            job.next_run = next_run
+            self._entries[job] = sequence
+            heapq.heappush(self._heap, (to_timestamp(next_run), sequence, job))
+            if len(self._heap) > 2 * len(self._entries) + 16:
+                self._compact()
+
+    def _wake(self):
+        self._wakeup.set()
+        if self._async_wakeup is not None:
+            self._async_wakeup.set()
+
+    def _compact(self):
+        self._heap = [
+            entry for entry in self._heap if self._entries.get(entry[2]) == entry[1]
+        ]
+        heapq.heapify(self._heap)
+
+    def add(self, token, callback, args=(), tz=None):
+        """
+        Schedules a job
+        :param token: string payload or `datetoken.objects.Token` giving the
+            next run as of the current time
+        :param callback: callable, or coroutine function when running
+            asynchronously, called with `args`
+        :param args: positional arguments of the callback
+        :param tz: {str|pytz.timezone} overrides the time zone of the
+            scheduler
+        :return: `Job`
+        :raises: InvalidTokenException, ValueError if the token does not
+            point to the future
+        """
+        tz = resolve_timezone(tz) or self._tz
+        job = Job(self, str(token), get_nodes(token), tz, callback, tuple(args))
+        self._push(job, self._first_run(job))
+        self._wake()
+        return job
+
+    def remove(self, job):
+        """
+        Unschedules a job. Removing it twice is harmless
+        :param job: `Job` returned by `add`
+        """
+        with self._lock:
+            if self._entries.pop(job, None) is not None:
+                job.next_run = None
+
+    def reschedule(self, job, token=None, tz=None):
+        """
+        Moves a job to the next run given by a new token, or by its own one
+        as of the current time
+        :param job: `Job` returned by `add`, possibly removed
+        :param token: string payload or `datetoken.objects.Token`
+        :param tz: {str|pytz.timezone} new time zone of the job
+        :raises: InvalidTokenException, ValueError if the token does not
+            point to the future
+        """
+        if token is not None:
+            job.nodes = get_nodes(token)
+            job.token = str(token)
+        if tz is not None:
+            job.tz = resolve_timezone(tz)
+        self._push(job, self._first_run(job))
+        self._wake()
+
+    @property
+    def next_run(self):
+        """
+        :return: aware datetime object, in UTC, the earliest job fires at, or
+            None if there are no jobs
+        """
+        with self._lock:
+            while self._heap:
+                _, sequence, job = self._heap[0]
+                if self._entries.get(job) == sequence:
+                    return job.next_run
+                heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self):
+        """
+        Pops the jobs due as of now, pushing them back at their following
+        run, so that callbacks raising do not lose their job
+        :return: list of due jobs
+        """
+        precise_now = self._precise_now()
+        now = precise_now.replace(microsecond=0)
+        timestamp = to_timestamp(precise_now)
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= timestamp:
+                _, sequence, job = heapq.heappop(self._heap)
+                if self._entries.get(job) == sequence:
+                    due.append(job)
+            for job in due:
+                next_run = self._next_run(job, now)
+                if next_run > now:
+                    self._push(job, next_run)
+                else:
+                    self.remove(job)
+        return due
+
+    def run_pending(self):
+        """
+        Runs the jobs due as of now, logging the errors of their callbacks
+        :return: number of jobs run
+        """
+        due = self._pop_due()
+        for job in due:
+            try:
+                job.callback(*job.args)
+            except Exception:
+                logger.exception('Job of token "%s" failed', job.token)
+        return len(due)
+
+    async def run_pending_async(self):
+        """
+        Runs the jobs due as of now, awaiting coroutine callbacks in turn and
+        logging their errors
+        :return: number of jobs run
+        """
+        due = self._pop_due()
+        for job in due:
+            try:
+                result = job.callback(*job.args)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                logger.exception('Job of token "%s" failed', job.token)
+        return len(due)
+
+    def _delay(self):
+        next_run = self.next_run
+        if next_run is None:
+            return None
+        return max(0, to_timestamp(next_run) - to_timestamp(self._precise_now()))
+
+    def stop(self):
+        """
+        Makes the run loops return before their next wait
+        """
+        self._stopped = True
+        self._wake()
+
+    def run(self, sleep=None):
+        """
+        Runs jobs as they come due, until there are none left or the
+        scheduler is stopped
+        :param sleep: callable waiting the given seconds, such as
+            `FakeClock.sleep` under test. Defaults to waiting until the
+            earliest job comes due or jobs are added, whichever comes first
+        """
+        self._stopped = False
+        while not self._stopped:
+            # Cleared before looking at the jobs, so that none added from
+            # now on is missed
+            self._wakeup.clear()
+            delay = self._delay()
+            if delay is None:
+                return
+            if delay:
+                if sleep is None:
+                    self._wakeup.wait(delay)
+                else:
+                    sleep(delay)
+            self.run_pending()
+
+    async def run_async(self, sleep=None):
+        """
+        Asynchronous flavour of `run`, awaiting coroutine callbacks. Jobs
+        are expected to be added from within the loop it runs on
+        :param sleep: coroutine function waiting the given seconds, such as
+            `FakeClock.async_sleep` under test. Defaults to waiting until the
+            earliest job comes due or jobs are added, whichever comes first
+        """
+        self._stopped = False
+        self._async_wakeup = wakeup = asyncio.Event()
+        try:
+            while not self._stopped:
+                wakeup.clear()
+                delay = self._delay()
+                if delay is None:
+                    return
+                if delay:
+                    if sleep is None:
+                        try:
+                            await asyncio.wait_for(wakeup.wait(), delay)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await sleep(delay)
+                await self.run_pending_async()
+        finally:
+            self._async_wakeup = None
@@ -0,0 +1,386 @@
+import pytz
+
+from .ast import SNAP_ANCHORS, SNAP_UNITS
+from .ast import ModifierExpression, NowExpression, SnapExpression
+from .calendars import WEEKDAY_SNAPS
+from .evaluator import parse_datetoken, resolve_timezone
+from .exceptions import UnsupportedTokenException
+from .token import TokenType
+
+QUARTERS = ("Q1", "Q2", "Q3", "Q4")
+
+
+def _sign(node):
+    return 1 if node.operator == TokenType.PLUS else -1
+
+
+def _tz_name(tz):
+    tz = resolve_timezone(tz)
+    if tz is None or tz is pytz.UTC:
+        return None
+    return getattr(tz, "zone", None) or str(tz)
+
+
+def _quote(value):
+    return "'%s'" % value.replace("'", "''")
+
+
+def _seconds_since(value, start):
+    """
+    SQLite modifier adding the seconds elapsed since `start`, such as
+    `start of month`, up to `value`
+    """
+    return "'+' || (strftime('%%s', %s) - strftime('%%s', %s, %s)) || ' seconds'" % (
+        value,
+        value,
+        _quote(start),
+    )
+
+
+def _remainder(seconds, node, modulo):
+    """
+    SQL expression of the seconds elapsed since the start of the bucket of a
+    multi-unit snap, such as `/15m`, given the seconds since the epoch.
+    The remainder is kept positive for dates before the anchor
+    :param modulo: format string of the remainder of its two operands in
+        the dialect, such as `mod(%s, %s)`
+    """
+    length = node.amount * SNAP_UNITS[node.modifier]
+    elapsed = "((%s) - (%d))" % (seconds, SNAP_ANCHORS.get(node.modifier, 0))
+    return modulo % ("(%s + %d)" % (modulo % (elapsed, length), length), length)
+
+
+class SQLiteCompiler(object):
+    """
+    Compiles tokens into SQLite `datetime` calls. Dates are text in UTC, as
+    `datetime` returns them: `YYYY-MM-DD HH:MM:SS`.
+    Chained modifiers are folded into a single call, such as
+    `datetime('now', '-1 day', 'start of day')`, as long as SQLite has a
+    matching modifier for each of them.
+    """
+
+    dialect = "sqlite"
+    default_now = "'now'"
+    modulo = "(%s %% %s)"
+    units = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+    # `start of week` does not exist, weeks start on the Monday on or
+    # before 6 days ago
+    start_of_week = ("start of day", "-6 days", "weekday 1")
+    snap_formats = {
+        (TokenType.SLASH, "s"): "%Y-%m-%d %H:%M:00",
+        (TokenType.SLASH, "m"): "%Y-%m-%d %H:%M:00",
+        (TokenType.SLASH, "h"): "%Y-%m-%d %H:00:00",
+        (TokenType.AT, "m"): "%Y-%m-%d %H:%M:59",
+        (TokenType.AT, "h"): "%Y-%m-%d %H:59:59",
+        (TokenType.AT, "d"): "%Y-%m-%d 23:59:59",
+    }
+    snap_modifiers = {
+        (TokenType.SLASH, "d"): ("start of day",),
+        (TokenType.SLASH, "w"): start_of_week,
+        (TokenType.SLASH, "bw"): start_of_week,
+        (TokenType.SLASH, "M"): ("start of month",),
+        (TokenType.SLASH, "Y"): ("start of year",),
+        (TokenType.AT, "w"): ("start of day", "weekday 0", "+1 day", "-1 second"),
+        (TokenType.AT, "bw"): start_of_week + ("+5 days", "-1 second"),
+        (TokenType.AT, "M"): ("start of month", "+1 month", "-1 second"),
+        (TokenType.AT, "Y"): ("start of year", "+1 year", "-1 second"),
+    }
+
+    def __init__(self, token, now=None, tz=None):
+        if _tz_name(tz) is not None:
+            raise UnsupportedTokenException(
+                token, "SQLite dates can only be evaluated in UTC"
+            )
+        self.token = token
+        self.base = self.default_now if now is None else now
+        self.modifiers = []
+
+    def render(self):
+        if not self.modifiers:
+            return "datetime(%s)" % self.base
+        return "datetime(%s, %s)" % (
+            self.base,
+            ", ".join(_quote(modifier) for modifier in self.modifiers),
+        )
+
+    def _reset(self, expression):
+        self.base = expression
+        self.modifiers = []
+
+    def _add_months(self, months):
+        # SQLite carries days beyond the end of the month over to the next
+        # one, the smallest of that and the end of the target month is taken
+        # instead so that Jan 31 plus a month is Feb 28, as in python
+        value = self.render()
+        shifted = "datetime(%s, %s, %s, %s)" % (
+            value,
+            _quote("start of month"),
+            _quote("%+d months" % months),
+            _seconds_since(value, "start of month"),
+        )
+        month_end = "datetime(%s, %s, %s, %s, %s)" % (
+            value,
+            _quote("start of month"),
+            _quote("%+d months" % (months + 1)),
+            _quote("-1 day"),
+            _seconds_since(value, "start of day"),
+        )
+        self._reset("min(%s, %s)" % (shifted, month_end))
+
+    def modifier(self, node):
+        amount = _sign(node) * node.amount
+        if node.modifier in self.units:
+            self.modifiers.append("%+d %s" % (amount, self.units[node.modifier]))
+        elif node.modifier == "w":
+            self.modifiers.append("%+d days" % (amount * 7))
+        elif node.modifier == "M":
+            self._add_months(amount)
+        elif node.modifier == "Y":
+            self._add_months(amount * 12)
+        else:
+            raise UnsupportedTokenException(
+                self.token, 'SQLite has no "%s" modifier' % node.modifier
+            )
+
+    def _start_of_quarter(self):
+        value = self.render()
+        self._reset(
+            "datetime(%s, %s, '-' || ((strftime('%%m', %s) - 1) %% 3) || %s)"
+            % (value, _quote("start of month"), value, _quote(" months"))
+        )
+
+    def _snap_units(self, node, end):
+        seconds = "strftime('%%s', %s)" % self.render()
+        self._reset(
+            "datetime(%s - %s, 'unixepoch')"
+            % (
+                seconds,
+                _remainder(seconds, node, self.modulo),
+            )
+        )
+        if end:
+            length = node.amount * SNAP_UNITS[node.modifier]
+            self.modifiers.append("+%d seconds" % (length - 1))
+
+    def snap(self, node):
+        key = (node.operator, node.modifier)
+        end = node.operator == TokenType.AT
+        if node.amount != 1:
+            self._snap_units(node, end)
+        elif key in self.snap_formats:
+            self._reset(
+                "strftime(%s, %s)" % (_quote(self.snap_formats[key]), self.render())
+            )
+        elif key in self.snap_modifiers:
+            self.modifiers.extend(self.snap_modifiers[key])
+        elif node.modifier == "Q":
+            self._start_of_quarter()
+            if end:
+                self.modifiers.extend(("+3 months", "-1 second"))
+        elif node.modifier in QUARTERS:
+            months = QUARTERS.index(node.modifier) * 3
+            self.modifiers.extend(("start of year", "+%d months" % months))
+            if end:
+                self.modifiers.extend(("+3 months", "-1 second"))
+        elif node.modifier in WEEKDAY_SNAPS:
+            # SQLite week days start on Sunday
+            weekday = (WEEKDAY_SNAPS.index(node.modifier) + 1) % 7
+            if not end:
+                self.modifiers.append("-6 days")
+            self.modifiers.append("weekday %d" % weekday)
+        else:
+            raise UnsupportedTokenException(
+                self.token,
+                'SQLite cannot snap to the %s of "%s"'
+                % ("end" if end else "start", node.modifier),
+            )
+
+    def compile(self, nodes):
+        for node in nodes:
+            if isinstance(node, ModifierExpression):
+                self.modifier(node)
+            elif isinstance(node, SnapExpression):
+                self.snap(node)
+        return self.render()
+
+
+class PostgreSQLCompiler(object):
+    """
+    Compiles tokens into PostgreSQL expressions made of `date_trunc` and
+    intervals, yielding `timestamp with time zone` values.
+    As when evaluating tokens in python, the whole token is evaluated on the
+    wall clock time of the starting point at the given time zone, and the
+    UTC offset of the starting point is kept throughout.
+    """
+
+    dialect = "postgresql"
+    default_now = "CURRENT_TIMESTAMP"
+    # `mod` rather than the `%` operator, which drivers such as psycopg2
+    # would take for a placeholder next to `now` parameters like `%(at)s`
+    modulo = "mod(%s, %s)"
+    units = {
+        "s": "seconds",
+        "m": "minutes",
+        "h": "hours",
+        "d": "days",
+        "w": "weeks",
+        "M": "months",
+        "Y": "years",
+    }
+    truncations = {
+        "s": "minute",
+        "m": "minute",
+        "h": "hour",
+        "d": "day",
+        "w": "week",
+        "bw": "week",
+        "M": "month",
+        "Y": "year",
+        "Q": "quarter",
+    }
+    # Bucket length added to the start of the bucket to find its end
+    lengths = {
+        "m": "1 minute",
+        "h": "1 hour",
+        "d": "1 day",
+        "w": "1 week",
+        "bw": "5 days",
+        "M": "1 month",
+        "Y": "1 year",
+        "Q": "3 months",
+    }
+
+    def __init__(self, token, now=None, tz=None):
+        self.token = token
+        self.now = self.default_now if now is None else now
+        self.tz = _tz_name(tz)
+        self.value = "(%s AT TIME ZONE %s)" % (self.now, _quote(self.tz or "UTC"))
+
+    def modifier(self, node):
+        if node.modifier not in self.units:
+            raise UnsupportedTokenException(
+                self.token, 'PostgreSQL has no "%s" interval' % node.modifier
+            )
+        self.value = "(%s %s interval '%d %s')" % (
+            self.value,
+            node.operator,
+            node.amount,
+            self.units[node.modifier],
+        )
+
+    def _snap_units(self, node, end):
+        seconds = "floor(extract(epoch from %s))::bigint" % self.value
+        self.value = "(%s - %s * interval '1 second'%s)" % (
+            self.value,
+            _remainder(seconds, node, self.modulo),
+            (
+                " + interval '%d seconds'"
+                % (node.amount * SNAP_UNITS[node.modifier] - 1)
+                if end
+                else ""
+            ),
+        )
+
+    def snap(self, node):
+        end = node.operator == TokenType.AT
+        if node.amount != 1:
+            self._snap_units(node, end)
+        elif end and node.modifier in self.lengths:
+            self.value = "(date_trunc(%s, %s) + interval %s - interval '1 second')" % (
+                _quote(self.truncations[node.modifier]),
+                self.value,
+                _quote(self.lengths[node.modifier]),
+            )
+        elif not end and node.modifier in self.truncations:
+            self.value = "date_trunc(%s, %s)" % (
+                _quote(self.truncations[node.modifier]),
+                self.value,
+            )
+        elif node.modifier in QUARTERS:
+            months = QUARTERS.index(node.modifier) * 3 + (3 if end else 0)
+            self.value = "(date_trunc('year', %s) + interval '%d months'%s)" % (
+                self.value,
+                months,
+                " - interval '1 second'" if end else "",
+            )
+        elif node.modifier in WEEKDAY_SNAPS:
+            weekday = WEEKDAY_SNAPS.index(node.modifier)
+            if end:
+                days = "mod(%d - extract(isodow from %s)::int, 7)" % (
+                    weekday + 8,
+                    self.value,
+                )
+                self.value = "(%s + %s * interval '1 day')" % (self.value, days)
+            else:
+                days = "mod(extract(isodow from %s)::int + %d, 7)" % (
+                    self.value,
+                    6 - weekday,
+                )
+                self.value = "(%s - %s * interval '1 day')" % (self.value, days)
+        else:
+            raise UnsupportedTokenException(
+                self.token,
+                'PostgreSQL cannot snap to the %s of "%s"'
+                % ("end" if end else "start", node.modifier),
+            )
+
+    def compile(self, nodes):
+        for node in nodes:
+            if isinstance(node, ModifierExpression):
+                self.modifier(node)
+            elif isinstance(node, SnapExpression):
+                self.snap(node)
+        if self.tz is None:
+            return "(%s AT TIME ZONE 'UTC')" % self.value
+        offset = "((%s AT TIME ZONE %s) - (%s AT TIME ZONE 'UTC'))" % (
+            self.now,
+            _quote(self.tz),
+            self.now,
+        )
+        return "((%s - %s) AT TIME ZONE 'UTC')" % (self.value, offset)
+
+
+COMPILERS = {
+    SQLiteCompiler.dialect: SQLiteCompiler,
+    PostgreSQLCompiler.dialect: PostgreSQLCompiler,
+}
+
+
+def to_sql(token, dialect, now=None, tz=None):
+    """
+    Compiles a token into a SQL expression the database evaluates on its
+    own, so that statements keep the same text no matter when they run.
+    :param token: string payload
+    :param dialect: any of `sqlite` or `postgresql`
+    :param now: SQL expression of the starting point, such as a bind
+        parameter. Defaults to the current time of the database. It might
+        show up several times within the expression, so positional
+        parameters are better avoided
+    :param tz: {str|pytz.timezone} time zone the token is evaluated in.
+        Only supported by PostgreSQL
+    :return: string with the SQL expression
+    :raises: InvalidTokenException, UnsupportedTokenException if the token
+        uses units the dialect cannot express, such as business days
+
+    Unlike the evaluation in python, `@M` always compiles to the last second
+    of the month, even for days the following month lacks: `now@M` as of
+    January 31st is January 31st 23:59:59 in SQL, January 28th in python.
+    """
+    if dialect not in COMPILERS:
+        raise ValueError(
+            'Expected dialect as any of "%s", got "%s"' % (tuple(COMPILERS), dialect)
+        )
+    nodes = parse_datetoken(token)
+    for node in nodes:
+        if (
+            isinstance(node, SnapExpression)
+            and node.operator == TokenType.AT
+            and node.modifier == "s"
+        ):
+            raise UnsupportedTokenException(
+                token, 'The end of "s" cannot be evaluated in python either'
+            )
+    compiler = COMPILERS[dialect](token, now=now, tz=tz)
+    return compiler.compile(
+        node for node in nodes if not isinstance(node, NowExpression)
+    )
@@ -0,0 +1,203 @@
+import json
+import numbers
+
+import pytz
+import six
+
+from datetime import datetime
+
+from dateutil.parser import isoparse
+
+from .evaluator import (
+    evaluate_nodes,
+    localize,
+    parse_datetoken,
+    resolve_at,
+    resolve_timezone,
+)
+from .exceptions import InvalidTokenException
+
+PATH_SEPARATOR = "."
+
+
+def split_path(path):
+    """
+    :param path: dotted path to a field, such as `range.from` or
+        `ranges.0.from`. Integer parts index lists
+    :return: tuple of path parts
+    """
+    return tuple(path.split(PATH_SEPARATOR))
+
+
+def _step(container, part):
+    if isinstance(container, dict):
+        return container.get(part)
+    if isinstance(container, list) and part.lstrip("-").isdigit():
+        index = int(part)
+        if -len(container) <= index < len(container):
+            return container[index]
+    return None
+
+
+def get_path(record, parts):
+    """
+    :param record: decoded JSON document
+    :param parts: path parts, as returned by `split_path`
+    :return: value found at the path, or None if it does not exist
+    """
+    value = record
+    for part in parts:
+        value = _step(value, part)
+        if value is None:
+            return None
+    return value
+
+
+def set_path(record, parts, value):
+    """
+    Replaces the value of an existing field. Missing fields are ignored
+    :param record: decoded JSON document
+    :param parts: path parts, as returned by `split_path`
+    :param value: new value of the field
+    """
+    container = get_path(record, parts[:-1])
+    if isinstance(container, dict) and parts[-1] in container:
+        container[parts[-1]] = value
+    elif _step(container, parts[-1]) is not None:
+        container[int(parts[-1])] = value
+
+
+def parse_at(value):
+    """
+    :param value: ISO 8601 string or unix timestamp. Naive dates are treated
+        as UTC
+    :return: datetime object, or None if no value was given
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError("Expected a date or unix timestamp, got %r" % (value,))
+    if isinstance(value, numbers.Number):
+        return datetime.fromtimestamp(value, pytz.UTC)
+    if isinstance(value, six.string_types):
+        return isoparse(value)
+    raise ValueError("Expected a date or unix timestamp, got %r" % (value,))
+
+
+def isoformat(dt):
+    return dt.isoformat()
+
+
+class RecordResolver(object):
+    """
+    Resolves the token fields of decoded JSON records in place. Tokens are
+    parsed once through the shared parse cache, and the starting point of
+    records lacking their own `at` is resolved once for the whole stream, so
+    every record agrees on what `now` is.
+    """
+
+    def __init__(
+        self,
+        fields,
+        at_field=None,
+        tz_field=None,
+        at=None,
+        tz=None,
+        utc=False,
+        strict=True,
+        formatter=isoformat,
+    ):
+        """
+        :param fields: iterable of dotted paths to token fields
+        :param at_field: dotted path to the starting point of each record,
+            either an ISO 8601 string or a unix timestamp
+        :param tz_field: dotted path to the time zone of each record
+        :param at: {datetime.datetime} starting point of records lacking
+            their own. Defaults to utc now, taken once
+        :param tz: {str|pytz.timezone} time zone of records lacking their own
+        :param utc: whether to coerce resolved dates back to UTC
+        :param strict: whether invalid tokens raise. Otherwise they are left
+            untouched
+        :param formatter: callable turning resolved datetime objects into
+            JSON serializable values. Defaults to ISO 8601 strings
+        """
+        self.fields = [split_path(field) for field in fields]
+        self.at_field = split_path(at_field) if at_field else None
+        self.tz_field = split_path(tz_field) if tz_field else None
+        self.at = resolve_at(at)
+        self.tz = resolve_timezone(tz)
+        self.utc = utc
+        self.strict = strict
+        self.formatter = formatter
+
+    def _anchor(self, record):
+        at = self.at
+        tz = self.tz
+        if self.at_field:
+            at = parse_at(get_path(record, self.at_field)) or at
+        if self.tz_field:
+            tz = get_path(record, self.tz_field) or tz
+        return resolve_at(at, tz)
+
+    def _resolve(self, token, now):
+        try:
+            value = evaluate_nodes(parse_datetoken(token.strip()), now)
+        except InvalidTokenException:
+            if self.strict:
+                raise
+            return token
+        if self.utc:
+            value = localize(value, pytz.UTC)
+        return self.formatter(value)
+
+    def resolve(self, record):
+        """
+        :param record: decoded JSON document
+        :return: the same record, with token fields replaced by their value
+        :raises: InvalidTokenException, pytz.UnknownTimeZoneError
+        """
+        now = None
+        for parts in self.fields:
+            token = get_path(record, parts)
+            if not isinstance(token, six.string_types):
+                continue
+            if now is None:
+                now = self._anchor(record)
+            set_path(record, parts, self._resolve(token, now))
+        return record
+
+
+def resolve_records(records, fields, **kwargs):
+    """
+    Lazily resolves token fields of many records
+    :param records: iterable of decoded JSON documents
+    :param fields: iterable of dotted paths to token fields
+    :param kwargs: any other argument of `RecordResolver`
+    :return: generator of records
+    """
+    resolver = RecordResolver(fields, **kwargs)
+    for record in records:
+        yield resolver.resolve(record)
+
+
+def transform(infile, outfile, fields, **kwargs):
+    """
+    Streams NDJSON records from `infile` to `outfile`, one line at a time,
+    resolving token fields on the way. Blank lines are skipped.
+    :param infile: text file object to read records from
+    :param outfile: text file object to write records to
+    :param fields: iterable of dotted paths to token fields
+    :param kwargs: any other argument of `RecordResolver`
+    :return: number of records written
+    :raises: InvalidTokenException, ValueError on malformed JSON
+    """
+    resolver = RecordResolver(fields, **kwargs)
+    count = 0
+    for line in infile:
+        if not line.strip():
+            continue
+        record = resolver.resolve(json.loads(line))
+        outfile.write(json.dumps(record))
+        outfile.write("\n")
+        count += 1
+    return count
@@ -0,0 +1,247 @@
+import bisect
+import calendar
+
+from datetime import datetime, timezone
+from datetime import timedelta as td
+
+import pytz
+
+from .ast import EPOCH
+from .evaluator import resolve_timezone
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+DEFAULT_START_YEAR = 1900
+DEFAULT_END_YEAR = 2100
+# Time zones without a transition list are probed this often, in seconds.
+# No time zone changes its offset twice within this period
+PROBE_STEP = 6 * 3600
+
+_tables = {}
+
+
+def _epoch(year):
+    return calendar.timegm((year, 1, 1, 0, 0, 0))
+
+
+def _naive(seconds):
+    return EPOCH + td(seconds=seconds)
+
+
+def _offset_at(epoch, tz):
+    moment = datetime.fromtimestamp(epoch, tz)
+    return int(moment.utcoffset().total_seconds()), bool(moment.dst())
+
+
+class TransitionTable(object):
+    """
+    UTC offsets a time zone goes through within a window of years, sorted by
+    the instant they come into effect. Converting between unix timestamps
+    and wall clock time becomes a bisection plus integer math, rather than
+    a call to `astimezone` and `normalize`.
+    Wall clock time is expressed in seconds elapsed since
+    1970-01-01 00:00:00 at that time zone.
+    Dates outside the window are converted through the time zone object.
+    """
+
+    def __init__(self, tz, start_year=DEFAULT_START_YEAR, end_year=DEFAULT_END_YEAR):
+        self.tz = resolve_timezone(tz)
+        self.start_year = start_year
+        self.end_year = end_year
+        self.lower = _epoch(start_year)
+        self.upper = _epoch(end_year + 1)
+        if hasattr(self.tz, "_utc_transition_times"):
+            self._load_pytz()
+        elif hasattr(self.tz, "_utcoffset") or isinstance(self.tz, timezone):
+            # pytz static time zones, UTC included, and fixed offsets
+            offset, dst = _offset_at(self.lower, self.tz)
+            self.starts, self.offsets, self.dst = [self.lower], [offset], [dst]
+        else:
+            self._probe()
+        if np is not None:
+            self._starts_array = np.array(self.starts, dtype=np.int64)
+            self._offsets_array = np.array(self.offsets, dtype=np.int64)
+
+    def _load_pytz(self):
+        times = [
+            calendar.timegm(moment.timetuple())
+            for moment in self.tz._utc_transition_times
+        ]
+        first = max(bisect.bisect_right(times, self.lower) - 1, 0)
+        last = bisect.bisect_left(times, self.upper)
+        infos = self.tz._transition_info[first:last]
+        self.starts = [self.lower] + times[first + 1 : last]
+        self.offsets = [int(info[0].total_seconds()) for info in infos]
+        self.dst = [bool(info[1]) for info in infos]
+
+    def _probe(self):
+        offset, dst = _offset_at(self.lower, self.tz)
+        self.starts, self.offsets, self.dst = [self.lower], [offset], [dst]
+        previous = self.lower
+        for probe in range(self.lower + PROBE_STEP, self.upper, PROBE_STEP):
+            if _offset_at(probe, self.tz) != (self.offsets[-1], self.dst[-1]):
+                # The transition lies somewhere in (previous, probe]
+                lo, hi = previous, probe
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    if _offset_at(mid, self.tz) == (self.offsets[-1], self.dst[-1]):
+                        lo = mid
+                    else:
+                        hi = mid
+                offset, dst = _offset_at(hi, self.tz)
+                self.starts.append(hi)
+                self.offsets.append(offset)
+                self.dst.append(dst)
+            previous = probe
+
+    def __len__(self):
+        return len(self.starts)
+
+    def covers(self, epoch):
+        return self.lower <= epoch < self.upper
+
+    def utc_offset(self, epoch):
+        """
+        :param epoch: unix timestamp
+        :return: UTC offset in seconds in effect at `epoch`
+        """
+        if not self.covers(epoch):
+            return _offset_at(epoch, self.tz)[0]
+        return self.offsets[bisect.bisect_right(self.starts, epoch) - 1]
+
+    def to_local(self, epoch):
+        """
+        :param epoch: unix timestamp
+        :return: wall clock time at `epoch`, in seconds
+        """
+        return epoch + self.utc_offset(epoch)
+
+    def to_datetime(self, epoch):
+        """
+        :param epoch: unix timestamp
+        :return: naive datetime object, wall clock time at `epoch`
+        """
+        return _naive(self.to_local(epoch))
+
+    def to_utc(self, local, is_dst=False):
+        """
+        Converts wall clock time back to a unix timestamp, as
+        `pytz.timezone.localize` does
+        :param local: wall clock time, in seconds
+        :param is_dst: which offset to pick for wall clock times which are
+            ambiguous or do not exist because of DST shifts. If None, such
+            times raise an exception instead
+        :return: unix timestamp
+        :raises: pytz.AmbiguousTimeError, pytz.NonExistentTimeError
+        """
+        # UTC offsets are always below a day long
+        if not (self.covers(local - 86400) and self.covers(local + 86400)):
+            naive = _naive(local)
+            return calendar.timegm(_localize(self.tz, naive, is_dst).utctimetuple())
+        period = bisect.bisect_right(self.starts, local) - 1
+        valid = []
+        surrounding = []
+        for candidate in range(max(period - 1, 0), min(period + 2, len(self.starts))):
+            epoch = local - self.offsets[candidate]
+            end = (
+                self.starts[candidate + 1]
+                if candidate + 1 < len(self.starts)
+                else self.upper
+            )
+            if self.starts[candidate] <= epoch < end:
+                valid.append(candidate)
+            surrounding.append(candidate)
+        if len(valid) == 1:
+            return local - self.offsets[valid[0]]
+        if is_dst is None:
+            naive = _naive(local)
+            if valid:
+                raise pytz.AmbiguousTimeError(naive)
+            raise pytz.NonExistentTimeError(naive)
+        if not valid:
+            # Non existent wall clock time, the offset in effect right before
+            # the transition is used, or right after it if `is_dst`
+            previous, following = self._gap(local, surrounding)
+            return local - self.offsets[following if is_dst else previous]
+        # Ambiguous wall clock time, the period whose DST flag matches wins.
+        # Otherwise, the earliest instant is picked if `is_dst`, the latest
+        # if not
+        matching = [
+            candidate for candidate in valid if self.dst[candidate] == bool(is_dst)
+        ] or valid
+        if len(matching) == 1:
+            return local - self.offsets[matching[0]]
+        epochs = sorted(local - self.offsets[candidate] for candidate in matching)
+        return epochs[0] if is_dst else epochs[-1]
+
+    def _gap(self, local, surrounding):
+        for candidate in surrounding:
+            following = candidate + 1
+            if following < len(self.starts) and (
+                local - self.offsets[candidate] >= self.starts[following]
+                and local - self.offsets[following] < self.starts[following]
+            ):
+                return candidate, following
+        return surrounding[0], surrounding[-1]
+
+    def utc_offsets(self, epochs):
+        """
+        :param epochs: sequence or numpy array of unix timestamps
+        :return: UTC offsets in seconds, as a list or as an integer numpy
+            array if `epochs` is a numpy array as well
+        """
+        if np is not None and isinstance(epochs, np.ndarray):
+            epochs = epochs.astype(np.int64)
+            positions = np.searchsorted(self._starts_array, epochs, side="right") - 1
+            offsets = self._offsets_array[np.clip(positions, 0, None)]
+            outside = np.flatnonzero((epochs < self.lower) | (epochs >= self.upper))
+            for position in outside:
+                offsets[position] = _offset_at(int(epochs[position]), self.tz)[0]
+            return offsets
+        return [self.utc_offset(epoch) for epoch in epochs]
+
+    def to_local_many(self, epochs):
+        """
+        :param epochs: sequence or numpy array of unix timestamps
+        :return: wall clock times, as a list or as an integer numpy array if
+            `epochs` is a numpy array as well
+        """
+        if np is not None and isinstance(epochs, np.ndarray):
+            return epochs.astype(np.int64) + self.utc_offsets(epochs)
+        starts, offsets, lower, upper = (
+            self.starts,
+            self.offsets,
+            self.lower,
+            self.upper,
+        )
+        local = []
+        for epoch in epochs:
+            if lower <= epoch < upper:
+                local.append(epoch + offsets[bisect.bisect_right(starts, epoch) - 1])
+            else:
+                local.append(epoch + _offset_at(epoch, self.tz)[0])
+        return local
+
+
+def _localize(tz, naive, is_dst):
+    if hasattr(tz, "localize"):
+        return tz.localize(naive, is_dst=is_dst)
+    return naive.replace(tzinfo=tz)
+
+
+def get_table(tz, start_year=DEFAULT_START_YEAR, end_year=DEFAULT_END_YEAR):
+    """
+    Transition tables are built once per time zone and window of years
+    :param tz: {str|tzinfo} time zone
+    :param start_year: first year covered by the table
+    :param end_year: last year covered by the table
+    :return: TransitionTable
+    """
+    tz = resolve_timezone(tz)
+    key = (tz, start_year, end_year)
+    if key not in _tables:
+        _tables[key] = TransitionTable(tz, start_year, end_year)
+    return _tables[key]
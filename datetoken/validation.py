@@ -0,0 +1,159 @@
+import re
+
+import six
+
+from .parser import AMOUNT_MODIFIERS, MULTI_SNAP_MODIFIERS, SNAP_MODIFIERS
+
+
+def _alternatives(modifiers):
+    # Longest first, although the trailing lookahead already rules out
+    # partial words
+    return "|".join(
+        re.escape(modifier) for modifier in sorted(modifiers, key=len)[::-1]
+    )
+
+
+# Modifiers are the whole alphanumeric word the lexer reads, therefore no
+# letter or digit may follow them
+_END_OF_WORD = r"(?![^\W_])"
+_NOW = r"now"
+_AMOUNT = r"[+-]\d*(?:%s)%s" % (_alternatives(AMOUNT_MODIFIERS), _END_OF_WORD)
+# Only some snap modifiers take an amount, which must be above zero. An
+# amount of one stands for the plain snap, whatever the modifier
+_SNAP = r"[/@](?:(?:0*1)?(?:%s)|0*[1-9]\d*(?:%s))%s" % (
+    _alternatives(SNAP_MODIFIERS),
+    _alternatives(MULTI_SNAP_MODIFIERS),
+    _END_OF_WORD,
+)
+_EXPRESSION = r"(?:%s|%s|%s)" % (_NOW, _AMOUNT, _SNAP)
+# The parser stops, successfully, at a number or word which is not preceded
+# by an operator. Only `now` can be followed by one, such as `nowd`, and
+# whatever comes next is ignored. Words starting with `n` are lexed as a
+# misspelled `now` instead.
+_TAIL = r"(?:(?<=now)(?=[^\W_])(?!n).*)?"
+
+EXPRESSION = re.compile(_EXPRESSION)
+VALID_TOKEN = re.compile(r"%s+%s" % (_EXPRESSION, _TAIL), re.DOTALL)
+_AMOUNT_WORD = re.compile(r"\d*([^\W\d_][^\W_]*)?")
+
+
+class ValidationError(object):
+    """
+    Why and where a token is invalid
+    """
+
+    __slots__ = ("position", "message")
+
+    def __init__(self, position, message):
+        """
+        :param position: index of the offending character within the token,
+            leading whitespace included
+        :param message: human readable description
+        """
+        self.position = position
+        self.message = message
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ValidationError)
+            and self.position == other.position
+            and self.message == other.message
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "ValidationError(%d, %r)" % (self.position, self.message)
+
+
+def is_valid(token):
+    """
+    Checks whether a token would parse, without parsing nor evaluating it
+    :param token: string payload
+    :return: bool
+    """
+    if not isinstance(token, six.string_types):
+        return False
+    return VALID_TOKEN.fullmatch(token.strip()) is not None
+
+
+def _unknown_word(payload, position, words, modifiers, kind):
+    match = words.match(payload, position)
+    start = match.start(1)
+    if start < 0:
+        return ValidationError(
+            match.end(), "Expected %s modifier after operator" % kind
+        )
+    return ValidationError(
+        start,
+        'Expected %s modifier as any of "%s", got "%s"'
+        % (kind, ", ".join(modifiers), match.group(1)),
+    )
+
+
+def _snap_error(payload, position):
+    match = _AMOUNT_WORD.match(payload, position)
+    word = match.group(1)
+    if match.start(1) <= position or word not in SNAP_MODIFIERS:
+        return _unknown_word(payload, position, _AMOUNT_WORD, SNAP_MODIFIERS, "snap")
+    if word not in MULTI_SNAP_MODIFIERS:
+        return ValidationError(
+            position,
+            'Expected snap modifier taking an amount as any of "%s", got "%s"'
+            % (", ".join(MULTI_SNAP_MODIFIERS), word),
+        )
+    return ValidationError(position, "Expected snap amount above zero")
+
+
+def validate(token):
+    """
+    :param token: string payload
+    :return: None if the token is valid, ValidationError otherwise
+    """
+    if not isinstance(token, six.string_types):
+        return ValidationError(0, "Expected a string, got %s" % type(token).__name__)
+    payload = token.strip()
+    offset = len(token) - len(token.lstrip())
+    if VALID_TOKEN.fullmatch(payload):
+        return None
+    if not payload:
+        return ValidationError(offset, "Empty token")
+
+    position = 0
+    while True:
+        match = EXPRESSION.match(payload, position)
+        if match is None:
+            break
+        position = match.end()
+
+    char = payload[position]
+    if char in "+-":
+        error = _unknown_word(
+            payload, position + 1, _AMOUNT_WORD, AMOUNT_MODIFIERS, "amount"
+        )
+    elif char in "/@":
+        error = _snap_error(payload, position + 1)
+    elif char == "n":
+        error = ValidationError(position, 'Expected "now"')
+    elif position == 0 and char.isalnum():
+        error = ValidationError(0, "Expected now or an operator")
+    else:
+        error = ValidationError(position, 'Unexpected character "%s"' % char)
+    error.position += offset
+    return error
+
+
+def validate_many(tokens):
+    """
+    :param tokens: iterable of string payloads
+    :return: list with either None or a ValidationError per token
+    """
+    fullmatch = VALID_TOKEN.fullmatch
+    errors = []
+    for token in tokens:
+        if isinstance(token, six.string_types) and fullmatch(token.strip()):
+            errors.append(None)
+        else:
+            errors.append(validate(token))
+    return errors
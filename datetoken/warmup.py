@@ -0,0 +1,101 @@
+import gc
+import sys
+
+from .evaluator import precompile, resolve_timezone
+
+
+def _deep_sizeof(obj, seen):
+    """
+    Approximate amount of bytes an object and whatever it references take
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += _deep_sizeof(key, seen) + _deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += _deep_sizeof(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(obj.__dict__, seen)
+    return size
+
+
+class WarmupReport(object):
+    """
+    Summary of the state built by `warmup`, which forked workers inherit
+    instead of building it on their own. Sizes are estimates, added up with
+    `sys.getsizeof` over the warm objects, rather than measurements of the
+    memory of the workers
+    """
+
+    def __init__(self, tokens, timezones, warm_bytes, frozen_objects):
+        self.tokens = tokens
+        self.timezones = timezones
+        self.warm_bytes = warm_bytes
+        self.frozen_objects = frozen_objects
+
+    def estimated_shared_bytes(self, workers=1):
+        """
+        :param workers: number of forked workers
+        :return: estimated bytes of warm state that workers share rather than
+            rebuild, as long as they do not write to the pages it lives in
+        """
+        return self.warm_bytes * workers
+
+    def __str__(self):
+        return (
+            "Precompiled %d tokens and %d time zones. "
+            "%.1f KiB estimated to be shared per worker, %d objects frozen"
+            % (
+                self.tokens,
+                self.timezones,
+                self.warm_bytes / 1024.0,
+                self.frozen_objects,
+            )
+        )
+
+
+def warmup(tokens=(), timezones=(), freeze=True):
+    """
+    Meant to be called in the master process of pre-forking servers, such as
+    gunicorn or uwsgi, before workers are forked. Parses tokens ahead of time
+    and loads time zones, so that workers inherit them instead of building
+    their own copies. Optionally, every object alive is moved to the
+    permanent generation of the garbage collector so that collections in the
+    workers do not write to, and therefore copy, the pages they live in.
+    :param tokens: iterable of string payloads
+    :param timezones: iterable of time zone names or pytz objects
+    :param freeze: whether to call `gc.freeze`. Only available since
+        python 3.7
+    :return: WarmupReport
+    :raises: InvalidTokenException, pytz.UnknownTimeZoneError
+    """
+    compiled = precompile(tokens)
+    zones = []
+    for tz in timezones:
+        # pytz caches time zones once loaded from disk
+        zones.append(resolve_timezone(tz))
+
+    seen = set()
+    warm_bytes = _deep_sizeof(compiled, seen)
+    for tz in zones:
+        warm_bytes += _deep_sizeof(tz, seen)
+
+    frozen_objects = 0
+    if freeze and hasattr(gc, "freeze"):
+        gc.collect()
+        gc.freeze()
+        frozen_objects = gc.get_freeze_count()
+    return WarmupReport(len(compiled), len(zones), warm_bytes, frozen_objects)
+
+
+def unfreeze():
+    """
+    Moves back frozen objects to the oldest generation of the garbage
+    collector. Available since python 3.7
+    """
+    if hasattr(gc, "unfreeze"):
+        gc.unfreeze()
@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+import itertools
+
+import pytz
+
+from .ast import get_precise_utc_now
+from .evaluator import (
+    evaluate_nodes,
+    localize,
+    resolve_at,
+    resolve_timezone,
+    to_timestamp,
+)
+from .rollover import get_nodes, next_rollover
+
+
+class Subscription(object):
+    """
+    Callback subscribed to a watched token, returned by `TokenWatcher.watch`
+    """
+
+    __slots__ = ("watcher", "token", "tz", "callback")
+
+    def __init__(self, watcher, token, tz, callback):
+        self.watcher = watcher
+        self.token = token
+        self.tz = tz
+        self.callback = callback
+
+    def cancel(self):
+        """
+        Stops calling the callback. Cancelling twice is harmless
+        """
+        self.watcher._unsubscribe(self)
+
+
+class _Watch(object):
+    __slots__ = ("nodes", "tz", "subscriptions", "value", "version")
+
+    def __init__(self, nodes, tz, value, version):
+        self.nodes = nodes
+        self.tz = tz
+        self.subscriptions = []
+        self.value = value
+        self.version = version
+
+
+class TokenWatcher(object):
+    """
+    Calls back whenever the value of a watched token changes, such as
+    `now/d` at midnight, without polling. Every token sleeps until its next
+    rollover on a single heap of deadlines, served by one timer on the event
+    loop, so that thousands of tokens cost one wake up per actual change.
+
+    Callbacks take the token and its new value, and may be coroutine
+    functions, in which case they run as tasks of the loop.
+    Subscriptions to the same token and time zone share a single evaluation.
+    """
+
+    def __init__(self, tz=None, loop=None, clock=get_precise_utc_now):
+        """
+        :param tz: {str|pytz.timezone} default time zone tokens are
+            evaluated in
+        :param loop: event loop to schedule the timer on. Defaults to the
+            running loop as of the first call to `watch`
+        :param clock: callable returning the current date, naive dates being
+            UTC. Defaults to utc now, microseconds included, for the timer to
+            fire on time. Tokens are evaluated against whole seconds
+        """
+        self._tz = resolve_timezone(tz)
+        self._loop = loop
+        self._clock = clock
+        self._watches = {}
+        self._heap = []
+        self._versions = itertools.count()
+        self._timer = None
+        self._deadline = None
+        self._closed = False
+
+    def __len__(self):
+        """
+        :return: number of distinct tokens being watched
+        """
+        return len(self._watches)
+
+    def _precise_now(self):
+        return localize(resolve_at(self._clock()), pytz.UTC)
+
+    def _now(self):
+        return self._precise_now().replace(microsecond=0)
+
+    def watch(self, token, callback, tz=None):
+        """
+        Subscribes a callback to the changes of a token
+        :param token: string payload or `datetoken.objects.Token`
+        :param callback: callable, or coroutine function, taking the token and
+            its new value, an aware datetime object
+        :param tz: {str|pytz.timezone} overrides the time zone of the watcher
+        :return: `Subscription`, to be cancelled when no longer interested
+        :raises: InvalidTokenException, RuntimeError if the watcher is closed
+        """
+        if self._closed:
+            raise RuntimeError("The watcher is closed")
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        tz = resolve_timezone(tz) or self._tz
+        key = (str(token), tz)
+        watch = self._watches.get(key)
+        if watch is None:
+            nodes = get_nodes(token)
+            now = self._now()
+            watch = _Watch(
+                nodes,
+                tz,
+                evaluate_nodes(nodes, resolve_at(now, tz)),
+                next(self._versions),
+            )
+            self._watches[key] = watch
+            self._push(watch, now)
+            self._schedule()
+        subscription = Subscription(self, key[0], tz, callback)
+        watch.subscriptions.append(subscription)
+        return subscription
+
+    def value(self, token, tz=None):
+        """
+        :param token: watched string payload
+        :param tz: {str|pytz.timezone} time zone it is watched in
+        :return: last value the token was seen with
+        :raises: KeyError if the token is not being watched
+        """
+        tz = resolve_timezone(tz) or self._tz
+        return self._watches[(str(token), tz)].value
+
+    def _unsubscribe(self, subscription):
+        key = (subscription.token, subscription.tz)
+        watch = self._watches.get(key)
+        if watch is None or subscription not in watch.subscriptions:
+            return
+        watch.subscriptions.remove(subscription)
+        if not watch.subscriptions:
+            # Its heap entry is skipped once due
+            del self._watches[key]
+
+    def close(self):
+        """
+        Drops every subscription and cancels the timer
+        """
+        self._closed = True
+        self._watches.clear()
+        self._heap = []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _push(self, watch, now):
+        deadline = to_timestamp(next_rollover(watch.nodes, now, watch.tz))
+        heapq.heappush(self._heap, (deadline, watch.version, watch))
+
+    def _schedule(self):
+        """
+        Points the timer to the earliest deadline, unless it already does
+        """
+        if not self._heap or self._closed:
+            return
+        deadline = self._heap[0][0]
+        if self._timer is not None:
+            if self._deadline <= deadline:
+                return
+            self._timer.cancel()
+        delay = max(0, deadline - to_timestamp(self._precise_now()))
+        self._deadline = deadline
+        self._timer = self._loop.call_later(delay, self._wake)
+
+    def _wake(self):
+        self._timer = None
+        precise_now = self._precise_now()
+        now = precise_now.replace(microsecond=0)
+        timestamp = to_timestamp(precise_now)
+        due = []
+        while self._heap and self._heap[0][0] <= timestamp:
+            _, version, watch = heapq.heappop(self._heap)
+            if watch.subscriptions and watch.version == version:
+                due.append(watch)
+        try:
+            for watch in due:
+                try:
+                    value = evaluate_nodes(watch.nodes, resolve_at(now, watch.tz))
+                    # Rollovers might come early, such as those of week day snaps
+                    if value != watch.value:
+                        watch.value = value
+                        for subscription in list(watch.subscriptions):
+                            self._call(subscription, value)
+                finally:
+                    self._push(watch, now)
+        finally:
+            self._schedule()
+
+    def _call(self, subscription, value):
+        """
+        Errors of the callback are reported to the exception handler of the
+        loop, as those of coroutine callbacks are, so that they neither stop
+        the other callbacks nor the timer
+        """
+        try:
+            result = subscription.callback(subscription.token, value)
+        except Exception as e:
+            self._loop.call_exception_handler(
+                {
+                    "message": 'Exception in callback of token "%s"'
+                    % subscription.token,
+                    "exception": e,
+                    "subscription": subscription,
+                }
+            )
+            return
+        if asyncio.iscoroutine(result):
+            self._loop.create_task(result)
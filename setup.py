@@ -44,5 +44,6 @@ setup(
             "tox",
         ],
         "docs": [],
+        "numpy": ["numpy"],
     },
 )
@@ -0,0 +1,125 @@
+import random
+import unittest
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from datetoken.batch import TokenTrie, eval_many, eval_sorted
+from datetoken.evaluator import evaluate_nodes, parse_datetoken, resolve_at
+from datetoken.exceptions import InvalidTokenException
+from datetoken.utils import token_to_date
+
+now = datetime(2019, 3, 20, 15, 45, 12)
+PRESETS = (
+    "now",
+    "now/d",
+    "now@d",
+    "now-1d/d",
+    "now-1d@d",
+    "now-1M/M",
+    "now-1M@M",
+    "now-1M/M+w/bw",
+    "now-1M/M+w@bw",
+    "now-1Y/Y",
+    "now-1Y@Y",
+)
+
+
+class TokenTrieTestCase(unittest.TestCase):
+    def test_matches_separate_evaluation(self):
+        trie = TokenTrie(PRESETS)
+        for tz in (None, "Europe/Madrid", "America/New_York"):
+            result = trie.eval(at=now, tz=tz)
+            self.assertEqual(set(PRESETS), set(result))
+            for token in PRESETS:
+                self.assertEqual(token_to_date(token, at=now, tz=tz), result[token])
+
+    def test_prefixes_are_shared(self):
+        trie = TokenTrie(PRESETS)
+        # now, /d, @d, -1d, -1d/d, -1d@d, -1M, -1M/M, -1M@M, -1M/M+1w,
+        # -1M/M+1w/bw, -1M/M+1w@bw, -1Y, -1Y/Y, -1Y@Y
+        self.assertEqual(15, trie.size)
+        self.assertEqual(len(PRESETS), len(trie))
+
+    def test_equivalent_tokens_share_nodes(self):
+        trie = TokenTrie(["now-d", "now-1d", "-1d"])
+        self.assertEqual(2, trie.size)
+        self.assertEqual(1, len(set(trie.eval(at=now).values())))
+
+    def test_duplicates(self):
+        trie = TokenTrie(["now/d", "now/d"])
+        self.assertEqual(["now/d"], trie.tokens)
+
+    def test_invalid_tokens_should_raise(self):
+        with self.assertRaises(InvalidTokenException):
+            TokenTrie(["now/d", "now+"])
+
+    def test_eval_many(self):
+        self.assertEqual(
+            {"now/d": token_to_date("now/d", at=now)}, eval_many(["now/d"], at=now)
+        )
+
+
+class EvalSortedTestCase(unittest.TestCase):
+    tokens = PRESETS + (
+        "now-1h",
+        "now+90m-2w",
+        "now-1M",
+        "now-3bd",
+        "now/mon",
+        "now-2d@tue",
+        "now/h+30m",
+        "now/Q2",
+        "now-1w/w",
+        "now/FQ",
+        "now-1h/15m",
+        "now@6h",
+    )
+
+    def anchors(self, start, count, step):
+        rnd = random.Random(start.toordinal())
+        anchors, moment = [], start
+        for _ in range(count):
+            moment += timedelta(
+                seconds=rnd.randint(0, step), microseconds=rnd.randint(0, 999999)
+            )
+            anchors.append(moment)
+        return anchors
+
+    def assert_matches(self, token, anchors, tz):
+        nodes = parse_datetoken(token)
+        expected = [evaluate_nodes(nodes, resolve_at(anchor, tz)) for anchor in anchors]
+        actual = eval_sorted(token, anchors, tz=tz)
+        for anchor, value, expected_value in zip(anchors, actual, expected):
+            self.assertEqual(
+                (expected_value, expected_value.utcoffset()),
+                (value, value.utcoffset()),
+                "%s at %s in %s" % (token, anchor, tz),
+            )
+        self.assertEqual(len(anchors), len(actual))
+
+    def test_matches_separate_evaluation(self):
+        # Spanning the spring and autumn DST shifts of Europe and America
+        for start in (datetime(2019, 3, 8), datetime(2019, 10, 25)):
+            anchors = self.anchors(start, 400, 7200)
+            for tz in (None, "Europe/Madrid", "America/New_York", "Asia/Kolkata"):
+                for token in self.tokens:
+                    self.assert_matches(token, anchors, tz)
+
+    def test_aware_anchors(self):
+        anchors = [
+            pytz.timezone("Asia/Tokyo").localize(anchor)
+            for anchor in self.anchors(datetime(2019, 12, 30), 200, 3600)
+        ]
+        for token in self.tokens:
+            self.assert_matches(token, anchors, "Europe/Madrid")
+
+    def test_unsorted_anchors(self):
+        anchors = self.anchors(datetime(2019, 3, 30), 300, 1800)
+        random.Random(0).shuffle(anchors)
+        for token in self.tokens:
+            self.assert_matches(token, anchors, "Europe/Madrid")
+
+    def test_empty(self):
+        self.assertEqual([], eval_sorted("now/d", []))
@@ -0,0 +1,118 @@
+import calendar
+import random
+import unittest
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from datetoken.bounds import (
+    SNAP_BOUNDS,
+    month_shift_bounds,
+    offset_bounds,
+    partition_keys,
+    value_bounds,
+)
+from datetoken.evaluator import evaluate_nodes, parse_datetoken, resolve_at
+from datetoken.exceptions import UnsupportedTokenException
+
+now = datetime(2019, 3, 20, 15, 45, 12)
+
+
+def random_anchors(rnd, count):
+    for _ in range(count):
+        at = datetime(1971, 1, 1) + timedelta(seconds=rnd.randint(0, 120 * 365 * 86400))
+        # Favour the edges of days and months, where bounds are reached
+        if rnd.random() < 0.4:
+            at = at.replace(
+                hour=rnd.choice((0, 23)),
+                minute=rnd.choice((0, 59)),
+                second=rnd.choice((0, 59)),
+            )
+        if rnd.random() < 0.4:
+            last = calendar.monthrange(at.year, at.month)[1]
+            at = at.replace(day=rnd.choice((1, last)))
+        yield at
+
+
+class OffsetBoundsTestCase(unittest.TestCase):
+    def test_month_shifts(self):
+        self.assertEqual((28, 31), month_shift_bounds(1))
+        self.assertEqual((-31, -28), month_shift_bounds(-1))
+        self.assertEqual((365, 366), month_shift_bounds(12))
+        self.assertEqual((-366, -365), month_shift_bounds(-12))
+
+    def test_snapped_days(self):
+        self.assertEqual(
+            (timedelta(days=-8, seconds=1), timedelta(days=-7)),
+            offset_bounds("now-7d/d"),
+        )
+
+    def test_several_units(self):
+        self.assertEqual(
+            (timedelta(seconds=-899), timedelta(0)), offset_bounds("now/15m")
+        )
+        self.assertEqual(
+            (timedelta(0), timedelta(hours=6, seconds=-1)), offset_bounds("now@6h")
+        )
+
+    def test_fixed_modifiers(self):
+        self.assertEqual(
+            (timedelta(minutes=-150), timedelta(minutes=-150)),
+            offset_bounds("now-3h+30m"),
+        )
+
+    def test_bounds_hold(self):
+        rnd = random.Random(11)
+        tokens = ["now%s%s" % (op, unit) for op in "/@" for unit in SNAP_BOUNDS[op]]
+        tokens += ["now-1M/M+w@bw", "now-1Y+3M@Q2", "now+13M/M-1d", "now-1M-1M"]
+        tokens += ["now/15m", "now-1d@6h", "now@2w"]
+        for token in tokens:
+            low, high = offset_bounds(token)
+            nodes = parse_datetoken(token)
+            for at in random_anchors(rnd, 300):
+                start = resolve_at(at, rnd.choice((None, "Europe/Madrid")))
+                offset = evaluate_nodes(nodes, start) - start
+                self.assertTrue(low <= offset <= high, (token, at))
+
+    def test_business_days_should_raise(self):
+        with self.assertRaises(UnsupportedTokenException):
+            offset_bounds("now-2bd")
+        with self.assertRaises(UnsupportedTokenException):
+            offset_bounds("now/bd")
+
+
+class PartitionKeysTestCase(unittest.TestCase):
+    def test_value_bounds(self):
+        low, high = value_bounds("now-1d/d", at=now, until=now + timedelta(hours=12))
+        self.assertEqual(datetime(2019, 3, 18, 15, 45, 13, tzinfo=pytz.UTC), low)
+        self.assertEqual(datetime(2019, 3, 20, 3, 45, 12, tzinfo=pytz.UTC), high)
+
+    def test_daily_partitions(self):
+        self.assertEqual(
+            [
+                datetime(2019, 3, 12),
+                datetime(2019, 3, 13),
+                datetime(2019, 3, 14),
+                datetime(2019, 3, 15),
+                datetime(2019, 3, 16),
+                datetime(2019, 3, 17),
+                datetime(2019, 3, 18),
+                datetime(2019, 3, 19),
+                datetime(2019, 3, 20),
+            ],
+            partition_keys("now-7d/d", "now", unit="d", at=now),
+        )
+
+    def test_hourly_partitions_in_time_zone(self):
+        keys = partition_keys("now-2h/h", "now", unit="h", at=now, tz="Europe/Madrid")
+        self.assertEqual(datetime(2019, 3, 20, 13), keys[0])
+        self.assertEqual(datetime(2019, 3, 20, 16), keys[-1])
+
+    def test_ids(self):
+        ids = partition_keys("now-1M/M", "now-1M@M", unit="M", at=now, ids=True)
+        self.assertIsInstance(ids, range)
+        self.assertEqual(3, len(ids))
+
+    def test_empty_range(self):
+        self.assertEqual([], partition_keys("now", "now-1d", at=now))
@@ -0,0 +1,120 @@
+import pytz
+import random
+import unittest
+
+from datetime import datetime, timedelta
+
+from datetoken.bucket import bucket, bucket_start
+from datetoken.evaluator import eval_datetoken, resolve_timezone
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+start = datetime(2018, 12, 15, 10, 12, 34, tzinfo=pytz.UTC)
+rnd = random.Random(7)
+moments = sorted(
+    start + timedelta(seconds=rnd.randint(0, 2 * 365 * 86400)) for _ in range(300)
+)
+
+
+class BucketTestCase(unittest.TestCase):
+    def assertSnapsLikeTokens(self, unit, tz=None, moments=moments):
+        keys = bucket(moments, unit, tz=tz)
+        ids = bucket(moments, unit, tz=tz, ids=True)
+        zone = resolve_timezone(tz) or pytz.UTC
+        for moment, key, bucket_id in zip(moments, keys, ids):
+            expected = eval_datetoken("now/" + unit, at=moment, tz=tz).to_date()
+            # Same wall clock time, even on days clocks change
+            self.assertEqual(
+                expected.replace(tzinfo=None),
+                bucket_start(unit, bucket_id),
+                (unit, moment),
+            )
+            # Tokens keep the offset of the moment, buckets start at the one
+            # in force at their start, which only differ on days clocks change
+            offset = datetime.fromtimestamp(key, zone).utcoffset()
+            self.assertEqual(
+                offset - expected.utcoffset(),
+                timedelta(seconds=int(expected.timestamp()) - key),
+                (unit, moment),
+            )
+
+    def test_fixed_units(self):
+        for unit in ("m", "h", "d"):
+            self.assertSnapsLikeTokens(unit)
+
+    def test_calendar_units(self):
+        for unit in ("w", "bw", "M", "Q", "Y", "Q1", "Q2", "Q3", "Q4", "1M", "1Q"):
+            self.assertSnapsLikeTokens(unit)
+
+    def test_several_units(self):
+        for unit in ("5m", "15m", "6h", "2d", "2w", "1w", "30s", "1s"):
+            self.assertSnapsLikeTokens(unit)
+            self.assertSnapsLikeTokens(unit, tz="Asia/Kolkata")
+        self.assertEqual(datetime(1969, 12, 29), bucket_start("2w", 0))
+        self.assertEqual(datetime(1970, 1, 1, 0, 15), bucket_start("15m", 1))
+
+    def test_time_zone(self):
+        for unit in ("h", "d", "w", "M", "Y"):
+            self.assertSnapsLikeTokens(unit, tz="Asia/Kolkata")
+
+    def test_daylight_saving_days(self):
+        madrid = pytz.timezone("Europe/Madrid")
+        days = []
+        for day in (datetime(2019, 3, 30, 12), datetime(2019, 10, 26, 12)):
+            day = pytz.UTC.localize(day)
+            days.extend(day + timedelta(minutes=7 * i) for i in range(500))
+        for unit in ("15m", "h", "d", "w", "M"):
+            self.assertSnapsLikeTokens(unit, tz=madrid, moments=days)
+        keys = bucket(days, "h", tz=madrid)
+        self.assertTrue(all(key <= day.timestamp() for key, day in zip(keys, days)))
+
+    def test_buckets_start_on_their_actual_offset(self):
+        # Madrid moves to summer time during the morning of 2019-03-31
+        moment = datetime(2019, 3, 31, 12, tzinfo=pytz.UTC)
+        self.assertEqual(
+            [int(datetime(2019, 3, 30, 23, tzinfo=pytz.UTC).timestamp())],
+            bucket([moment], "d", tz="Europe/Madrid"),
+        )
+        self.assertEqual(
+            [int(datetime(2019, 3, 31, 12, tzinfo=pytz.UTC).timestamp())],
+            bucket([moment], "h", tz="Europe/Madrid"),
+        )
+
+    def test_week_days_start_weeks(self):
+        keys = bucket([datetime(2016, 11, 28, 12, 55, 23)], "fri")
+        self.assertEqual(
+            [int(datetime(2016, 11, 25, tzinfo=pytz.UTC).timestamp())], keys
+        )
+
+    def test_ids_are_consecutive(self):
+        days = [datetime(2019, 1, 31), datetime(2019, 2, 1), datetime(2019, 3, 1)]
+        self.assertEqual([0, 1, 2], [i - 24228 for i in bucket(days, "M", ids=True)])
+        self.assertEqual(datetime(2019, 2, 1), bucket_start("M", 24229))
+
+    def test_unix_timestamps(self):
+        epochs = [moment.timestamp() for moment in moments]
+        self.assertEqual(bucket(moments, "d"), bucket(epochs, "d"))
+
+    def test_unknown_unit_should_raise(self):
+        self.assertRaises(ValueError, bucket, moments, "x")
+        self.assertRaises(ValueError, bucket, moments, "0m")
+        self.assertRaises(ValueError, bucket, moments, "2M")
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy(self):
+        epochs = np.array([moment.timestamp() for moment in moments])
+        for unit in ("h", "d", "w", "sun", "M", "Q", "Y", "Q3", "15m", "2w"):
+            for tz in (None, "America/Chicago"):
+                expected = bucket(moments, unit, tz=tz)
+                self.assertEqual(expected, bucket(epochs, unit, tz=tz).tolist())
+                self.assertEqual(
+                    expected,
+                    bucket(epochs.astype("datetime64[s]"), unit, tz=tz).tolist(),
+                )
+                self.assertEqual(
+                    bucket(moments, unit, tz=tz, ids=True),
+                    bucket(epochs, unit, tz=tz, ids=True).tolist(),
+                )
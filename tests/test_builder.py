@@ -0,0 +1,90 @@
+import unittest
+
+from datetime import datetime
+
+import pytz
+
+from datetoken.builder import TokenBuilder, now
+from datetoken.evaluator import eval_datetoken, parse_datetoken
+from datetoken.exceptions import InvalidTokenException
+from datetoken.rollover import next_rollover
+
+at = datetime(2019, 3, 30, 22, 58, 12)
+
+
+class TokenBuilderTestCase(unittest.TestCase):
+    def assertBuilds(self, builder, payload):
+        self.assertEqual(payload, str(builder))
+        self.assertEqual(
+            [str(node) for node in parse_datetoken(payload)],
+            [str(node) for node in builder.nodes],
+        )
+        for tz in (None, "Europe/Madrid"):
+            self.assertEqual(
+                eval_datetoken(payload, at=at, tz=tz).to_date(),
+                builder.eval(at=at, tz=tz),
+            )
+
+    def test_build(self):
+        self.assertBuilds(now(), "now")
+        self.assertBuilds(now().minus(3, "d").snap_start("d"), "now-3d/d")
+        self.assertBuilds(
+            now().plus(1, "w").snap_start("mon").snap_start("d"), "now+1w/mon/d"
+        )
+        self.assertBuilds(now().snap_end("Q").minus(2, "bd"), "now@Q-2bd")
+        self.assertBuilds(now().snap_start("m", 15).plus(0, "s"), "now/15m+0s")
+        self.assertBuilds(now().snap_end("d", 1), "now@d")
+        self.assertBuilds(now().minus(1, "M").snap_end("FY"), "now-1M@FY")
+
+    def test_builders_are_immutable(self):
+        base = now().minus(1, "d")
+        start, end = base.snap_start("d"), base.snap_end("d")
+        self.assertEqual("now-1d", str(base))
+        self.assertEqual("now-1d/d", str(start))
+        self.assertEqual("now-1d@d", str(end))
+
+    def test_equality(self):
+        self.assertEqual(now().minus(1, "d"), now().minus(1, "d"))
+        self.assertNotEqual(now().minus(1, "d"), now().minus(2, "d"))
+        self.assertEqual(1, len({now().snap_start("h"), now().snap_start("h")}))
+
+    def test_to_token(self):
+        token = now().minus(1, "d").snap_start("d").to_token(at=at, tz="Asia/Kolkata")
+        expected = eval_datetoken("now-1d/d", at=at, tz="Asia/Kolkata")
+        self.assertEqual(expected.to_date(), token.to_date())
+        self.assertTrue(token.is_snapped)
+        self.assertTrue(token.is_calculated)
+        self.assertEqual("now-1d/d", str(token))
+
+    def test_nodes(self):
+        self.assertEqual("now-1d", str(TokenBuilder(parse_datetoken("-1d"))))
+        self.assertEqual(
+            next_rollover("now/h", at=at), next_rollover(now().snap_start("h"), at=at)
+        )
+
+    def test_invalid_units_should_raise(self):
+        for build in (
+            lambda: now().minus(1, "Q"),
+            lambda: now().plus(1, "x"),
+            lambda: now().plus(-1, "d"),
+            lambda: now().plus(1.5, "d"),
+            lambda: now().plus(True, "d"),
+            lambda: now().snap_start("x"),
+            lambda: now().snap_end("M", 2),
+            lambda: now().snap_start("m", 0),
+            lambda: now().snap_start("m", "15"),
+        ):
+            self.assertRaises(InvalidTokenException, build)
+
+    def test_error_message(self):
+        with self.assertRaises(InvalidTokenException) as context:
+            now().minus(1, "d").snap_start("x")
+        self.assertTrue(
+            context.exception.message.startswith('Token "now-1d" is invalid')
+        )
+
+    def test_utc_result(self):
+        self.assertEqual(
+            datetime(2019, 3, 29, tzinfo=pytz.UTC),
+            now().minus(1, "d").snap_start("d").eval(at=at),
+        )
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import unittest
+
+from datetime import datetime, timedelta
+
+from datetoken.caching import cached_for
+from datetoken.exceptions import InvalidTokenException
+
+
+class Clock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CachedForTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock(datetime(2019, 3, 30, 22, 58))
+        self.calls = []
+
+    def report(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return len(self.calls)
+
+    def test_expires_on_rollover(self):
+        report = cached_for("now/h", clock=self.clock)(self.report)
+        self.assertEqual(1, report("sales"))
+        self.assertEqual(1, report("sales"))
+        self.assertEqual(2, report("visits"))
+        self.clock.now += timedelta(seconds=119)
+        self.assertEqual(1, report("sales"))
+        self.clock.now += timedelta(seconds=1)
+        self.assertEqual(3, report("sales"))
+        info = report.cache_info()
+        self.assertEqual((2, 3, 1, 128, 2), tuple(info))
+
+    def test_keyword_arguments(self):
+        report = cached_for("now/d", clock=self.clock)(self.report)
+        self.assertEqual(1, report("sales", region="eu", days=1))
+        self.assertEqual(1, report("sales", days=1, region="eu"))
+        self.assertEqual(2, report("sales", region="us", days=1))
+        self.assertEqual(3, report("sales"))
+
+    def test_per_call_time_zone(self):
+        report = cached_for("now/d", clock=self.clock)(self.report)
+        report("sales", tz="Europe/Madrid")
+        report("sales")
+        # Past midnight in Madrid, not yet in UTC
+        self.clock.now += timedelta(minutes=5)
+        self.assertEqual(3, report("sales", tz="Europe/Madrid"))
+        self.assertEqual(2, report("sales"))
+        self.assertEqual((("sales",), {"tz": "Europe/Madrid"}), self.calls[0])
+
+    def test_default_time_zone(self):
+        report = cached_for("now/d", tz="Asia/Kolkata", tz_arg=None, clock=self.clock)(
+            self.report
+        )
+        report("sales", tz="UTC")
+        self.clock.now = datetime(2019, 3, 31, 18, 29, 59)
+        self.assertEqual(1, report("sales", tz="UTC"))
+        self.clock.now += timedelta(seconds=1)
+        self.assertEqual(2, report("sales", tz="UTC"))
+
+    def test_least_recently_used_are_evicted(self):
+        report = cached_for("now/d", maxsize=2, clock=self.clock)(self.report)
+        report(1)
+        report(2)
+        report(1)
+        report(3)
+        self.assertEqual(1, report(1))
+        self.assertEqual(4, report(2))
+        self.assertEqual(2, report.cache_info().currsize)
+        report.cache_clear()
+        self.assertEqual(5, report(1))
+
+    def test_wraps(self):
+        @cached_for("now/d")
+        def daily_report(name):
+            """Sales"""
+
+        self.assertEqual("daily_report", daily_report.__name__)
+        self.assertEqual("Sales", daily_report.__doc__)
+
+    def test_threads(self):
+        report = cached_for("now/h", maxsize=8, clock=self.clock)(lambda key: key * 2)
+        errors = []
+
+        def work():
+            try:
+                for i in range(2000):
+                    assert report(i % 16) == (i % 16) * 2
+            except AssertionError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(8, report.cache_info().currsize)
+
+    def test_coroutine_functions(self):
+        @cached_for("now/h", clock=self.clock)
+        async def report(name):
+            await asyncio.sleep(0)
+            return self.report(name)
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(1, loop.run_until_complete(report("sales")))
+            self.assertEqual(1, loop.run_until_complete(report("sales")))
+            self.clock.now += timedelta(minutes=2)
+            self.assertEqual(2, loop.run_until_complete(report("sales")))
+        finally:
+            loop.close()
+
+    def test_invalid_token(self):
+        with self.assertRaises(InvalidTokenException):
+            cached_for("now/x")
@@ -0,0 +1,324 @@
+import pytz
+import random
+import unittest
+
+from datetime import date, datetime, timedelta
+
+from datetoken.bucket import bucket
+from datetoken.ast import SnapExpression
+from datetoken.calendars import (
+    TABLE_SNAPS,
+    DayTable,
+    FiscalCalendar,
+    HolidayCalendar,
+    RetailCalendar,
+    set_day_table,
+    set_fiscal_calendar,
+    set_holiday_calendar,
+)
+from datetoken.rollover import next_rollover
+from datetoken.utils import token_to_date
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Monday
+now = datetime(2019, 12, 23, 15, 45, 12)
+HOLIDAYS = (date(2019, 12, 25), date(2019, 12, 26), date(2020, 1, 1))
+
+
+def walk_business_days(calendar, day, amount):
+    step = 1 if amount > 0 else -1
+    while amount:
+        day += timedelta(days=step)
+        if calendar.is_business_day(day):
+            amount -= step
+    return day
+
+
+class HolidayCalendarTestCase(unittest.TestCase):
+    def test_is_business_day(self):
+        calendar = HolidayCalendar(HOLIDAYS)
+        self.assertTrue(calendar.is_business_day(date(2019, 12, 24)))
+        self.assertFalse(calendar.is_business_day(date(2019, 12, 25)))
+        self.assertFalse(calendar.is_business_day(date(2019, 12, 28)))
+
+    def test_add_business_days_matches_walking_day_by_day(self):
+        rnd = random.Random(3)
+        for weekend in ((5, 6), (4, 5), (6,)):
+            holidays = [
+                date(2019, 1, 1) + timedelta(days=rnd.randint(0, 2000))
+                for _ in range(150)
+            ]
+            calendar = HolidayCalendar(holidays, weekend=weekend)
+            for _ in range(200):
+                day = date(2019, 6, 1) + timedelta(days=rnd.randint(0, 1000))
+                amount = rnd.choice((-1, 1)) * rnd.randint(1, 300)
+                self.assertEqual(
+                    walk_business_days(calendar, day, amount),
+                    date.fromordinal(calendar.add_business_days(day, amount)),
+                    (weekend, day, amount),
+                )
+
+    def test_non_business_days_move_from_the_closest_business_day(self):
+        calendar = HolidayCalendar()
+        saturday = date(2019, 12, 28)
+        self.assertEqual(
+            date(2019, 12, 30),
+            date.fromordinal(calendar.add_business_days(saturday, 1)),
+        )
+        self.assertEqual(
+            date(2019, 12, 27),
+            date.fromordinal(calendar.add_business_days(saturday, -1)),
+        )
+
+    def test_thousands_of_business_days(self):
+        calendar = HolidayCalendar()
+        self.assertEqual(
+            date(2058, 4, 22),
+            date.fromordinal(calendar.add_business_days(date(2019, 12, 23), 10000)),
+        )
+
+    def test_whole_week_weekend_should_raise(self):
+        self.assertRaises(ValueError, HolidayCalendar, weekend=range(7))
+
+
+class BusinessDayTokensTestCase(unittest.TestCase):
+    def setUp(self):
+        set_holiday_calendar(HolidayCalendar(HOLIDAYS))
+
+    def tearDown(self):
+        set_holiday_calendar(None)
+
+    def test_business_day_modifiers(self):
+        self.assertEqual(
+            datetime(2019, 12, 27, 15, 45, 12, tzinfo=pytz.UTC),
+            token_to_date("now+2bd", at=now),
+        )
+        self.assertEqual(
+            datetime(2019, 12, 16, 15, 45, 12, tzinfo=pytz.UTC),
+            token_to_date("now-5bd", at=now),
+        )
+        self.assertEqual(
+            datetime(2020, 1, 2, 15, 45, 12, tzinfo=pytz.UTC),
+            token_to_date("now+bd+4bd", at=now),
+        )
+
+    def test_business_day_snaps(self):
+        christmas = datetime(2019, 12, 25, 10)
+        self.assertEqual(
+            datetime(2019, 12, 24, tzinfo=pytz.UTC),
+            token_to_date("now/bd", at=christmas),
+        )
+        self.assertEqual(
+            datetime(2019, 12, 24, 23, 59, 59, tzinfo=pytz.UTC),
+            token_to_date("now@bd", at=christmas),
+        )
+        self.assertEqual(
+            datetime(2019, 12, 23, 23, 59, 59, tzinfo=pytz.UTC),
+            token_to_date("now@bd", at=now),
+        )
+
+    def test_weekend_business_day_snaps(self):
+        saturday = datetime(2019, 12, 21, 10)
+        self.assertEqual(
+            (
+                datetime(2019, 12, 20, tzinfo=pytz.UTC),
+                datetime(2019, 12, 20, 23, 59, 59, tzinfo=pytz.UTC),
+            ),
+            (
+                token_to_date("now/bd", at=saturday),
+                token_to_date("now@bd", at=saturday),
+            ),
+        )
+        start = int(token_to_date("now/bd", at=saturday).timestamp())
+        self.assertEqual([start], bucket([saturday], "bd"))
+
+    def test_bucket(self):
+        days = [datetime(2019, 12, 24, 10), datetime(2019, 12, 26, 10)]
+        expected = int(datetime(2019, 12, 24, tzinfo=pytz.UTC).timestamp())
+        self.assertEqual([expected, expected], bucket(days, "bd"))
+
+
+class FiscalCalendarTestCase(unittest.TestCase):
+    def test_default_calendar_matches_calendar_quarters(self):
+        calendar = FiscalCalendar()
+        day = date(1970, 1, 1)
+        while day.year < 2030:
+            self.assertEqual(
+                token_to_date("now/Q", at=datetime.combine(day, datetime.min.time())),
+                token_to_date("now/FQ", at=datetime.combine(day, datetime.min.time())),
+            )
+            self.assertEqual(
+                date(day.year, 1, 1).toordinal(), calendar.start("FY", day)
+            )
+            day += timedelta(days=17)
+
+    def test_start_month(self):
+        calendar = FiscalCalendar(start_month=10)
+        self.assertEqual(
+            date(2019, 10, 1), date.fromordinal(calendar.start("FY", date(2020, 3, 5)))
+        )
+        self.assertEqual(
+            date(2020, 9, 30), date.fromordinal(calendar.end("FY", date(2020, 3, 5)))
+        )
+        self.assertEqual(
+            date(2020, 1, 1), date.fromordinal(calendar.start("FQ", date(2020, 3, 5)))
+        )
+
+    def test_out_of_range_should_raise(self):
+        calendar = FiscalCalendar(start_year=2000, end_year=2010)
+        with self.assertRaises(ValueError):
+            calendar.start("FQ", date(1999, 12, 31))
+        with self.assertRaises(ValueError):
+            calendar.start("FQ", date(2011, 1, 1))
+
+
+class RetailCalendarTestCase(unittest.TestCase):
+    def test_years_end_on_the_last_saturday_of_january(self):
+        calendar = RetailCalendar()
+        self.assertEqual(
+            date(2019, 1, 27), date.fromordinal(calendar.start("FY", date(2019, 6, 1)))
+        )
+        for year in range(1975, 2095):
+            end = date.fromordinal(calendar.year_end(year))
+            self.assertEqual((1, 5), (end.month, end.weekday()))
+            self.assertGreater(end + timedelta(days=7), date(year, 1, 31))
+
+    def test_nearest_week_day(self):
+        calendar = RetailCalendar(nearest=True)
+        for year in range(1975, 2095):
+            end = date.fromordinal(calendar.year_end(year))
+            self.assertEqual(5, end.weekday())
+            self.assertLessEqual(abs((end - date(year, 1, 31)).days), 3)
+
+    def test_4_4_5_pattern(self):
+        calendar = RetailCalendar(start_year=2015, end_year=2025)
+        months = calendar.boundaries["FM"]
+        years = calendar.boundaries["FY"]
+        for start, following in zip(years, years[1:]):
+            first, last = months.index(start), months.index(following)
+            weeks = [
+                (b - a) // 7
+                for a, b in zip(months[first:last], months[first + 1 : last + 1])
+            ]
+            self.assertEqual([4, 4, 5] * 3 + [4, 4], weeks[:-1])
+            self.assertIn(weeks[-1], (5, 6))
+            self.assertEqual((following - start) // 7, sum(weeks))
+
+    def test_wrong_pattern_should_raise(self):
+        with self.assertRaises(ValueError):
+            RetailCalendar(pattern=(4, 4, 4))
+
+
+class FiscalTokensTestCase(unittest.TestCase):
+    def setUp(self):
+        set_fiscal_calendar(RetailCalendar(start_year=2010, end_year=2030))
+
+    def tearDown(self):
+        set_fiscal_calendar(None)
+
+    def test_fiscal_snaps(self):
+        at = datetime(2019, 3, 20, 10)
+        self.assertEqual(
+            datetime(2019, 1, 27, tzinfo=pytz.UTC), token_to_date("now/FY", at=at)
+        )
+        self.assertEqual(
+            datetime(2019, 2, 24, tzinfo=pytz.UTC), token_to_date("now/FM", at=at)
+        )
+        self.assertEqual(
+            datetime(2019, 4, 27, 23, 59, 59, tzinfo=pytz.UTC),
+            token_to_date("now@FQ", at=at),
+        )
+        self.assertEqual(
+            datetime(2018, 1, 28, tzinfo=pytz.UTC), token_to_date("now-1Y/FY", at=at)
+        )
+
+    def test_rollover(self):
+        self.assertEqual(
+            datetime(2019, 4, 28, tzinfo=pytz.UTC),
+            next_rollover("now/FQ", at=datetime(2019, 3, 20, 10)),
+        )
+
+    def test_bucket(self):
+        days = [datetime(2019, 1, 26, 10), datetime(2019, 1, 27), datetime(2019, 4, 27)]
+        start = int(datetime(2019, 1, 27, tzinfo=pytz.UTC).timestamp())
+        self.assertEqual([start - 364 * 86400, start, start], bucket(days, "FY"))
+        ids = bucket(days, "FQ", ids=True)
+        self.assertEqual(ids[0] + 1, ids[1])
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_bucket_numpy(self):
+        epochs = np.arange(1262304000, 1893456000, 3600 * 7, dtype=np.int64)
+        for unit in ("FY", "FQ", "FM"):
+            self.assertEqual(
+                bucket(epochs.tolist(), unit), bucket(epochs, unit).tolist()
+            )
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_bucket_numpy_out_of_range_should_raise(self):
+        with self.assertRaises(ValueError):
+            bucket(np.array([0, 1262304000]), "FY")
+
+
+class DayTableTestCase(unittest.TestCase):
+    def tearDown(self):
+        set_day_table(None)
+
+    def assertSnapsLike(self, table, moments):
+        for moment in moments:
+            for snap in TABLE_SNAPS:
+                node = SnapExpression(snap[1:], snap[0])
+                set_day_table(None)
+                expected = node.get_value(moment)
+                set_day_table(table)
+                value = node.get_value(moment)
+                self.assertEqual(expected, value, (snap, moment))
+                self.assertIs(expected.tzinfo, value.tzinfo)
+
+    def test_identical_to_arithmetic(self):
+        table = DayTable(2015, 2021, snaps=TABLE_SNAPS)
+        rnd = random.Random(7)
+        madrid = pytz.timezone("Europe/Madrid")
+        moments = []
+        # Every day of the window and beyond, at random times
+        for day in range(date(2014, 12, 20).toordinal(), date(2022, 1, 10).toordinal()):
+            moment = datetime.fromordinal(day) + timedelta(
+                seconds=rnd.randrange(86400), microseconds=rnd.randrange(10**6)
+            )
+            moments.append(madrid.localize(moment) if day % 2 else moment)
+        self.assertSnapsLike(table, moments)
+
+    def test_tokens(self):
+        set_day_table(DayTable(2010, 2030))
+        at = datetime(2019, 1, 30, 10, 20, 30)
+        self.assertEqual(
+            datetime(2019, 1, 29, 23, 59, 59, tzinfo=pytz.UTC),
+            token_to_date("now@M", at=at),
+        )
+        self.assertEqual(
+            datetime(2019, 12, 31, 23, 59, 59, tzinfo=pytz.UTC),
+            token_to_date("now@Y", at=at),
+        )
+        self.assertEqual(
+            datetime(2019, 2, 3, 23, 59, 59, tzinfo=pytz.UTC),
+            token_to_date("now@w", at=at),
+        )
+
+    def test_default_snaps(self):
+        table = DayTable(2019, 2019)
+        self.assertEqual({"w", "bw", "M", "Y"}, set(table.ends))
+        self.assertEqual({}, table.starts)
+
+    def test_memory(self):
+        table = DayTable(2001, 2100)
+        self.assertEqual(36524, table.size)
+        # Seven 4 byte columns plus a 1 byte one per day
+        self.assertEqual(36524 * 29, table.nbytes)
+        self.assertIn("1034.4 KiB", str(table))
+
+    def test_unknown_snaps_should_raise(self):
+        with self.assertRaises(ValueError):
+            DayTable(snaps=("/d",))
@@ -0,0 +1,160 @@
+import random
+import unittest
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from datetoken.counters import WindowCounter
+from datetoken.range import TokenRange
+
+start = datetime(2019, 3, 30, 22, 10, 5, tzinfo=pytz.UTC)
+
+
+def events(seed, count, step):
+    rnd = random.Random(seed)
+    moment = start
+    for _ in range(count):
+        moment += timedelta(seconds=rnd.randint(0, step))
+        yield moment, rnd.randint(1, 5)
+
+
+class WindowCounterTestCase(unittest.TestCase):
+    def assertCountsLike(self, counter, from_token, to_token, tz, exact):
+        seen = []
+        slack = timedelta(seconds=0 if exact else counter._length)
+        for position, (moment, value) in enumerate(events(3, 1500, 90)):
+            self.assertTrue(counter.add(value, at=moment))
+            seen.append((moment, value))
+            if position % 11:
+                continue
+            window = TokenRange(from_token, to_token, at=moment, tz=tz)
+            lower, upper = window.start, window.end
+            count, total = counter.count(at=moment), counter.sum(at=moment)
+            # The buckets holding the edges of sliding windows count in full
+            inside = [v for m, v in seen if lower - slack <= m <= upper + slack]
+            strictly_inside = [
+                v for m, v in seen if lower + slack <= m <= upper - slack
+            ]
+            self.assertTrue(len(strictly_inside) <= count <= len(inside), moment)
+            self.assertTrue(sum(strictly_inside) <= total <= sum(inside), moment)
+
+    def test_snapped_windows_are_exact(self):
+        for tz in (None, "Europe/Madrid"):
+            for from_token in ("now/d", "now-1h/h", "now/15m", "now-2d/d"):
+                counter = WindowCounter(from_token, tz=tz)
+                self.assertCountsLike(counter, from_token, "now", tz, exact=True)
+
+    def test_sliding_windows(self):
+        counter = WindowCounter("now-1h")
+        self.assertEqual("m", counter.resolution)
+        self.assertEqual(62, counter.size)
+        self.assertCountsLike(counter, "now-1h", "now", None, exact=False)
+
+    def test_windows_ending_before_now(self):
+        counter = WindowCounter("now-2h", "now-1h")
+        self.assertEqual(122, counter.size)
+        moment = start
+        for _ in range(3 * 60):
+            moment += timedelta(minutes=1)
+            counter.add(at=moment)
+        self.assertEqual(61, counter.count(at=moment))
+        self.assertCountsLike(
+            WindowCounter("now-2h", "now-1h"), "now-2h", "now-1h", None, exact=False
+        )
+        self.assertCountsLike(
+            WindowCounter("now-1d/d", "now-1d@d"),
+            "now-1d/d",
+            "now-1d@d",
+            None,
+            exact=True,
+        )
+
+    def test_reads_past_the_end_take_constant_time(self):
+        class CountingList(list):
+            reads = 0
+
+            def __getitem__(self, index):
+                CountingList.reads += 1
+                return list.__getitem__(self, index)
+
+        counter = WindowCounter("now-2h", "now-1h", resolution="5s")
+        moment = start
+        for _ in range(3 * 720):
+            moment += timedelta(seconds=5)
+            counter.add(at=moment)
+        self.assertEqual(721, counter.count(at=moment))
+        counter._counts = CountingList(counter._counts)
+        for _ in range(100):
+            moment += timedelta(seconds=5)
+            counter.add(at=moment)
+            self.assertEqual(721, counter.count(at=moment))
+        # Per step, the bucket added to, the one leaving the window and the
+        # one leaving the part past its end, rather than an hour of buckets
+        self.assertLessEqual(CountingList.reads, 3 * 100)
+        self.assertCountsLike(
+            WindowCounter("now-1d/d", "now-1d@d", tz="Europe/Madrid"),
+            "now-1d/d",
+            "now-1d@d",
+            "Europe/Madrid",
+            exact=True,
+        )
+
+    def test_daylight_saving_day(self):
+        # Clocks go forward at 2am on 2019-03-31 in Madrid
+        counter = WindowCounter("now/d", tz="Europe/Madrid")
+        self.assertEqual("15m", counter.resolution)
+        moments = [
+            datetime(2019, 3, 30, 20, 30, tzinfo=pytz.UTC) + timedelta(minutes=30 * i)
+            for i in range(16)
+        ]
+        for moment in moments:
+            counter.add(at=moment)
+        at = moments[-1]
+        window = TokenRange("now/d", at=at, tz="Europe/Madrid")
+        inside = [moment for moment in moments if window.contains(moment)]
+        self.assertEqual(len(inside), counter.count(at=at))
+
+    def test_natural_resolution(self):
+        self.assertEqual("15m", WindowCounter("now/d", tz="Asia/Kolkata").resolution)
+        self.assertEqual("m", WindowCounter("now/m", tz="Asia/Kolkata").resolution)
+        self.assertEqual("d", WindowCounter("now-7d/d").resolution)
+        self.assertEqual("15m", WindowCounter("now-1h/15m").resolution)
+        self.assertEqual("d", WindowCounter("now-1M/M").resolution)
+        self.assertEqual("5s", WindowCounter("now-1m").resolution)
+        self.assertEqual(3, WindowCounter("now/d").size)
+
+    def test_memory_is_bounded(self):
+        counter = WindowCounter("now-1h", resolution="5m")
+        for moment, value in events(5, 5000, 600):
+            counter.add(value, at=moment)
+        self.assertEqual(14, len(counter._counts))
+
+    def test_expired_buckets_are_evicted(self):
+        counter = WindowCounter("now-10m", resolution="m")
+        counter.add(at=start)
+        counter.add(3, at=start + timedelta(minutes=5))
+        self.assertEqual(2, counter.count(at=start + timedelta(minutes=5)))
+        self.assertEqual(4, counter.sum(at=start + timedelta(minutes=5)))
+        self.assertEqual(1, counter.count(at=start + timedelta(minutes=12)))
+        self.assertEqual(0, counter.count(at=start + timedelta(hours=2)))
+        # Too old for the window, as of the last read
+        self.assertFalse(counter.add(at=start))
+
+    def test_clock(self):
+        now = [start]
+        counter = WindowCounter("now/h", clock=lambda: now[0])
+        counter.add()
+        counter.add()
+        self.assertEqual(2, counter.count())
+        now[0] = start.replace(minute=0) + timedelta(hours=1)
+        self.assertEqual(0, counter.count())
+
+    def test_events_past_the_window(self):
+        counter = WindowCounter("now-1d/d", "now-1d@d")
+        counter.add(at=start - timedelta(days=1))
+        counter.add(at=start)
+        self.assertEqual(1, counter.count(at=start))
+
+    def test_resolutions_of_variable_length_should_raise(self):
+        self.assertRaises(ValueError, WindowCounter, "now-1M", resolution="M")
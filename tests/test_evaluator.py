@@ -1,3 +1,5 @@
+import threading
+
 import pytz
 
 from datetime import datetime
@@ -5,8 +7,10 @@ from datetime import datetime
 from freezegun import freeze_time
 from unittest import TestCase
 
-from datetoken.evaluator import Datetoken
-from datetoken.evaluator import localize, make_aware
+from datetoken import evaluator
+from datetoken.evaluator import Datetoken, eval_for_timezones
+from datetoken.evaluator import localize, make_aware, parse_datetoken, precompile
+from datetoken.exceptions import InvalidTokenException
 
 
 class EvaluatorTestCase(TestCase):
@@ -120,3 +124,122 @@ class EvaluatorTestCase(TestCase):
         self.assertEqual(26, then.day)
         self.assertEqual(0, then.hour)
         self.assertEqual(0, then.minute)
+
+
+class EvalForTimezonesTestCase(TestCase):
+    timezones = (
+        "UTC",
+        "Europe/Madrid",
+        "Europe/Paris",
+        "Europe/London",
+        "America/Chicago",
+        "America/Mexico_City",
+        "Asia/Kolkata",
+        "Australia/Sydney",
+    )
+
+    def test_matches_evaluating_each_time_zone(self):
+        now = datetime(2019, 3, 31, 0, 30, 0)
+        for token in ("now-1d/d", "now-1d@d", "now-w/bw", "now+2h/h-1M"):
+            results = eval_for_timezones(token, self.timezones, at=now)
+            self.assertEqual(len(self.timezones), len(results))
+            for tz in self.timezones:
+                expected = Datetoken(at=now, tz=tz, token=token).to_date()
+                self.assertEqual(expected, results[tz])
+                self.assertEqual(str(expected.tzinfo), str(results[tz].tzinfo))
+
+    def test_time_zones_can_be_pytz_objects(self):
+        madrid = pytz.timezone("Europe/Madrid")
+        now = datetime(2014, 11, 25, 23, 48, 43)
+        results = eval_for_timezones("now/d", [madrid], at=now)
+        self.assertEqual(datetime(2014, 11, 26), results[madrid].replace(tzinfo=None))
+
+
+class ParseBufferTestCase(TestCase):
+    query = b"GET /report?from= now-7d/d&to=now@d HTTP/1.1"
+
+    def setUp(self):
+        evaluator._buffer_cache.clear()
+
+    def test_buffers_parse_as_strings(self):
+        expected = [str(node) for node in parse_datetoken("now-7d/d")]
+        for buffer in (self.query, bytearray(self.query), memoryview(self.query)):
+            nodes = parse_datetoken(buffer, offset=17, length=9)
+            self.assertEqual(expected, [str(node) for node in nodes])
+        self.assertEqual(
+            [str(node) for node in parse_datetoken(self.query[30:36])],
+            [str(node) for node in parse_datetoken("now@d")],
+        )
+
+    def test_string_offset(self):
+        self.assertIs(
+            parse_datetoken("now-7d/d"),
+            parse_datetoken(self.query.decode("ascii"), offset=18, length=8),
+        )
+
+    def test_cache_keys_are_copies(self):
+        buffer = bytearray(b"now-1h")
+        nodes = parse_datetoken(buffer)
+        self.assertIs(nodes, parse_datetoken(memoryview(b"xnow-1h"), offset=1))
+        buffer[-1:] = b"d"
+        self.assertEqual("-1d", str(parse_datetoken(buffer)[1]))
+        self.assertEqual({b"now-1h", b"now-1d"}, set(evaluator._buffer_cache))
+
+    def test_cache_is_bounded(self):
+        for amount in range(evaluator.PARSE_CACHE_SIZE + 10):
+            parse_datetoken(b"now-%dd" % amount)
+        self.assertEqual(evaluator.PARSE_CACHE_SIZE, len(evaluator._buffer_cache))
+        self.assertNotIn(b"now-0d", evaluator._buffer_cache)
+
+    def test_least_recently_used_are_evicted(self):
+        first = parse_datetoken(b"now-0d")
+        for amount in range(1, evaluator.PARSE_CACHE_SIZE + 10):
+            self.assertIs(first, parse_datetoken(b"now-0d"))
+            parse_datetoken(b"now-%dd" % amount)
+        self.assertIn(b"now-0d", evaluator._buffer_cache)
+
+    def test_buffers_are_lexed_in_place(self):
+        inputs = []
+
+        class RecordingLexer(evaluator.Lexer):
+            def __init__(self, raw_token="", offset=0, length=None):
+                inputs.append(raw_token)
+                super(RecordingLexer, self).__init__(raw_token, offset, length)
+
+        lexer = evaluator.Lexer
+        evaluator.Lexer = RecordingLexer
+        try:
+            parse_datetoken(self.query, offset=17, length=9)
+        finally:
+            evaluator.Lexer = lexer
+        self.assertEqual(1, len(inputs))
+        self.assertIsInstance(inputs[0], memoryview)
+        self.assertIs(self.query, inputs[0].obj)
+
+    def test_threads(self):
+        errors = []
+
+        def work():
+            try:
+                for amount in range(3 * evaluator.PARSE_CACHE_SIZE):
+                    parse_datetoken(b"now-%dh" % (amount % 1500))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(evaluator.PARSE_CACHE_SIZE, len(evaluator._buffer_cache))
+
+    def test_precompiled_tokens(self):
+        compiled = precompile(["now-3M/M"])
+        self.assertIs(compiled["now-3M/M"], parse_datetoken(b"now-3M/M"))
+        self.assertFalse(evaluator._buffer_cache)
+
+    def test_invalid_buffer(self):
+        with self.assertRaises(InvalidTokenException) as ctx:
+            parse_datetoken(b"from=now-1x&", offset=5, length=6)
+        self.assertIn('"now-1x"', ctx.exception.message)
@@ -0,0 +1,83 @@
+import pytz
+import random
+import unittest
+
+from datetime import datetime, timedelta
+
+from datetoken.index import RangeIndex
+from datetoken.range import TokenRange
+
+now = datetime(2019, 2, 20, 15, 45, 12, tzinfo=pytz.UTC)
+
+PRESETS = (
+    ("now/d", "now"),
+    ("now-d/d", "now-d@d"),
+    ("now-24h", "now"),
+    ("now-w/bw", "now-w@bw"),
+    ("now/bw", "now@bw"),
+    ("now-1M/M", "now-1M@M"),
+    ("now/Q", "now@Q"),
+    ("now-1h/h", "now@h"),
+)
+
+
+class RangeIndexTestCase(unittest.TestCase):
+    def test_stab(self):
+        index = RangeIndex()
+        for key, (from_token, to_token) in enumerate(PRESETS):
+            index.add(key, from_token, to_token)
+        found = index.stab(datetime(2019, 2, 20, 10, tzinfo=pytz.UTC), at=now)
+        self.assertEqual([0, 2, 4, 6], sorted(found))
+        self.assertEqual([], index.stab(datetime(2020, 1, 1), at=now))
+
+    def test_stab_matches_linear_scan(self):
+        rnd = random.Random(42)
+        index = RangeIndex(tz="Europe/Madrid")
+        ranges = {}
+        for key in range(500):
+            from_token, to_token = rnd.choice(PRESETS)
+            index.add(key, from_token, to_token)
+            ranges[key] = TokenRange(from_token, to_token, at=now, tz="Europe/Madrid")
+        for _ in range(50):
+            moment = now - timedelta(seconds=rnd.randint(0, 90 * 86400))
+            expected = sorted(
+                key for key, token_range in ranges.items() if moment in token_range
+            )
+            self.assertEqual(expected, sorted(index.stab(moment, at=now)))
+
+    def test_refresh_only_reevaluates_rolled_over_ranges(self):
+        index = RangeIndex()
+        index.add("today", "now/d", "now@d")
+        index.add("month", "now/M", "now@M")
+        self.assertEqual(2, index.refresh(at=now))
+        self.assertEqual(0, index.refresh(at=now + timedelta(hours=1)))
+        self.assertEqual(1, index.refresh(at=datetime(2019, 2, 21, tzinfo=pytz.UTC)))
+        march = datetime(2019, 3, 1, tzinfo=pytz.UTC)
+        self.assertEqual(2, index.refresh(at=march))
+        moment = datetime(2019, 3, 1, 12, tzinfo=pytz.UTC).timestamp()
+        self.assertEqual(["month", "today"], sorted(index.stab(moment, at=march)))
+
+    def test_going_back_in_time_reevaluates_everything(self):
+        index = RangeIndex()
+        index.add("today", "now/d", "now@d")
+        index.add("month", "now/M", "now@M")
+        index.refresh(at=now)
+        self.assertEqual(2, index.refresh(at=now - timedelta(hours=1)))
+
+    def test_add_replace_and_remove(self):
+        index = RangeIndex()
+        index.add("window", "now/d", "now@d")
+        self.assertEqual(["window"], index.stab(now, at=now))
+        index.add("window", "now-d/d", "now-d@d")
+        self.assertEqual([], index.stab(now, at=now))
+        self.assertEqual(1, len(index))
+        index.remove("window")
+        self.assertEqual([], index.stab(now, at=now))
+        self.assertNotIn("window", index)
+
+    def test_bounds(self):
+        index = RangeIndex()
+        index.add("yesterday", "now-d/d", "now-d@d")
+        start, end = index.bounds("yesterday", at=now)
+        self.assertEqual(datetime(2019, 2, 19, tzinfo=pytz.UTC).timestamp(), start)
+        self.assertEqual(start + 86399, end)
@@ -77,3 +77,25 @@ class TestLexer(unittest.TestCase):
             actual_token = lexer.next_token()
             self.assertEqual(actual_token.token_type, exp_token_type)
             self.assertEqual(actual_token.token_literal, exp_token_literal)
+
+    def test_buffers_lex_as_strings(self):
+        token_input = "now-1h/h@M+2w/bw*3"
+        payload = b"from= " + token_input.encode("ascii") + b" &to=now"
+        for buffer in (payload, bytearray(payload), memoryview(payload)):
+            lexer = Lexer(buffer, offset=5, length=len(token_input) + 2)
+            expected = Lexer(token_input)
+            self.assertEqual(lexer.text, token_input)
+            while True:
+                actual_token = lexer.next_token()
+                exp_token = expected.next_token()
+                self.assertEqual(actual_token.token_type, exp_token.token_type)
+                self.assertEqual(actual_token.token_literal, exp_token.token_literal)
+                self.assertIsInstance(actual_token.token_literal, str)
+                if exp_token.token_type == TokenType.END:
+                    break
+
+    def test_string_offset(self):
+        lexer = Lexer("?from=now&to=now-1d", offset=13)
+        self.assertEqual(lexer.input, "now-1d")
+        lexer = Lexer("?from=now&to=now-1d", offset=6, length=3)
+        self.assertEqual(lexer.input, "now")
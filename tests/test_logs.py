@@ -0,0 +1,128 @@
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from datetoken.__main__ import main
+from datetoken.evaluator import evaluate_nodes, parse_datetoken
+from datetoken.logs import LogFile, parse_iso_line, read_window, regex_parser
+
+now = datetime(2019, 3, 20, 15, 0, 0)
+
+
+def write_log(path, rnd, lines=5000):
+    moment = now - timedelta(days=1)
+    with open(path, "w") as f:
+        for index in range(lines):
+            moment += timedelta(seconds=rnd.choice((0, 1, 7, 30)))
+            f.write("%s INFO event %d\n" % (moment.isoformat(), index))
+            if rnd.random() < 0.05:
+                f.write("Traceback (most recent call last):\n  boom\n")
+
+
+def scan(path, start, end):
+    """
+    Reference implementation, reading the whole file
+    """
+    selected = []
+    inside = False
+    with open(path, "rb") as f:
+        for line in f:
+            dt = parse_iso_line(line)
+            if dt is not None:
+                inside = start <= pytz.UTC.localize(dt) <= end
+            if inside:
+                selected.append(line)
+    return b"".join(selected)
+
+
+class LogFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "app.log")
+        write_log(self.path, random.Random(5))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, from_token, to_token="now", **kwargs):
+        return b"".join(read_window(self.path, from_token, to_token, at=now, **kwargs))
+
+    def test_matches_full_scan(self):
+        for from_token, to_token in (
+            ("now-1h", "now"),
+            ("now-1d/d", "now-1d@d"),
+            ("now-2h/h", "now-2h@h"),
+            ("now-7d", "now-6d"),
+            ("now-7d", "now+1d"),
+            ("now+1h", "now+2h"),
+        ):
+            start = pytz.UTC.localize(now)
+            expected = scan(
+                self.path,
+                evaluate_nodes(parse_datetoken(from_token), start),
+                evaluate_nodes(parse_datetoken(to_token), start),
+            )
+            self.assertEqual(expected, self.read(from_token, to_token))
+
+    def test_continuation_lines_follow_their_line(self):
+        data = self.read("now-1d", "now+1d")
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_logarithmic_probes(self):
+        calls = []
+
+        def parser(line):
+            calls.append(line)
+            return parse_iso_line(line)
+
+        with LogFile(self.path, parser=parser) as log:
+            log.window(now - timedelta(hours=3), now - timedelta(hours=2))
+        # A couple of lines per step, plus unparseable ones in between
+        self.assertLess(len(calls), 4 * len(bin(os.path.getsize(self.path))))
+
+    def test_time_zone_of_naive_dates(self):
+        data = self.read("now-1d+2h", "now-1d+3h", log_tz="Europe/Madrid")
+        lines = data.splitlines()
+        # 17:00 UTC is 18:00 in Madrid
+        first, last = parse_iso_line(lines[0]), parse_iso_line(lines[-1])
+        self.assertEqual((2019, 3, 19, 18), first.timetuple()[:4])
+        self.assertLess(first.minute, 5)
+        self.assertLessEqual(last, datetime(2019, 3, 19, 19))
+        self.assertGreater(last, datetime(2019, 3, 19, 18, 55))
+
+    def test_empty_file(self):
+        path = os.path.join(self.directory, "empty.log")
+        open(path, "w").close()
+        self.assertEqual([], list(read_window(path, "now-1h", at=now)))
+
+    def test_custom_format(self):
+        path = os.path.join(self.directory, "access.log")
+        with open(path, "w") as f:
+            for hour in range(24):
+                f.write('1.2.3.4 - - [20/Mar/2019:%02d:00:00] "GET /"\n' % hour)
+        parser = regex_parser(r"\[([^\]]+)\]", "%d/%b/%Y:%H:%M:%S")
+        data = b"".join(read_window(path, "now-3h", "now-1h", at=now, parser=parser))
+        self.assertEqual(3, len(data.splitlines()))
+        self.assertIn(b"12:00:00", data)
+
+    def test_command_line(self):
+        output = io.BytesIO()
+        stdout = sys.stdout
+        sys.stdout = io.TextIOWrapper(output)
+        try:
+            code = main(
+                ["logs", self.path, "--from", "now-1h", "--at", now.isoformat()]
+            )
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(0, code)
+        self.assertEqual(self.read("now-1h"), output.getvalue())
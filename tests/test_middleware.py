@@ -0,0 +1,334 @@
+import asyncio
+import unittest
+
+from datetime import datetime
+from wsgiref.util import setup_testing_defaults
+
+import pytz
+
+from datetoken.middleware import ASGITokenMiddleware, TokenMiddleware
+
+now = datetime(2019, 3, 20, 15, 45, 12)
+
+
+def clock():
+    return now
+
+
+def wsgi_app(environ, start_response):
+    values = environ["datetoken"]
+    body = ",".join(
+        "%s=%s" % (param, values[param].isoformat()) for param in sorted(values)
+    )
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [body.encode("utf8")]
+
+
+class WSGIClient(object):
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, query, headers=None, path="/"):
+        environ = {"QUERY_STRING": query, "PATH_INFO": path}
+        environ.update(headers or {})
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response["status"] = status
+            response["headers"] = dict(response_headers)
+            response["header_names"] = [name for name, _ in response_headers]
+
+        response["body"] = b"".join(self.app(environ, start_response))
+        return response
+
+
+class TokenMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = WSGIClient(
+            TokenMiddleware(wsgi_app, defaults={"to": "now"}, clock=clock)
+        )
+
+    def test_values_are_passed_to_the_app(self):
+        response = self.client.get("from=now-1d/d&to=now/d")
+        self.assertEqual("200 OK", response["status"])
+        self.assertEqual(
+            b"from=2019-03-19T00:00:00+00:00,to=2019-03-20T00:00:00+00:00",
+            response["body"],
+        )
+
+    def test_cached_until_rollover(self):
+        headers = self.client.get("from=now-1d/d&to=now/d")["headers"]
+        # Both tokens change at midnight
+        self.assertEqual("max-age=29688", headers["Cache-Control"])
+        self.assertEqual("Thu, 21 Mar 2019 00:00:00 GMT", headers["Expires"])
+        self.assertTrue(headers["ETag"].startswith('"'))
+
+    def test_earliest_rollover_wins(self):
+        headers = self.client.get("from=now-1d/d")["headers"]
+        # `to` defaults to `now`, which changes every second
+        self.assertEqual("max-age=1", headers["Cache-Control"])
+
+    def test_time_zone(self):
+        client = WSGIClient(
+            TokenMiddleware(wsgi_app, tz="Asia/Kolkata", tz_param="tz", clock=clock)
+        )
+        response = client.get("from=now/d")
+        self.assertEqual(b"from=2019-03-20T00:00:00+05:30", response["body"])
+        self.assertEqual(
+            "Wed, 20 Mar 2019 18:30:00 GMT", response["headers"]["Expires"]
+        )
+        response = client.get("from=now/d&tz=America/New_York")
+        self.assertEqual(b"from=2019-03-20T00:00:00-04:00", response["body"])
+
+    def test_etag_depends_on_values(self):
+        first = self.client.get("from=now-1d/d&to=now/d")["headers"]["ETag"]
+        self.assertEqual(
+            first, self.client.get("from=now-1d/d&to=now/d")["headers"]["ETag"]
+        )
+        self.assertNotEqual(
+            first, self.client.get("from=now-2d/d&to=now/d")["headers"]["ETag"]
+        )
+
+    def test_etag_depends_on_the_resource(self):
+        first = self.client.get("from=now-1d/d&to=now/d")["headers"]["ETag"]
+        for query, path in (
+            ("from=now-1d/d&to=now/d", "/visits"),
+            ("from=now-1d/d&to=now/d&page=2", "/"),
+            ("from=now-1d/d&to=now@d-1d%2B1s", "/"),
+        ):
+            headers = self.client.get(query, path=path)["headers"]
+            self.assertNotEqual(first, headers["ETag"])
+
+    def test_plus_signs_are_kept(self):
+        response = self.client.get("from=now-1d/d+3h&to=now%2B1h/h")
+        self.assertEqual(
+            b"from=2019-03-19T03:00:00+00:00,to=2019-03-20T16:00:00+00:00",
+            response["body"],
+        )
+
+    def test_not_modified(self):
+        etag = self.client.get("from=now/d&to=now@d")["headers"]["ETag"]
+        response = self.client.get(
+            "from=now/d&to=now@d", {"HTTP_IF_NONE_MATCH": 'W/"x", %s' % etag}
+        )
+        self.assertEqual("304 Not Modified", response["status"])
+        self.assertEqual(b"", response["body"])
+        self.assertEqual(etag, response["headers"]["ETag"])
+
+    def test_wildcard_is_not_modified(self):
+        response = self.client.get("from=now/d", {"HTTP_IF_NONE_MATCH": "*"})
+        self.assertEqual("200 OK", response["status"])
+
+    def test_only_cacheable_responses_are_not_modified(self):
+        def app(environ, start_response):
+            if environ.get("HTTP_AUTHORIZATION") != "secret":
+                start_response("403 Forbidden", [("Content-Type", "text/plain")])
+                return [b"forbidden"]
+            if environ["PATH_INFO"] != "/":
+                start_response("404 Not Found", [("Content-Type", "text/plain")])
+                return [b"not found"]
+            return wsgi_app(environ, start_response)
+
+        client = WSGIClient(TokenMiddleware(app, clock=clock))
+        etag = client.get("from=now/d", {"HTTP_AUTHORIZATION": "secret"})["headers"][
+            "ETag"
+        ]
+        conditional = {"HTTP_IF_NONE_MATCH": etag}
+        response = client.get("from=now/d", conditional)
+        self.assertEqual("403 Forbidden", response["status"])
+        self.assertEqual(b"forbidden", response["body"])
+        conditional["HTTP_AUTHORIZATION"] = "secret"
+        response = client.get("from=now/d", conditional, path="/missing")
+        self.assertEqual("404 Not Found", response["status"])
+        self.assertEqual(b"not found", response["body"])
+        response = client.get("from=now/d", conditional)
+        self.assertEqual("304 Not Modified", response["status"])
+        self.assertEqual(b"", response["body"])
+
+    def test_not_modified_closes_the_response(self):
+        closed = []
+
+        class Body(object):
+            def __iter__(self):
+                return iter([b"body"])
+
+            def close(self):
+                closed.append(True)
+
+        def app(environ, start_response):
+            start_response("200 OK", [])
+            return Body()
+
+        client = WSGIClient(TokenMiddleware(app, clock=clock))
+        etag = client.get("from=now/d")["headers"]["ETag"]
+        response = client.get("from=now/d", {"HTTP_IF_NONE_MATCH": etag})
+        self.assertEqual("304 Not Modified", response["status"])
+        self.assertEqual([True], closed)
+
+    def test_invalid_tokens(self):
+        response = self.client.get("from=now-1x")
+        self.assertEqual("400 Bad Request", response["status"])
+        self.assertIn(b'Token "now-1x" is invalid', response["body"])
+
+    def test_out_of_range_tokens(self):
+        for query in ("from=now%2B99999999d", "from=now-99999Y"):
+            response = self.client.get(query)
+            self.assertEqual("400 Bad Request", response["status"])
+            self.assertIn(b"out of the range of dates", response["body"])
+
+    def test_unknown_time_zone(self):
+        client = WSGIClient(TokenMiddleware(wsgi_app, tz_param="tz", clock=clock))
+        response = client.get("from=now&tz=Mars/Olympus")
+        self.assertEqual("400 Bad Request", response["status"])
+
+    def test_without_tokens(self):
+        client = WSGIClient(TokenMiddleware(wsgi_app, clock=clock))
+        self.assertRaises(KeyError, client.get, "page=2")
+
+    def test_app_cache_control_is_kept(self):
+        def app(environ, start_response):
+            start_response("200 OK", [("Cache-Control", "no-store")])
+            return []
+
+        client = WSGIClient(TokenMiddleware(app, clock=clock))
+        headers = client.get("from=now/d")["headers"]
+        self.assertEqual("no-store", headers["Cache-Control"])
+        self.assertNotIn("ETag", headers)
+
+    def test_app_etag_is_kept(self):
+        def app(environ, start_response):
+            start_response("200 OK", [("etag", '"app"')])
+            return [b"body"]
+
+        client = WSGIClient(TokenMiddleware(app, clock=clock))
+        response = client.get("from=now/d")
+        self.assertEqual(["etag", "Cache-Control", "Expires"], response["header_names"])
+        self.assertEqual('"app"', response["headers"]["etag"])
+        etag = WSGIClient(TokenMiddleware(wsgi_app, clock=clock)).get("from=now/d")[
+            "headers"
+        ]["ETag"]
+        response = client.get("from=now/d", {"HTTP_IF_NONE_MATCH": etag})
+        self.assertEqual("200 OK", response["status"])
+        self.assertEqual(b"body", response["body"])
+
+
+async def asgi_app(scope, receive, send):
+    values = scope["datetoken"]
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send(
+        {
+            "type": "http.response.body",
+            "body": values["from"].isoformat().encode("utf8"),
+        }
+    )
+
+
+class ASGITokenMiddlewareTestCase(unittest.TestCase):
+    def request(self, app, query, headers=()):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "query_string": query,
+            "headers": list(headers),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(app(scope, receive, send))
+        finally:
+            loop.close()
+        self.header_names = [name for name, _ in messages[0]["headers"]]
+        return messages[0]["status"], dict(messages[0]["headers"]), messages[1]["body"]
+
+    def test_values_and_headers(self):
+        app = ASGITokenMiddleware(asgi_app, clock=clock)
+        status, headers, body = self.request(app, b"from=now-1h/h")
+        self.assertEqual(200, status)
+        self.assertEqual(b"2019-03-20T14:00:00+00:00", body)
+        self.assertEqual(b"max-age=888", headers[b"cache-control"])
+        self.assertEqual(b"Wed, 20 Mar 2019 16:00:00 GMT", headers[b"expires"])
+
+    def test_not_modified(self):
+        app = ASGITokenMiddleware(asgi_app, clock=clock, directives="private")
+        _, headers, _ = self.request(app, b"from=now/d")
+        self.assertEqual(b"private, max-age=29688", headers[b"cache-control"])
+        status, _, body = self.request(
+            app, b"from=now/d", [(b"if-none-match", headers[b"etag"])]
+        )
+        self.assertEqual(304, status)
+        self.assertEqual(b"", body)
+
+    def test_only_cacheable_responses_are_not_modified(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b"not found"})
+
+        _, headers, _ = self.request(
+            ASGITokenMiddleware(asgi_app, clock=clock), b"from=now/d"
+        )
+        status, _, body = self.request(
+            ASGITokenMiddleware(app, clock=clock),
+            b"from=now/d",
+            [(b"if-none-match", headers[b"etag"])],
+        )
+        self.assertEqual(404, status)
+        self.assertEqual(b"not found", body)
+
+    def test_app_etag_is_kept(self):
+        async def app(scope, receive, send):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"ETag", b'"app"')],
+                }
+            )
+            await send({"type": "http.response.body", "body": b"body"})
+
+        _, headers, _ = self.request(
+            ASGITokenMiddleware(asgi_app, clock=clock), b"from=now/d"
+        )
+        status, _, body = self.request(
+            ASGITokenMiddleware(app, clock=clock),
+            b"from=now/d",
+            [(b"if-none-match", headers[b"etag"])],
+        )
+        self.assertEqual(200, status)
+        self.assertEqual(b"body", body)
+        self.assertEqual([b"ETag", b"cache-control", b"expires"], self.header_names)
+
+    def test_invalid_tokens(self):
+        app = ASGITokenMiddleware(asgi_app, clock=clock)
+        status, _, body = self.request(app, b"from=now/x")
+        self.assertEqual(400, status)
+        self.assertIn(b"now/x", body)
+        status, _, _ = self.request(app, b"from=now%2B99999999d")
+        self.assertEqual(400, status)
+
+    def test_other_scopes_pass_through(self):
+        calls = []
+
+        async def app(scope, receive, send):
+            calls.append(scope["type"])
+
+        middleware = ASGITokenMiddleware(app, clock=clock)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(middleware({"type": "lifespan"}, None, None))
+        finally:
+            loop.close()
+        self.assertEqual(["lifespan"], calls)
+
+    def test_resolved_at_the_same_instant(self):
+        app = ASGITokenMiddleware(asgi_app, clock=lambda: pytz.UTC.localize(now))
+        _, _, body = self.request(app, b"from=now")
+        self.assertEqual(b"2019-03-20T15:45:12+00:00", body)
@@ -111,8 +111,44 @@ class ParserSnapExpression(unittest.TestCase):
         self.assertIsInstance(node, SnapExpression)
         self.assertEqual(TokenType.SLASH, node.operator)
         self.assertEqual("w", node.modifier)
+        self.assertEqual(1, node.amount)
         self.assertEqual("/w", str(node))
 
+    def test_snap_several_units(self):
+        lexer = Lexer("@15m")
+        parser = Parser(lexer)
+        nodes = parser.parse()
+        node = nodes[0]
+        self.assertEqual([], parser.errors)
+        self.assertEqual(TokenType.AT, node.operator)
+        self.assertEqual("m", node.modifier)
+        self.assertEqual(15, node.amount)
+        self.assertEqual("@15m", str(node))
+
+    def test_snap_amount_above_zero(self):
+        lexer = Lexer("/0h")
+        parser = Parser(lexer)
+        parser.parse()
+        self.assertEqual(1, len(parser.errors))
+        self.assertIn("Expected snap amount above zero", parser.errors[0])
+
+    def test_snap_amount_of_calendar_units(self):
+        for payload in ("/2M", "/3Q"):
+            lexer = Lexer(payload)
+            parser = Parser(lexer)
+            parser.parse()
+            self.assertEqual(1, len(parser.errors))
+            self.assertIn("Expected snap MODIFIER with an amount", parser.errors[0])
+
+    def test_snap_amount_of_one(self):
+        for payload in ("/1s", "@1M", "/1Q", "@1bd"):
+            lexer = Lexer(payload)
+            parser = Parser(lexer)
+            nodes = parser.parse()
+            self.assertEqual([], parser.errors)
+            self.assertEqual(1, nodes[0].amount)
+            self.assertEqual(payload.replace("1", ""), str(nodes[0]))
+
 
 class ParserModifierExpression(unittest.TestCase):
     def test_non_existent_operator(self):
@@ -0,0 +1,157 @@
+import pytz
+import unittest
+
+from datetime import datetime, timedelta
+
+from datetoken.exceptions import InvalidTokenException
+from datetoken.range import TokenRange, date_range
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+now = datetime(2019, 2, 20, 15, 45, 12)
+
+
+class TokenRangeTestCase(unittest.TestCase):
+    def test_both_ends_are_evaluated_against_same_at(self):
+        token_range = TokenRange("now-d/d", "now-d@d", at=now)
+        self.assertEqual(
+            datetime(2019, 2, 19, 0, 0, 0, tzinfo=pytz.UTC), token_range.start
+        )
+        self.assertEqual(
+            datetime(2019, 2, 19, 23, 59, 59, tzinfo=pytz.UTC), token_range.end
+        )
+        self.assertEqual("now-1d/d..now-1d@d", str(token_range))
+
+    def test_ends_are_localized(self):
+        token_range = TokenRange("now/d", "now@d", at=now, tz="Europe/Madrid")
+        self.assertEqual("Europe/Madrid", str(token_range.start.tzinfo))
+        self.assertEqual(
+            datetime(2019, 2, 19, 23, 0, 0, tzinfo=pytz.UTC), token_range.start
+        )
+
+    def test_to_token_defaults_to_now(self):
+        token_range = TokenRange("now-24h", at=now)
+        self.assertEqual(
+            datetime(2019, 2, 20, 15, 45, 12, tzinfo=pytz.UTC), token_range.end
+        )
+
+    def test_invalid_token_should_raise(self):
+        self.assertRaises(InvalidTokenException, TokenRange, "now-1Z", "now")
+
+    def test_refresh_at(self):
+        token_range = TokenRange("now/d", "now@d", at=now)
+        token_range.refresh_at(now + timedelta(days=1))
+        self.assertEqual(21, token_range.start.day)
+
+    def test_contains(self):
+        token_range = TokenRange("now-w/bw", "now-w@bw", at=now)
+        self.assertTrue(token_range.contains(datetime(2019, 2, 11, 0, 0, 0)))
+        self.assertTrue(
+            token_range.contains(datetime(2019, 2, 15, 23, 59, 59, tzinfo=pytz.UTC))
+        )
+        self.assertFalse(token_range.contains(datetime(2019, 2, 16)))
+        self.assertIn(
+            datetime(2019, 2, 13, 12, tzinfo=pytz.UTC).timestamp(), token_range
+        )
+
+    def test_mask_unsorted(self):
+        token_range = TokenRange("now-d/d", "now-d@d", at=now)
+        timestamps = [
+            datetime(2019, 2, 20, 0, 0, 0),
+            datetime(2019, 2, 19, 12, 0, 0),
+            datetime(2019, 2, 18, 23, 59, 59),
+            datetime(2019, 2, 19, 0, 0, 0),
+        ]
+        self.assertEqual(
+            [False, True, False, True], token_range.mask(timestamps)
+        )
+
+    def test_mask_sorted_uses_bisection(self):
+        token_range = TokenRange("now-d/d", "now-d@d", at=now)
+        start = datetime(2019, 2, 17, tzinfo=pytz.UTC)
+        timestamps = [start + timedelta(hours=i) for i in range(96)]
+        expected = token_range.mask(timestamps)
+        self.assertEqual(expected, token_range.mask(timestamps, assume_sorted=True))
+        self.assertEqual((48, 72), token_range.indices(timestamps))
+        self.assertEqual(24, sum(expected))
+
+    def test_mask_unix_timestamps(self):
+        token_range = TokenRange("now-d/d", "now-d@d", at=now)
+        start = datetime(2019, 2, 17, tzinfo=pytz.UTC).timestamp()
+        timestamps = [start + 3600 * i for i in range(96)]
+        self.assertEqual(
+            token_range.mask(timestamps),
+            token_range.mask(timestamps, assume_sorted=True),
+        )
+        self.assertEqual((48, 72), token_range.indices(timestamps))
+
+    def test_mask_empty(self):
+        token_range = TokenRange("now-d/d", "now-d@d", at=now)
+        self.assertEqual([], token_range.mask([]))
+        self.assertEqual([], token_range.mask([], assume_sorted=True))
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_mask_numpy(self):
+        token_range = TokenRange("now-d/d", "now-d@d", at=now)
+        start = datetime(2019, 2, 17, tzinfo=pytz.UTC).timestamp()
+        epochs = np.arange(start, start + 96 * 3600, 3600)
+        moments = epochs.astype("datetime64[s]")
+        for timestamps in (epochs, moments):
+            mask = token_range.mask(timestamps)
+            self.assertEqual(24, mask.sum())
+            self.assertTrue(
+                (mask == token_range.mask(timestamps, assume_sorted=True)).all()
+            )
+            self.assertEqual((48, 72), token_range.indices(timestamps))
+
+
+class DateRangeTestCase(unittest.TestCase):
+    def test_hourly(self):
+        points = list(date_range("now-d/d", "now-d@d", step="1h", at=now))
+        self.assertEqual(24, len(points))
+        self.assertEqual(datetime(2019, 2, 19, tzinfo=pytz.UTC), points[0])
+        self.assertEqual(datetime(2019, 2, 19, 23, tzinfo=pytz.UTC), points[-1])
+
+    def test_both_ends_are_included(self):
+        points = list(date_range("now/d", "now/d+2d", step="d", at=now))
+        self.assertEqual(3, len(points))
+
+    def test_is_lazy(self):
+        points = date_range("now-100Y", "now", step="1s", at=now)
+        self.assertEqual(
+            datetime(1919, 2, 20, 15, 45, 12, tzinfo=pytz.UTC), next(points)
+        )
+
+    def test_months_are_clamped_without_drifting(self):
+        at = datetime(2020, 1, 31, 10)
+        points = list(date_range("now/d", "now/d+3M", step="1M", at=at))
+        self.assertEqual([31, 29, 31, 30], [point.day for point in points])
+
+    def test_negative_step(self):
+        points = list(date_range("now/d", "now/d-2d", step="-1d", at=now))
+        self.assertEqual([20, 19, 18], [point.day for point in points])
+
+    def test_time_zone(self):
+        points = list(
+            date_range("now/d", "now", step="6h", at=now, tz="Europe/Madrid")
+        )
+        self.assertEqual([0, 6, 12], [point.hour for point in points])
+        self.assertEqual("Europe/Madrid", str(points[0].tzinfo))
+
+    def test_invalid_step_should_raise(self):
+        self.assertRaises(InvalidTokenException, date_range, "now-d", step="1h/d")
+        self.assertRaises(InvalidTokenException, date_range, "now-d", step="1x")
+        self.assertRaises(ValueError, date_range, "now-d", step="1h-60m")
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_array(self):
+        for step in ("15m", "1M"):
+            array = date_range("now-1Y", "now", step=step, at=now, as_array=True)
+            expected = [
+                int(point.timestamp())
+                for point in date_range("now-1Y", "now", step=step, at=now)
+            ]
+            self.assertEqual(expected, array.astype("int64").tolist())
@@ -0,0 +1,71 @@
+import pytz
+import unittest
+
+from datetime import datetime, timedelta
+
+from datetoken.evaluator import eval_datetoken
+from datetoken.rollover import next_rollover
+
+now = datetime(2019, 2, 20, 15, 45, 12, tzinfo=pytz.UTC)
+
+
+class NextRolloverTestCase(unittest.TestCase):
+    def assertRollsOverAt(self, token, expected, at=now, tz=None):
+        rollover = next_rollover(token, at=at, tz=tz)
+        self.assertEqual(expected, rollover)
+        before = eval_datetoken(token, at=at, tz=tz).to_date()
+        self.assertEqual(
+            before,
+            eval_datetoken(token, at=rollover - timedelta(seconds=1), tz=tz).to_date(),
+        )
+        self.assertNotEqual(before, eval_datetoken(token, at=rollover, tz=tz).to_date())
+
+    def test_unsnapped_tokens_change_every_second(self):
+        self.assertEqual(now + timedelta(seconds=1), next_rollover("now-1d", at=now))
+
+    def test_snapped_to_day(self):
+        self.assertRollsOverAt("now/d", datetime(2019, 2, 21, tzinfo=pytz.UTC))
+        self.assertRollsOverAt("now-d@d", datetime(2019, 2, 21, tzinfo=pytz.UTC))
+
+    def test_modifiers_before_snap_shift_the_boundary(self):
+        self.assertRollsOverAt("now-1h/d", datetime(2019, 2, 21, 1, tzinfo=pytz.UTC))
+
+    def test_snapped_to_several_units(self):
+        self.assertRollsOverAt("now/15m", datetime(2019, 2, 20, 16, tzinfo=pytz.UTC))
+        self.assertRollsOverAt("now@6h", datetime(2019, 2, 20, 18, tzinfo=pytz.UTC))
+        self.assertRollsOverAt("now-1d/2w", datetime(2019, 3, 5, tzinfo=pytz.UTC))
+        self.assertRollsOverAt(
+            "now/30s", datetime(2019, 2, 20, 15, 45, 30, tzinfo=pytz.UTC)
+        )
+
+    def test_snapped_to_month(self):
+        self.assertRollsOverAt("now-1M/M", datetime(2019, 3, 1, tzinfo=pytz.UTC))
+
+    def test_month_clamping(self):
+        at = datetime(2019, 3, 30, tzinfo=pytz.UTC)
+        self.assertRollsOverAt(
+            "now-1M/M", datetime(2019, 4, 1, tzinfo=pytz.UTC), at=at
+        )
+
+    def test_snapped_to_business_week(self):
+        self.assertRollsOverAt("now-w@bw", datetime(2019, 2, 25, tzinfo=pytz.UTC))
+
+    def test_snapped_to_fixed_quarter(self):
+        self.assertRollsOverAt("now/Q1", datetime(2020, 1, 1, tzinfo=pytz.UTC))
+
+    def test_time_zone(self):
+        self.assertRollsOverAt(
+            "now/d", datetime(2019, 2, 20, 23, tzinfo=pytz.UTC), tz="Europe/Madrid"
+        )
+
+    def test_time_zone_dst_shift(self):
+        at = datetime(2019, 10, 27, 0, 30, tzinfo=pytz.UTC)
+        self.assertRollsOverAt(
+            "now/h", datetime(2019, 10, 27, 1, tzinfo=pytz.UTC), at=at,
+            tz="Europe/Madrid",
+        )
+
+    def test_week_day_snaps_are_conservative(self):
+        rollover = next_rollover("now/mon/d", at=now)
+        self.assertGreater(rollover, now)
+        self.assertLessEqual(rollover, datetime(2019, 2, 25, tzinfo=pytz.UTC))
@@ -0,0 +1,224 @@
+import asyncio
+import threading
+import unittest
+
+from datetime import datetime
+
+import pytz
+
+from datetoken.exceptions import InvalidTokenException
+from datetoken.scheduler import FakeClock, TokenScheduler
+
+# A friday
+START = datetime(2019, 3, 29, 23, 30)
+
+
+class TokenSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(START)
+        self.scheduler = TokenScheduler(clock=self.clock)
+        self.runs = []
+
+    def record(self, name):
+        self.runs.append((name, self.clock()))
+
+    def run_until(self, until):
+        until = pytz.UTC.localize(until)
+        job = self.scheduler.add("now+1d", self.scheduler.stop)
+        self.scheduler.reschedule(
+            job, "now+%ds" % (until - self.clock()).total_seconds()
+        )
+        self.scheduler.run(sleep=self.clock.sleep)
+
+    def test_runs_at_token_times(self):
+        self.scheduler.add("now+1d/d+2h", self.record, args=("daily",))
+        self.scheduler.add("now+w/mon/d+9h", self.record, args=("weekly",))
+        self.run_until(datetime(2019, 4, 9))
+        self.assertEqual(
+            [
+                ("daily", datetime(2019, 3, 30, 2, tzinfo=pytz.UTC)),
+                ("daily", datetime(2019, 3, 31, 2, tzinfo=pytz.UTC)),
+                ("daily", datetime(2019, 4, 1, 2, tzinfo=pytz.UTC)),
+                ("weekly", datetime(2019, 4, 1, 9, tzinfo=pytz.UTC)),
+                ("daily", datetime(2019, 4, 2, 2, tzinfo=pytz.UTC)),
+            ],
+            self.runs[:5],
+        )
+        self.assertEqual(10, len([run for run in self.runs if run[0] == "daily"]))
+        self.assertEqual(
+            [
+                datetime(2019, 4, 1, 9, tzinfo=pytz.UTC),
+                datetime(2019, 4, 8, 9, tzinfo=pytz.UTC),
+            ],
+            [moment for name, moment in self.runs if name == "weekly"],
+        )
+
+    def test_time_zones(self):
+        scheduler = TokenScheduler(tz="Europe/Madrid", clock=self.clock)
+        job = scheduler.add("now+1d/d+2h", self.record, args=("daily",))
+        self.assertEqual(datetime(2019, 3, 31, 1, tzinfo=pytz.UTC), job.next_run)
+        job = scheduler.add("now+1d/d+2h", self.record, args=("utc",), tz=pytz.UTC)
+        self.assertEqual(datetime(2019, 3, 30, 2, tzinfo=pytz.UTC), job.next_run)
+
+    def test_tokens_are_evaluated_when_firing(self):
+        evaluations = []
+        job = self.scheduler.add("now+1h/h", self.record, args=("hourly",))
+        nodes = job.nodes
+
+        class CountingNodes(list):
+            def __iter__(self):
+                evaluations.append(None)
+                return super(CountingNodes, self).__iter__()
+
+        for _ in range(1000):
+            self.scheduler.add("now+1d/d", self.record, args=("daily",))
+        job.nodes = CountingNodes(nodes)
+        self.run_until(datetime(2019, 3, 30, 3, 30))
+        self.assertEqual(4, len([run for run in self.runs if run[0] == "hourly"]))
+        self.assertEqual(4, len(evaluations))
+
+    def test_remove(self):
+        job = self.scheduler.add("now+1h/h", self.record, args=("hourly",))
+        self.scheduler.add("now+1d/d", self.record, args=("daily",))
+        self.assertEqual(2, len(self.scheduler))
+        job.cancel()
+        job.cancel()
+        self.assertIsNone(job.next_run)
+        self.assertEqual(1, len(self.scheduler))
+        self.run_until(datetime(2019, 3, 30, 3))
+        self.assertEqual([("daily", datetime(2019, 3, 30, tzinfo=pytz.UTC))], self.runs)
+
+    def test_reschedule(self):
+        job = self.scheduler.add("now+1d/d", self.record, args=("job",))
+        self.scheduler.reschedule(job, "now+1h/h")
+        self.assertEqual("now+1h/h", job.token)
+        self.assertEqual(datetime(2019, 3, 30, tzinfo=pytz.UTC), job.next_run)
+        self.assertEqual(1, len(self.scheduler))
+        self.run_until(datetime(2019, 3, 30, 1, 30))
+        self.assertEqual(2, len(self.runs))
+
+    def test_stale_entries_are_compacted(self):
+        job = self.scheduler.add("now+1d/d", self.record, args=("job",))
+        for _ in range(1000):
+            self.scheduler.reschedule(job)
+        self.assertLess(len(self.scheduler._heap), 20)
+        self.assertEqual(
+            datetime(2019, 3, 30, tzinfo=pytz.UTC), self.scheduler.next_run
+        )
+
+    def test_tokens_not_moving_forward_run_once(self):
+        self.scheduler.add("now+40m/h", self.record, args=("once",))
+        self.assertEqual(
+            datetime(2019, 3, 30, tzinfo=pytz.UTC), self.scheduler.next_run
+        )
+        self.scheduler.run(sleep=self.clock.sleep)
+        self.assertEqual([("once", datetime(2019, 3, 30, tzinfo=pytz.UTC))], self.runs)
+        self.assertEqual(0, len(self.scheduler))
+
+    def test_past_tokens_should_raise(self):
+        with self.assertRaises(ValueError):
+            self.scheduler.add("now/d", self.record)
+        with self.assertRaises(InvalidTokenException):
+            self.scheduler.add("now+1x", self.record)
+
+    def test_run_async(self):
+        async def record(name):
+            self.record(name)
+
+        self.scheduler.add("now+1h/h", record, args=("hourly",))
+        self.scheduler.add("now+1d/d+90m", self.scheduler.stop)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(
+                self.scheduler.run_async(sleep=self.clock.async_sleep)
+            )
+        finally:
+            loop.close()
+        self.assertEqual(
+            [
+                ("hourly", datetime(2019, 3, 30, tzinfo=pytz.UTC)),
+                ("hourly", datetime(2019, 3, 30, 1, tzinfo=pytz.UTC)),
+            ],
+            self.runs[:2],
+        )
+        self.assertEqual(pytz.UTC.localize(datetime(2019, 3, 30, 1, 30)), self.clock())
+
+    def test_fractional_second_clock(self):
+        # Waits end at the run itself, not up to a second past it, while
+        # tokens are still evaluated against whole seconds
+        clock = FakeClock(datetime(2019, 3, 29, 23, 30, 5, 700000))
+        scheduler = TokenScheduler(clock=clock)
+        delays = []
+
+        def sleep(seconds):
+            delays.append(seconds)
+            clock.sleep(seconds)
+
+        job = scheduler.add("now+1m/m", scheduler.stop)
+        self.assertEqual(datetime(2019, 3, 29, 23, 31, tzinfo=pytz.UTC), job.next_run)
+        scheduler.run(sleep=sleep)
+        self.assertAlmostEqual(54.3, delays[0])
+        self.assertEqual(datetime(2019, 3, 29, 23, 31, tzinfo=pytz.UTC), clock())
+        self.assertEqual(1, len(delays))
+
+    def test_raising_callbacks_are_logged(self):
+        def fail():
+            raise ZeroDivisionError
+
+        self.scheduler.add("now+1h/h", fail)
+        self.scheduler.add("now+1h/h", self.record, args=("hourly",))
+        with self.assertLogs("datetoken.scheduler", "ERROR") as logs:
+            self.run_until(datetime(2019, 3, 30, 1, 30))
+        self.assertEqual(2, len(self.runs))
+        self.assertEqual(2, len(logs.records))
+        self.assertIn('"now+1h/h"', logs.output[0])
+        # Jobs whose callbacks raise are kept, along with the stopping one
+        self.assertEqual(3, len(self.scheduler))
+
+    def test_raising_coroutine_callbacks_are_logged(self):
+        async def fail():
+            raise ZeroDivisionError
+
+        self.scheduler.add("now+1h/h", fail)
+        self.scheduler.add("now+1h/h", self.record, args=("hourly",))
+        self.scheduler.add("now+1d/d+90m", self.scheduler.stop)
+        loop = asyncio.new_event_loop()
+        try:
+            with self.assertLogs("datetoken.scheduler", "ERROR") as logs:
+                loop.run_until_complete(
+                    self.scheduler.run_async(sleep=self.clock.async_sleep)
+                )
+        finally:
+            loop.close()
+        self.assertEqual(2, len(self.runs))
+        self.assertEqual(2, len(logs.records))
+
+
+class WakeUpTestCase(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = TokenScheduler()
+        self.scheduler.add("now+1d", self.scheduler.stop)
+
+    def test_run_wakes_up_on_added_jobs(self):
+        thread = threading.Thread(target=self.scheduler.run)
+        thread.start()
+        try:
+            self.scheduler.add("now+1s", self.scheduler.stop)
+            thread.join(10)
+            self.assertFalse(thread.is_alive())
+        finally:
+            self.scheduler.stop()
+            thread.join()
+
+    def test_run_async_wakes_up_on_added_jobs(self):
+        async def run():
+            task = asyncio.ensure_future(self.scheduler.run_async())
+            await asyncio.sleep(0)
+            self.scheduler.add("now+1s", self.scheduler.stop)
+            await asyncio.wait_for(task, 10)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
@@ -0,0 +1,147 @@
+import random
+import sqlite3
+import unittest
+
+from datetime import datetime, timedelta
+
+from datetoken.exceptions import InvalidTokenException, UnsupportedTokenException
+from datetoken.parser import SNAP_MODIFIERS
+from datetoken.sql import to_sql
+from datetoken.utils import token_to_date
+
+SQLITE_FORMAT = "%Y-%m-%d %H:%M:%S"
+UNSUPPORTED = ("bd", "FY", "FQ", "FM")
+
+
+def sqlite_tokens():
+    tokens = ["now", "now-1M/M+w/bw", "now-1M/M+w@bw", "now+1M-1d@Q", "now/Q2-1Y+1M"]
+    tokens.extend(["now/15m", "now@15m", "now/6h", "now-1d@6h", "now/2w", "now@2w"])
+    for modifier in SNAP_MODIFIERS:
+        if modifier not in UNSUPPORTED:
+            tokens.append("now/%s" % modifier)
+            if modifier != "s":
+                tokens.append("now@%s" % modifier)
+    for modifier in ("s", "m", "h", "d", "w", "M", "Y"):
+        tokens.extend(["now-3%s" % modifier, "now+14%s" % modifier])
+        tokens.extend(["now-1%s/d" % modifier, "now+1%s/%s" % (modifier, modifier)])
+    return tokens
+
+
+class SQLiteTestCase(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.connection.close()
+
+    def evaluate(self, token, at):
+        sql = "SELECT %s" % to_sql(token, "sqlite", now=":at")
+        cursor = self.connection.execute(sql, {"at": at.strftime(SQLITE_FORMAT)})
+        return cursor.fetchone()[0]
+
+    def test_matches_python_evaluation(self):
+        rnd = random.Random(7)
+        tokens = sqlite_tokens()
+        anchors = [datetime(2020, 1, 31, 10), datetime(2019, 2, 28, 23, 59, 59)]
+        for _ in range(100):
+            seconds = rnd.randint(0, 40 * 365 * 86400)
+            anchors.append(datetime(1990, 1, 1) + timedelta(seconds=seconds))
+        for at in anchors:
+            for token in tokens:
+                if token == "now@M" and at.day > 28:
+                    # The python snap falls short for days the following
+                    # month lacks
+                    continue
+                expected = token_to_date(token, at=at).strftime(SQLITE_FORMAT)
+                self.assertEqual(expected, self.evaluate(token, at), (token, at))
+
+    def test_months_are_clamped(self):
+        self.assertEqual(
+            "2020-02-29 10:00:00", self.evaluate("now+1M", datetime(2020, 1, 31, 10))
+        )
+        self.assertEqual(
+            "2019-02-28 10:00:00", self.evaluate("now-1Y", datetime(2020, 2, 29, 10))
+        )
+
+    def test_end_of_month(self):
+        self.assertEqual(
+            "2020-01-31 23:59:59", self.evaluate("now@M", datetime(2020, 1, 31, 10))
+        )
+
+    def test_modifiers_are_folded(self):
+        self.assertEqual(
+            "datetime('now', '-1 days', 'start of day')", to_sql("now-d/d", "sqlite")
+        )
+
+    def test_current_time(self):
+        sql = "SELECT %s" % to_sql("now/d", "sqlite")
+        value = self.connection.execute(sql).fetchone()[0]
+        self.assertTrue(value.endswith(" 00:00:00"))
+
+    def test_time_zones_should_raise(self):
+        with self.assertRaises(UnsupportedTokenException):
+            to_sql("now/d", "sqlite", tz="Europe/Madrid")
+        self.assertEqual(to_sql("now/d", "sqlite"), to_sql("now/d", "sqlite", tz="UTC"))
+
+
+class PostgreSQLTestCase(unittest.TestCase):
+    def test_intervals_and_truncation(self):
+        self.assertEqual(
+            "(date_trunc('day', ((CURRENT_TIMESTAMP AT TIME ZONE 'UTC') "
+            "- interval '1 days')) AT TIME ZONE 'UTC')",
+            to_sql("now-d/d", "postgresql"),
+        )
+
+    def test_end_snaps(self):
+        self.assertEqual(
+            "((date_trunc('month', (%(at)s AT TIME ZONE 'UTC')) "
+            "+ interval '1 month' - interval '1 second') AT TIME ZONE 'UTC')",
+            to_sql("now@M", "postgresql", now="%(at)s"),
+        )
+
+    def test_time_zone_keeps_offset_of_starting_point(self):
+        sql = to_sql("now/d", "postgresql", tz="Europe/Madrid")
+        self.assertEqual(
+            "((date_trunc('day', (CURRENT_TIMESTAMP AT TIME ZONE 'Europe/Madrid')) "
+            "- ((CURRENT_TIMESTAMP AT TIME ZONE 'Europe/Madrid') "
+            "- (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'))) AT TIME ZONE 'UTC')",
+            sql,
+        )
+
+    def test_several_units(self):
+        self.assertEqual(
+            "(((%(at)s AT TIME ZONE 'UTC') - mod((mod(((floor(extract(epoch from "
+            "(%(at)s AT TIME ZONE 'UTC')))::bigint) - (0)), 900) + 900), 900) "
+            "* interval '1 second' + interval '899 seconds') AT TIME ZONE 'UTC')",
+            to_sql("now@15m", "postgresql", now="%(at)s"),
+        )
+
+    def test_named_parameters(self):
+        # As psycopg2 interpolates them, literal percent signs would break
+        for token in ("now/mon", "now@sun", "now/15m", "now@4h"):
+            sql = to_sql(token, "postgresql", now="%(at)s")
+            self.assertNotIn("%", sql % {"at": "CURRENT_TIMESTAMP"})
+
+    def test_every_calendar_snap(self):
+        for modifier in SNAP_MODIFIERS:
+            if modifier not in UNSUPPORTED:
+                to_sql("now/%s" % modifier, "postgresql")
+                if modifier != "s":
+                    to_sql("now@%s" % modifier, "postgresql")
+
+
+class UnsupportedTestCase(unittest.TestCase):
+    def test_unsupported_units_should_raise(self):
+        for dialect in ("sqlite", "postgresql"):
+            for token in ("now+2bd", "now/bd", "now@FQ", "now@s"):
+                with self.assertRaises(UnsupportedTokenException) as context:
+                    to_sql(token, dialect)
+                self.assertIn(token, context.exception.message)
+
+    def test_invalid_tokens_should_raise(self):
+        with self.assertRaises(InvalidTokenException):
+            to_sql("now+", "sqlite")
+
+    def test_unknown_dialect_should_raise(self):
+        with self.assertRaises(ValueError):
+            to_sql("now", "oracle")
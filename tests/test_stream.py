@@ -0,0 +1,127 @@
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from datetime import datetime
+
+from datetoken.__main__ import main
+from datetoken.evaluator import _parse_datetoken
+from datetoken.exceptions import InvalidTokenException
+from datetoken.stream import RecordResolver, resolve_records, transform
+
+now = datetime(2019, 3, 20, 15, 45, 12)
+
+
+class RecordResolverTestCase(unittest.TestCase):
+    def test_top_level_fields(self):
+        record = {"from": "now-7d/d", "to": "now", "other": "now"}
+        resolver = RecordResolver(["from", "to"], at=now)
+        self.assertEqual(
+            {
+                "from": "2019-03-13T00:00:00+00:00",
+                "to": "2019-03-20T15:45:12+00:00",
+                "other": "now",
+            },
+            resolver.resolve(record),
+        )
+
+    def test_nested_paths(self):
+        record = {"range": {"from": "now/d"}, "ranges": [{"to": "now@d"}]}
+        resolver = RecordResolver(["range.from", "ranges.0.to", "missing.path"], at=now)
+        resolver.resolve(record)
+        self.assertEqual("2019-03-20T00:00:00+00:00", record["range"]["from"])
+        self.assertEqual("2019-03-20T23:59:59+00:00", record["ranges"][0]["to"])
+        self.assertNotIn("missing", record)
+
+    def test_per_record_anchor_and_time_zone(self):
+        records = [
+            {"from": "now/d", "at": "2020-01-01T10:00:00", "tz": "Europe/Madrid"},
+            {"from": "now/d", "at": 1577872800},
+            {"from": "now/d"},
+        ]
+        resolved = list(
+            resolve_records(
+                records, ["from"], at_field="at", tz_field="tz", at=now, utc=True
+            )
+        )
+        self.assertEqual(
+            [
+                "2019-12-31T23:00:00+00:00",
+                "2020-01-01T00:00:00+00:00",
+                "2019-03-20T00:00:00+00:00",
+            ],
+            [record["from"] for record in resolved],
+        )
+
+    def test_invalid_tokens(self):
+        with self.assertRaises(InvalidTokenException):
+            RecordResolver(["from"], at=now).resolve({"from": "now+"})
+        record = RecordResolver(["from"], at=now, strict=False).resolve(
+            {"from": "now+"}
+        )
+        self.assertEqual("now+", record["from"])
+
+    def test_repeated_tokens_are_parsed_once(self):
+        _parse_datetoken.cache_clear()
+        resolver = RecordResolver(["from"], at=now)
+        for _ in range(100):
+            resolver.resolve({"from": "now-12h/h"})
+        self.assertEqual(1, _parse_datetoken.cache_info().misses)
+
+
+class TransformTestCase(unittest.TestCase):
+    def test_transform(self):
+        infile = io.StringIO('{"from": "now/d"}\n\n{"from": "now-1d/d", "n": 1}\n')
+        outfile = io.StringIO()
+        self.assertEqual(2, transform(infile, outfile, ["from"], at=now))
+        lines = outfile.getvalue().splitlines()
+        self.assertEqual(
+            [
+                {"from": "2019-03-20T00:00:00+00:00"},
+                {"from": "2019-03-19T00:00:00+00:00", "n": 1},
+            ],
+            [json.loads(line) for line in lines],
+        )
+
+    def test_command_line(self):
+        directory = tempfile.mkdtemp()
+        source = os.path.join(directory, "in.ndjson")
+        target = os.path.join(directory, "out.ndjson")
+        with open(source, "w") as f:
+            f.write('{"range": {"from": "now/d"}}\n')
+        code = main(
+            ["stream", source, "-o", target, "-f", "range.from", "--at", "2019-03-20"]
+        )
+        self.assertEqual(0, code)
+        with open(target) as f:
+            self.assertEqual(
+                {"range": {"from": "2019-03-20T00:00:00+00:00"}}, json.loads(f.read())
+            )
+        shutil.rmtree(directory)
+
+    def test_command_line_errors(self):
+        directory = tempfile.mkdtemp()
+        source = os.path.join(directory, "in.ndjson")
+        target = os.path.join(directory, "out.ndjson")
+        stderr = sys.stderr
+        for content, arguments, message in (
+            ('{"from": "now/x"}\n', [], 'Token "now/x" is invalid'),
+            ('{"from": \n', [], "Expecting value"),
+            ('{"from": "now/d"}\n', ["--tz", "Mars/Olympus"], "Mars/Olympus"),
+            ('{"from": "now/d"}\n', ["--at", "2019-13-45"], "month"),
+        ):
+            with open(source, "w") as f:
+                f.write(content)
+            sys.stderr = io.StringIO()
+            try:
+                code = main(["stream", source, "-o", target, "-f", "from"] + arguments)
+                output = sys.stderr.getvalue()
+            finally:
+                sys.stderr = stderr
+            self.assertEqual(1, code)
+            self.assertIn(message, output)
+        shutil.rmtree(directory)
@@ -0,0 +1,117 @@
+import calendar
+import pytz
+import unittest
+
+from datetime import datetime, timedelta, timezone
+
+from datetoken.tztable import TransitionTable, get_table
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None
+
+ZONES = (
+    "Europe/Madrid",
+    "America/Chicago",
+    "America/Sao_Paulo",
+    "Australia/Lord_Howe",
+    "Asia/Kathmandu",
+    "Pacific/Apia",
+    "UTC",
+)
+EDGES = (-3601, -3600, -1800, -1, 0, 1, 1799, 3599, 3600)
+
+
+def pytz_offset(epoch, tz):
+    return int(datetime.fromtimestamp(epoch, tz).utcoffset().total_seconds())
+
+
+def pytz_localize(local, tz, is_dst):
+    naive = datetime(1970, 1, 1) + timedelta(seconds=local)
+    return calendar.timegm(tz.localize(naive, is_dst=is_dst).utctimetuple())
+
+
+class TransitionTableTestCase(unittest.TestCase):
+    def test_matches_pytz_across_dst_edges(self):
+        for name in ZONES:
+            tz = pytz.timezone(name)
+            table = get_table(tz)
+            for start in table.starts:
+                for epoch in (start + edge for edge in EDGES):
+                    offset = pytz_offset(epoch, tz)
+                    self.assertEqual(offset, table.utc_offset(epoch), (name, epoch))
+                    for is_dst in (False, True):
+                        self.assertEqual(
+                            pytz_localize(epoch + offset, tz, is_dst),
+                            table.to_utc(epoch + offset, is_dst=is_dst),
+                            (name, epoch, is_dst),
+                        )
+
+    def test_non_existent_and_ambiguous_times(self):
+        table = get_table("Europe/Madrid")
+        madrid = pytz.timezone("Europe/Madrid")
+        for moment in (datetime(2019, 3, 31, 2, 30), datetime(2019, 10, 27, 2, 30)):
+            local = calendar.timegm(moment.timetuple())
+            for is_dst in (False, True):
+                self.assertEqual(
+                    pytz_localize(local, madrid, is_dst),
+                    table.to_utc(local, is_dst=is_dst),
+                )
+            self.assertRaises(
+                (pytz.NonExistentTimeError, pytz.AmbiguousTimeError),
+                table.to_utc,
+                local,
+                is_dst=None,
+            )
+
+    def test_to_local(self):
+        table = get_table("Asia/Kolkata")
+        epoch = calendar.timegm((2019, 2, 20, 15, 45, 12))
+        self.assertEqual(epoch + 19800, table.to_local(epoch))
+        self.assertEqual(datetime(2019, 2, 20, 21, 15, 12), table.to_datetime(epoch))
+        self.assertEqual([epoch + 19800], table.to_local_many([epoch]))
+
+    def test_outside_window_falls_back_to_time_zone(self):
+        table = TransitionTable("Europe/Madrid", start_year=2000, end_year=2001)
+        epoch = calendar.timegm((2019, 7, 1, 0, 0, 0))
+        self.assertFalse(table.covers(epoch))
+        self.assertEqual(7200, table.utc_offset(epoch))
+        self.assertEqual(epoch, table.to_utc(epoch + 7200))
+
+    def test_tables_are_cached(self):
+        self.assertIs(get_table("Europe/Madrid"), get_table("Europe/Madrid"))
+
+    def test_fixed_offsets(self):
+        table = get_table(timezone(timedelta(hours=-3)))
+        self.assertEqual(1, len(table))
+        self.assertEqual(-10800, table.utc_offset(0))
+
+    @unittest.skipIf(ZoneInfo is None, "zoneinfo is not available")
+    def test_other_tz_implementations_are_probed(self):
+        table = TransitionTable(ZoneInfo("Europe/Madrid"), 2018, 2020)
+        madrid = pytz.timezone("Europe/Madrid")
+        self.assertEqual(7, len(table))
+        for start in table.starts:
+            for epoch in (start + edge for edge in EDGES):
+                self.assertEqual(pytz_offset(epoch, madrid), table.utc_offset(epoch))
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy(self):
+        table = TransitionTable("America/Chicago", start_year=2000, end_year=2030)
+        epochs = np.arange(
+            calendar.timegm((1999, 6, 1, 0, 0, 0)),
+            calendar.timegm((2031, 6, 1, 0, 0, 0)),
+            7919,
+        )
+        expected = [table.utc_offset(int(epoch)) for epoch in epochs]
+        self.assertEqual(expected, table.utc_offsets(epochs).tolist())
+        self.assertEqual(
+            (epochs + np.array(expected)).tolist(),
+            table.to_local_many(epochs).tolist(),
+        )
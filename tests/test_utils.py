@@ -442,6 +442,49 @@ class DateTokenParseToDateTestCase(unittest.TestCase, DatetokenComparatorMixin):
             actual, datetime(2018, 12, 31, 23, 59, 59, tzinfo=pytz.UTC)
         )
 
+    def test_token_snapped_to_several_minutes(self):
+        actual = token_to_date("now/15m")
+        self.compare_datetime(actual, datetime(2016, 11, 28, 12, 45, tzinfo=pytz.UTC))
+        actual = token_to_date("now@15m")
+        self.compare_datetime(
+            actual, datetime(2016, 11, 28, 12, 59, 59, tzinfo=pytz.UTC)
+        )
+
+    def test_token_snapped_to_several_hours(self):
+        actual = token_to_date("now/6h")
+        self.compare_datetime(actual, datetime(2016, 11, 28, 12, tzinfo=pytz.UTC))
+        actual = token_to_date("now-1h/6h", tz="Asia/Kolkata")
+        self.compare_datetime(
+            actual, datetime(2016, 11, 28, 12, tzinfo=pytz.timezone("Asia/Kolkata"))
+        )
+
+    def test_token_snapped_to_several_weeks(self):
+        # Two week buckets are laid out from Monday 1969-12-29
+        actual = token_to_date("now/2w")
+        self.compare_datetime(actual, datetime(2016, 11, 28, tzinfo=pytz.UTC))
+        actual = token_to_date("now-1w/2w")
+        self.compare_datetime(actual, datetime(2016, 11, 14, tzinfo=pytz.UTC))
+        actual = token_to_date("now@2w")
+        self.compare_datetime(
+            actual, datetime(2016, 12, 11, 23, 59, 59, tzinfo=pytz.UTC)
+        )
+
+    def test_token_snapped_to_one_unit(self):
+        self.assertEqual(token_to_date("now/d"), token_to_date("now/1d"))
+        self.assertEqual(token_to_date("now/s"), token_to_date("now/1s"))
+        self.assertEqual(token_to_date("now/M"), token_to_date("now/1M"))
+        self.assertEqual(token_to_date("now@M"), token_to_date("now@1M"))
+
+    @freeze_time(datetime(2016, 11, 28, 12, 50, 13))
+    def test_token_snapped_to_seconds(self):
+        # `/s` and `/1s` keep snapping to the start of the minute
+        actual = token_to_date("now/1s")
+        self.compare_datetime(actual, datetime(2016, 11, 28, 12, 50, tzinfo=pytz.UTC))
+        actual = token_to_date("now/2s")
+        self.compare_datetime(
+            actual, datetime(2016, 11, 28, 12, 50, 12, tzinfo=pytz.UTC)
+        )
+
     def test_invalid_string_should_raise(self):
         self.assertRaises(InvalidTokenException, token_to_date, "then-1d/d")
         self.assertRaises(InvalidTokenException, token_to_date, "now-1Z/d")
@@ -0,0 +1,72 @@
+import random
+import unittest
+
+from datetoken.evaluator import _parse_datetoken
+from datetoken.exceptions import InvalidTokenException
+from datetoken.validation import ValidationError, is_valid, validate, validate_many
+
+PIECES = "now no n + - / @ 0 1 12 d M bd bw Q Q1 Q5 mon w x dx _ FY".split() + [" "]
+
+
+def parses(token):
+    try:
+        _parse_datetoken.__wrapped__(token)
+    except InvalidTokenException:
+        return False
+    return True
+
+
+class IsValidTestCase(unittest.TestCase):
+    def test_valid_tokens(self):
+        tokens = ("now", "now-7d/d", " -1M/M+w@bw ", "now/Q2-1Y+1M", "now+2bd", "/15m")
+        for token in tokens:
+            self.assertTrue(is_valid(token), token)
+
+    def test_invalid_tokens(self):
+        for token in ("", "now+", "now-1x", "now/Q5", "now /d", "5d", "no", None):
+            self.assertFalse(is_valid(token), token)
+
+    def test_agrees_with_parser(self):
+        rnd = random.Random(1)
+        for _ in range(20000):
+            token = "".join(rnd.choice(PIECES) for _ in range(rnd.randint(0, 6)))
+            self.assertEqual(parses(token), is_valid(token), repr(token))
+
+
+class ValidateTestCase(unittest.TestCase):
+    def test_valid(self):
+        self.assertIsNone(validate("now-7d/d"))
+
+    def test_positions(self):
+        self.assertEqual(ValidationError(0, "Empty token"), validate(""))
+        self.assertEqual(
+            ValidationError(4, "Expected amount modifier after operator"),
+            validate("now+"),
+        )
+        self.assertEqual(3, validate("now /d").position)
+        self.assertEqual(0, validate("5d").position)
+        # Leading whitespace counts
+        self.assertEqual(8, validate("  now-d/dd").position)
+        self.assertEqual(0, validate(42).position)
+
+    def test_unknown_modifiers(self):
+        error = validate("now-1x")
+        self.assertEqual(5, error.position)
+        self.assertIn('got "x"', error.message)
+        self.assertIn('got "Q5"', validate("now/Q5").message)
+
+    def test_snap_amounts(self):
+        self.assertEqual(
+            ValidationError(4, "Expected snap amount above zero"), validate("now/0m")
+        )
+        error = validate("now@3M")
+        self.assertEqual(4, error.position)
+        self.assertIn(
+            'taking an amount as any of "s, m, h, d, w", got "M"', error.message
+        )
+
+    def test_validate_many(self):
+        errors = validate_many(["now/d", "now+", "now-1w"])
+        self.assertIsNone(errors[0])
+        self.assertEqual(4, errors[1].position)
+        self.assertIsNone(errors[2])
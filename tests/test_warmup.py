@@ -0,0 +1,32 @@
+import gc
+import unittest
+
+from datetoken.evaluator import parse_datetoken
+from datetoken.exceptions import InvalidTokenException
+from datetoken.warmup import unfreeze, warmup
+
+PRESETS = ("now/d", "now-d/d", "now-d@d", "now-w/bw", "now-w@bw")
+
+
+class WarmupTestCase(unittest.TestCase):
+    def tearDown(self):
+        unfreeze()
+
+    def test_tokens_are_precompiled(self):
+        report = warmup(PRESETS, ("Europe/Madrid", "America/Chicago"), freeze=False)
+        self.assertEqual(5, report.tokens)
+        self.assertEqual(2, report.timezones)
+        self.assertGreater(report.warm_bytes, 0)
+        self.assertEqual(0, report.frozen_objects)
+        self.assertEqual(2 * report.warm_bytes, report.estimated_shared_bytes(workers=2))
+        self.assertIn("Precompiled 5 tokens and 2 time zones", str(report))
+        self.assertIs(parse_datetoken("now-d/d"), parse_datetoken("now-d/d"))
+
+    def test_invalid_token_should_raise(self):
+        self.assertRaises(InvalidTokenException, warmup, ("now-1Z",), freeze=False)
+
+    @unittest.skipUnless(hasattr(gc, "freeze"), "gc.freeze is not available")
+    def test_freeze(self):
+        report = warmup(PRESETS, ("UTC",))
+        self.assertGreater(report.frozen_objects, 0)
+        self.assertGreater(gc.get_freeze_count(), 0)
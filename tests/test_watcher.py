@@ -0,0 +1,180 @@
+import asyncio
+import selectors
+import unittest
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from datetoken.evaluator import eval_datetoken
+from datetoken.exceptions import InvalidTokenException
+from datetoken.watcher import TokenWatcher
+
+START = datetime(2019, 3, 29, 23, 58, 30)
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """
+    Skips the time the loop would otherwise wait for its next timer
+    """
+
+    def __init__(self):
+        super(_VirtualSelector, self).__init__()
+        self.elapsed = 0.0
+
+    def select(self, timeout=None):
+        events = super(_VirtualSelector, self).select(0)
+        if not events and timeout:
+            self.elapsed += timeout
+        return events
+
+
+class _VirtualLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        super(_VirtualLoop, self).__init__(_VirtualSelector())
+
+    def time(self):
+        return self._selector.elapsed
+
+    def now(self):
+        return START + timedelta(seconds=self.time())
+
+
+class TokenWatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = _VirtualLoop()
+        self.watcher = TokenWatcher(loop=self.loop, clock=self.loop.now)
+        self.calls = []
+
+    def tearDown(self):
+        self.watcher.close()
+        self.loop.close()
+
+    def callback(self, token, value):
+        self.calls.append((token, value, self.loop.now()))
+
+    def run_for(self, seconds):
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+
+    def test_fires_once_per_change(self):
+        self.watcher.watch("now/m", self.callback)
+        self.watcher.watch("now-1d/d", self.callback)
+        self.run_for(3 * 60)
+        changes = [(token, value) for token, value, _ in self.calls]
+        self.assertEqual(
+            [
+                ("now/m", datetime(2019, 3, 29, 23, 59, tzinfo=pytz.UTC)),
+                ("now/m", datetime(2019, 3, 30, tzinfo=pytz.UTC)),
+                ("now-1d/d", datetime(2019, 3, 29, tzinfo=pytz.UTC)),
+                ("now/m", datetime(2019, 3, 30, 0, 1, tzinfo=pytz.UTC)),
+            ],
+            changes,
+        )
+        for token, value, moment in self.calls:
+            self.assertEqual(value, eval_datetoken(token, at=moment).to_date())
+
+    def test_fractional_second_clock(self):
+        # The timer fires at the rollover itself, not up to a second past it,
+        # while tokens are still evaluated against whole seconds
+        def clock():
+            return self.loop.now() + timedelta(microseconds=700000)
+
+        watcher = TokenWatcher(loop=self.loop, clock=clock)
+        try:
+            watcher.watch("now/m", self.callback)
+            self.assertEqual(
+                datetime(2019, 3, 29, 23, 58, tzinfo=pytz.UTC), watcher.value("now/m")
+            )
+            self.run_for(60)
+        finally:
+            watcher.close()
+        self.assertEqual(
+            [
+                (
+                    "now/m",
+                    datetime(2019, 3, 29, 23, 59, tzinfo=pytz.UTC),
+                    datetime(2019, 3, 29, 23, 58, 59, 300000),
+                )
+            ],
+            self.calls,
+        )
+
+    def test_wakes_once_per_rollover(self):
+        wakes = []
+        wake = self.watcher._wake
+
+        def counting_wake():
+            wakes.append(self.loop.now())
+            wake()
+
+        self.watcher._wake = counting_wake
+        for amount in range(1000):
+            self.watcher.watch("now-%dd/d" % amount, self.callback)
+        self.run_for(3 * 86400)
+        self.assertEqual(3, len(wakes))
+        self.assertEqual(3000, len(self.calls))
+        self.assertEqual(1000, len(self.watcher))
+
+    def test_time_zones(self):
+        self.watcher.watch("now/d", self.callback, tz="Europe/Madrid")
+        self.watcher.watch("now/d", self.callback)
+        self.run_for(120)
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual(
+            datetime(2019, 3, 30, tzinfo=pytz.UTC),
+            self.calls[0][1].astimezone(pytz.UTC),
+        )
+        value = self.watcher.value("now/d", tz="Europe/Madrid")
+        self.assertEqual(datetime(2019, 3, 29, 23, tzinfo=pytz.UTC), value)
+
+    def test_coroutine_callbacks(self):
+        async def callback(token, value):
+            self.calls.append((token, value))
+
+        self.watcher.watch("now/m", callback)
+        self.run_for(60)
+        self.assertEqual(
+            [("now/m", datetime(2019, 3, 29, 23, 59, tzinfo=pytz.UTC))], self.calls
+        )
+
+    def test_raising_callbacks(self):
+        errors = []
+        self.loop.set_exception_handler(lambda loop, context: errors.append(context))
+
+        def callback(token, value):
+            raise ZeroDivisionError
+
+        self.watcher.watch("now/m", callback)
+        self.watcher.watch("now/m", self.callback)
+        self.watcher.watch("now/h", callback)
+        self.run_for(3 * 60)
+        self.assertEqual(3, len(self.calls))
+        self.assertEqual(4, len(errors))
+        self.assertIsInstance(errors[0]["exception"], ZeroDivisionError)
+        self.assertIn("now/m", errors[0]["message"])
+
+    def test_cancel(self):
+        subscription = self.watcher.watch("now/m", self.callback)
+        self.watcher.watch("now/m", lambda token, value: None)
+        subscription.cancel()
+        subscription.cancel()
+        self.run_for(60)
+        self.assertEqual([], self.calls)
+        self.assertEqual(1, len(self.watcher))
+
+    def test_shared_evaluation(self):
+        self.watcher.watch("now/m", self.callback)
+        self.watcher.watch("now/m", self.callback)
+        self.assertEqual(1, len(self.watcher))
+        self.assertEqual(1, len(self.watcher._heap))
+        self.run_for(60)
+        self.assertEqual(2, len(self.calls))
+
+    def test_invalid_token(self):
+        with self.assertRaises(InvalidTokenException):
+            self.watcher.watch("now-1x", self.callback)
+
+    def test_closed(self):
+        self.watcher.close()
+        with self.assertRaises(RuntimeError):
+            self.watcher.watch("now/m", self.callback)